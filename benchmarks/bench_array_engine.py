@@ -0,0 +1,54 @@
+"""Time per game of the object, compiled and array engines on large games
+such as battle royales.
+
+Run from the repository root with:
+    python -m benchmarks.bench_array_engine --games 20
+"""
+import argparse
+import random
+import time
+from trueskill.engine.compiled_graph import CompiledTrueSkillEnv
+from trueskill.engine.true_skill import TrueSkillEnv
+from trueskill.engine.true_skill_array import ArrayTrueSkillEnv
+from trueskill.utils.maths import Gaussian
+
+SHAPES = {
+    "5v5": (5, 5),
+    "8 teams of 4": (4,) * 8,
+    "50 duos": (2,) * 50,
+    "100 solos": (1,) * 100,
+    "25 squads of 10": (10,) * 25,
+}
+ENGINES = (TrueSkillEnv, CompiledTrueSkillEnv, ArrayTrueSkillEnv)
+
+
+def random_games(team_sizes, count, rng):
+    return [[{f"p{j}_{i}": Gaussian(mu=rng.uniform(10, 40),
+                                   sigma=rng.uniform(1, 8.3))
+              for i in range(size)} for j, size in enumerate(team_sizes)]
+            for _ in range(count)]
+
+
+def time_per_game(env_cls, games):
+    start = time.perf_counter()
+    for teams in games:
+        env_cls(teams).update_ratings()
+    return (time.perf_counter() - start) / len(games)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--games", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    for name, team_sizes in SHAPES.items():
+        games = random_games(team_sizes, args.games, rng)
+        times = ", ".join(f"{env.__name__} {time_per_game(env, games)*1e3:.2f}ms"
+                          for env in ENGINES)
+        print(f"{name}: {times}")
+
+
+if __name__ == '__main__':
+    main()
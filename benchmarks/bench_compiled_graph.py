@@ -0,0 +1,52 @@
+"""Time per game of TrueSkillEnv, which builds the graph for every game,
+against CompiledTrueSkillEnv, which reuses a compiled graph per game shape.
+
+Run from the repository root with:
+    python -m benchmarks.bench_compiled_graph --games 2000
+"""
+import argparse
+import random
+import time
+from trueskill.engine.compiled_graph import CompiledTrueSkillEnv
+from trueskill.engine.true_skill import TrueSkillEnv
+from trueskill.utils.maths import Gaussian
+
+SHAPES = {
+    "1v1": (1, 1),
+    "5v5": (5, 5),
+    "4 player free-for-all": (1, 1, 1, 1),
+    "4 teams of 4": (4, 4, 4, 4),
+}
+
+
+def random_games(team_sizes, count, rng):
+    return [[{f"p{j}_{i}": Gaussian(mu=rng.uniform(10, 40),
+                                   sigma=rng.uniform(1, 8.3))
+              for i in range(size)} for j, size in enumerate(team_sizes)]
+            for _ in range(count)]
+
+
+def time_per_game(env_cls, games):
+    start = time.perf_counter()
+    for teams in games:
+        env_cls(teams).update_ratings()
+    return (time.perf_counter() - start) / len(games)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--games", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    for name, team_sizes in SHAPES.items():
+        games = random_games(team_sizes, args.games, rng)
+        before = time_per_game(TrueSkillEnv, games)
+        after = time_per_game(CompiledTrueSkillEnv, games)
+        print(f"{name}: build + run {before * 1e6:.1f}us -> "
+              f"{after * 1e6:.1f}us per game ({before / after:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""Open time and per game load/update/save cost of CsvSource against
+SqliteSource.
+
+Run from the repository root with:
+    python -m benchmarks.bench_data_sources --players 100000 1000000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from trueskill.data.player_ratings import CsvSource
+from trueskill.data.sqlite_source import SqliteSource
+from trueskill.utils.maths import Gaussian
+
+
+def populate(data_dir, players):
+    with open(os.path.join(data_dir, 'true_skills.csv'), 'w') as f:
+        for i in range(players):
+            f.write(f"player{i},25.0,8.333333333333334\n")
+    source = SqliteSource(data_dir)
+    source.bulk_update_player_ratings(
+        {f"player{i}": Gaussian(mu=25.0, sigma=25 / 3)
+         for i in range(players)})
+    source.save_player_ratings()
+    source.close()
+
+
+def bench_source(open_source, save, games, players, players_per_game, rng):
+    start = time.perf_counter()
+    source = open_source()
+    open_time = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(games):
+        names = [f"player{rng.randrange(players)}"
+                 for _ in range(players_per_game)]
+        ratings = {name: source.load_player_ratings(name) for name in names}
+        source.bulk_update_player_ratings(
+            {name: Gaussian(mu=rating.mu + 0.1, sigma=rating.sigma)
+             for name, rating in ratings.items()})
+        save(source)
+    game_time = (time.perf_counter() - start) / games
+    return open_time, game_time
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--players", type=int, nargs='+',
+                        default=[100000, 1000000])
+    parser.add_argument("--games", type=int, default=10)
+    parser.add_argument("--players-per-game", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    for players in args.players:
+        with tempfile.TemporaryDirectory() as data_dir:
+            populate(data_dir, players)
+            sources = {
+                "CsvSource": (lambda: CsvSource(data_dir),
+                              lambda s: s.save_player_ratings(data_dir)),
+                "SqliteSource": (lambda: SqliteSource(data_dir),
+                                 lambda s: s.save_player_ratings()),
+            }
+            for name, (open_source, save) in sources.items():
+                open_time, game_time = bench_source(
+                    open_source, save, args.games, players,
+                    args.players_per_game, rng)
+                print(f"{players:,} players, {name}: open "
+                      f"{open_time * 1e3:.1f}ms, load/update/save "
+                      f"{game_time * 1e3:.2f}ms per game")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""Memory and throughput of the slotted Gaussian and in-place message updates.
+
+Compares against a Gaussian with a per-instance __dict__ and against the
+allocating `self / old_message * message` marginal update.
+
+Run from the repository root with:
+    python -m benchmarks.bench_gaussian --count 1000000
+"""
+import argparse
+import time
+import tracemalloc
+from trueskill.engine.factor_graph import Variable
+from trueskill.utils.maths import Gaussian
+
+
+class DictGaussian:
+    """A Gaussian holding its parameters in a per-instance __dict__."""
+    def __init__(self, pi=0.0, tau=0.0):
+        self.pi = pi
+        self.tau = tau
+
+
+def bench_memory(cls, count):
+    tracemalloc.start()
+    ratings = [cls(pi=1.0 + i, tau=25.0) for i in range(count)]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del ratings
+    return size / count
+
+
+def bench_message_updates(count, in_place):
+    var = Variable()
+    factor = object()
+    var.messages[factor] = Gaussian()
+    messages = [Gaussian(pi=1.0, tau=float(i % 7)) for i in range(64)]
+    start = time.perf_counter()
+    if in_place:
+        for i in range(count):
+            var.update_message(factor, messages[i & 63])
+    else:
+        for i in range(count):
+            message = messages[i & 63]
+            old_message, var.messages[factor] = var.messages[factor], message
+            var.marginal = var / old_message * message
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--count", type=int, default=1000000)
+    args = parser.parse_args()
+
+    print(f"{args.count:,} ratings held in memory:")
+    for cls in (DictGaussian, Gaussian):
+        print(f"  {cls.__name__}: {bench_memory(cls, args.count):.0f} "
+              f"bytes per rating")
+    print(f"{args.count:,} message updates:")
+    allocating = bench_message_updates(args.count, in_place=False)
+    in_place = bench_message_updates(args.count, in_place=True)
+    print(f"  allocating: {allocating:,.0f} updates/s")
+    print(f"  in place:   {in_place:,.0f} updates/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""Time to import the command line entry point, from the -X importtime
+report of fresh interpreters, and the modules taking the most of it.
+
+Importing trueskill.main should not load numpy or scipy, which only the
+vectorized engines need, and should stay within IMPORT_BUDGET seconds.
+Exits with status 1 if either is broken.
+
+Run from the repository root with:
+    python -m benchmarks.bench_import_time --runs 5
+"""
+import argparse
+import os
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+IMPORT_BUDGET = 0.2
+HEAVY_MODULES = ("numpy", "scipy")
+REPOSITORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_times(module: str) -> Dict[str, Tuple[float, float]]:
+    """Imports module in a fresh interpreter with -X importtime.
+
+    Returns:
+        The own and cumulative seconds taken to import every module loaded,
+        by name.
+    """
+    report = subprocess.run([sys.executable, "-X", "importtime", "-c",
+                             f"import {module}"], cwd=REPOSITORY,
+                            capture_output=True, text=True,
+                            check=True).stderr
+    times = {}
+    for line in report.splitlines():
+        # import time: self [us] | cumulative | imported package
+        fields = line.partition(":")[2].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue
+        times[fields[2].strip()] = (int(fields[0]) / 1e6,
+                                    int(fields[1]) / 1e6)
+    return times
+
+
+def heavy_imports(times: Dict[str, Tuple[float, float]]) -> List[str]:
+    """The top level packages of HEAVY_MODULES among the modules loaded."""
+    return sorted({name.split(".")[0] for name in times
+                   if name.split(".")[0] in HEAVY_MODULES})
+
+
+def fastest_import(module: str, runs: int) -> Dict[str, Tuple[float, float]]:
+    """The import_times of the fastest of some runs, as the least disturbed
+    by the rest of the machine."""
+    return min((import_times(module) for _ in range(runs)),
+               key=lambda times: times[module][1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--module", type=str, default="trueskill.main")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15,
+                        help="Number of slowest modules to print.")
+    parser.add_argument("--budget", type=float, default=IMPORT_BUDGET,
+                        help="Most seconds the import may take.")
+    args = parser.parse_args()
+
+    times = fastest_import(args.module, args.runs)
+    total = times[args.module][1]
+    print(f"{args.module}: {total * 1e3:.1f}ms, fastest of {args.runs} runs")
+    for name, (own, cumulative) in sorted(times.items(),
+                                          key=lambda item: -item[1][0]
+                                          )[:args.top]:
+        print(f"{name:40} {own * 1e3:8.2f}ms own "
+              f"{cumulative * 1e3:8.2f}ms cumulative")
+
+    failed = False
+    heavy = heavy_imports(times)
+    if heavy:
+        print(f"\nImports {', '.join(heavy)}")
+        failed = True
+    if total > args.budget:
+        print(f"\nOver the budget of {args.budget * 1e3:.0f}ms")
+        failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""Time per game of TrueSkillEnv before, during and after enabling
+Instrumentation, to check that it costs nothing once disabled, and print
+where the time went.
+
+Run from the repository root with:
+    python -m benchmarks.bench_instrumentation --games 2000
+"""
+import argparse
+import random
+from benchmarks.bench_compiled_graph import SHAPES, random_games, \
+    time_per_game
+from trueskill.engine.instrumentation import Instrumentation
+from trueskill.engine.true_skill import TrueSkillEnv
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--games", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--report", type=str, required=False,
+                        help="Also save the counts to this path, see "
+                             "Instrumentation.save.")
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    instrumentation = Instrumentation()
+    for name, team_sizes in SHAPES.items():
+        games = random_games(team_sizes, args.games, rng)
+        before = time_per_game(TrueSkillEnv, games)
+        with instrumentation:
+            enabled = time_per_game(TrueSkillEnv, games)
+        after = time_per_game(TrueSkillEnv, games)
+        print(f"{name}: {before * 1e6:.1f}us per game, "
+              f"{enabled * 1e6:.1f}us instrumented, "
+              f"{after * 1e6:.1f}us after disabling")
+
+    counts = instrumentation.to_dict()
+    print(f"\n{counts['gaussian_allocations']} Gaussians allocated")
+    for section in ("phases", "methods"):
+        for label, counter in sorted(counts[section].items(),
+                                     key=lambda item: -item[1]["seconds"]):
+            print(f"{label:32} {counter['calls']:10} calls "
+                  f"{counter['seconds']:8.3f}s "
+                  f"({counter['own_seconds']:.3f}s own)")
+    if args.report:
+        instrumentation.save(args.report)
+
+
+if __name__ == '__main__':
+    main()
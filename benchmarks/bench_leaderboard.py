@@ -0,0 +1,62 @@
+"""Time of a leaderboard page and rank lookup from Leaderboard against
+sorting every rating by conservative skill for each request.
+
+Run from the repository root with:
+    python -m benchmarks.bench_leaderboard --players 1000000
+"""
+import argparse
+import random
+import time
+from trueskill.data.leaderboard import Leaderboard
+from trueskill.utils.maths import Gaussian
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--players", type=int, default=1000000)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+    ratings = {f"p{i}": Gaussian(mu=rng.gauss(25, 6),
+                                 sigma=rng.uniform(1, 8.3))
+               for i in range(args.players)}
+    names = list(ratings)
+
+    start = time.perf_counter()
+    leaderboard = Leaderboard(ratings, seed=args.seed)
+    print(f"build: {time.perf_counter() - start:.2f}s")
+
+    updates = [{name: Gaussian(mu=rng.gauss(25, 6),
+                               sigma=rng.uniform(1, 8.3))}
+               for name in rng.sample(names, args.requests)]
+    start = time.perf_counter()
+    for update in updates:
+        leaderboard.update(update)
+    print(f"update: {(time.perf_counter() - start) / args.requests * 1e6:.1f}"
+          f"us per rating")
+
+    queried = rng.sample(names, args.requests)
+    start = time.perf_counter()
+    for player in queried:
+        leaderboard.rank(player)
+    print(f"rank: {(time.perf_counter() - start) / args.requests * 1e6:.1f}"
+          f"us")
+    pages = [rng.randrange(1, args.players // 20) for _ in range(args.requests)]
+    start = time.perf_counter()
+    for number in pages:
+        leaderboard.page(number, size=20)
+    page = (time.perf_counter() - start) / args.requests
+    print(f"page of 20: {page * 1e6:.1f}us")
+
+    start = time.perf_counter()
+    order = sorted(ratings, key=lambda p: ratings[p].mu - 3 * ratings[p].sigma,
+                   reverse=True)
+    order[:20]
+    full_sort = time.perf_counter() - start
+    print(f"sorting every rating: {full_sort * 1e3:.0f}ms "
+          f"({full_sort / page:.0f}x a page)")
+
+
+if __name__ == '__main__':
+    main()
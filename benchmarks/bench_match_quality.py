@@ -0,0 +1,45 @@
+"""Candidate pairings scored per second by match_quality against
+match_quality_arrays scoring a whole matrix of pairings in one call.
+
+Run from the repository root with:
+    python -m benchmarks.bench_match_quality --teams 1000 --team-size 5
+"""
+import argparse
+import time
+import numpy as np
+from trueskill.engine.match_quality import match_quality, team_arrays, \
+    match_quality_arrays
+from trueskill.utils.maths import Gaussian
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--teams", type=int, default=1000)
+    parser.add_argument("--team-size", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    rng = np.random.default_rng(args.seed)
+    mu = rng.uniform(10, 40, (args.teams, args.team_size))
+    sigma = rng.uniform(1, 8.3, (args.teams, args.team_size))
+    teams = [[Gaussian(mu=m, sigma=s) for m, s in zip(mu[i], sigma[i])]
+             for i in range(args.teams)]
+
+    pairs = min(args.teams, 200)
+    start = time.perf_counter()
+    for i in range(pairs):
+        for j in range(pairs):
+            match_quality([teams[i], teams[j]])
+    scalar = pairs ** 2 / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    sums = team_arrays(mu, sigma)
+    quality = match_quality_arrays(*(x[:, None] for x in sums),
+                                   *(x[None, :] for x in sums))
+    array = quality.size / (time.perf_counter() - start)
+    print(f"match_quality: {scalar:,.0f} pairings/s")
+    print(f"match_quality_arrays ({args.teams}x{args.teams}): "
+          f"{array:,.0f} pairings/s ({array / scalar:.0f}x)")
+
+
+if __name__ == '__main__':
+    main()
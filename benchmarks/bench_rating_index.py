@@ -0,0 +1,63 @@
+"""Build time, update time and top-K query time of RatingIndex against
+scanning every rating, on a large population.
+
+Run from the repository root with:
+    python -m benchmarks.bench_rating_index --players 1000000
+"""
+import argparse
+import random
+import time
+import numpy as np
+from trueskill.data.rating_index import RatingIndex
+from trueskill.engine.match_quality import match_quality_arrays
+from trueskill.utils.maths import Gaussian
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--players", type=int, default=1000000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--tolerance", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+    mu = np.array([rng.gauss(25, 6) for _ in range(args.players)])
+    sigma = np.array([rng.uniform(1, 8.3) for _ in range(args.players)])
+    names = [f"p{i}" for i in range(args.players)]
+    ratings = {name: Gaussian(mu=m, sigma=s)
+               for name, m, s in zip(names, mu.tolist(), sigma.tolist())}
+
+    start = time.perf_counter()
+    index = RatingIndex(ratings)
+    print(f"build: {time.perf_counter() - start:.2f}s")
+
+    updates = {name: Gaussian(mu=rng.gauss(25, 6), sigma=rng.uniform(1, 8.3))
+               for name in rng.sample(names, 1000)}
+    start = time.perf_counter()
+    index.update(updates)
+    print(f"update: {(time.perf_counter() - start) / len(updates) * 1e6:.1f}"
+          f"us per rating")
+
+    queued = rng.sample(names, args.queries)
+    start = time.perf_counter()
+    for player in queued:
+        index.best_opponents(player, k=args.k, tolerance=args.tolerance)
+    query = (time.perf_counter() - start) / args.queries
+    print(f"index query: {query * 1e3:.3f}ms")
+
+    # the same queries as a vectorized scan over every rating
+    mu = np.array([index.ratings[name].mu for name in names])
+    var = np.array([index.ratings[name].sigma ** 2 for name in names])
+    start = time.perf_counter()
+    for player in queued[:20]:
+        rating = index.ratings[player]
+        quality = match_quality_arrays(rating.mu, rating.sigma ** 2, 1,
+                                       mu, var, 1)
+        np.argpartition(-quality, args.k)[:args.k]
+    scan = (time.perf_counter() - start) / 20
+    print(f"NumPy scan: {scan * 1e3:.3f}ms ({scan / query:.0f}x slower)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""Speedup of rating a match log on a process pool, with the games split
+into waves of games that share no players, against rating it sequentially.
+
+Run from the repository root with:
+    python -m benchmarks.bench_scheduler --games 20000 --players 100000
+"""
+import argparse
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from trueskill.data.game import Game
+from trueskill.utils.calculate_ratings import _rate_game
+from trueskill.utils.maths import Gaussian
+from trueskill.utils.scheduler import partition_into_waves, \
+    rate_games_parallel
+
+
+def random_games(count, population, team_size, rng):
+    games = []
+    for _ in range(count):
+        players = [f"p{i}" for i in rng.sample(range(population),
+                                               2 * team_size)]
+        games.append(Game([players[:team_size], players[team_size:]],
+                          rng.sample([1, 2], 2)))
+    return games
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--games", type=int, default=20000)
+    parser.add_argument("--players", type=int, default=100000)
+    parser.add_argument("--team-size", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    games = random_games(args.games, args.players, args.team_size,
+                         random.Random(args.seed))
+    players = {p for game in games for team in game.teams for p in team}
+    waves = partition_into_waves(games)
+    print(f"{len(games)} games in {len(waves)} waves, "
+          f"{len(games) / len(waves):.0f} games per wave on average")
+
+    sequential = {p: Gaussian(mu=25, sigma=25 / 3) for p in players}
+    start = time.perf_counter()
+    for game in games:
+        _rate_game(sequential, game.teams, game.ranks, 25 / 300, 25 / 6)
+    baseline = time.perf_counter() - start
+    print(f"sequential: {baseline:.2f}s")
+
+    workers = 1
+    while workers <= (os.cpu_count() or 1):
+        ratings = {p: Gaussian(mu=25, sigma=25 / 3) for p in players}
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            start = time.perf_counter()
+            rate_games_parallel(ratings, games, executor=executor,
+                                max_workers=workers)
+            seconds = time.perf_counter() - start
+        identical = all(ratings[p].pi == r.pi and ratings[p].tau == r.tau
+                        for p, r in sequential.items())
+        print(f"{workers} workers: {seconds:.2f}s "
+              f"({baseline / seconds:.2f}x, identical: {identical})")
+        workers *= 2
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""Load generator for the rating server, reports the p50 and p99 latency
+of a game and the throughput in games per second.
+
+Start a server and run from the repository root with:
+    python -m trueskill.server --save-dir /tmp/ratings --port 7800
+    python -m benchmarks.bench_server --port 7800 --connections 32 --games 500
+
+or let the load generator start a server in a temporary directory with
+--spawn.
+"""
+import argparse
+import asyncio
+import json
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+
+async def client(host, port, games, latencies, rng, population, team_size,
+                 pipeline):
+    reader, writer = await asyncio.open_connection(host, port)
+    sent = {}
+    for i in range(games):
+        players = [f"p{p}" for p in rng.sample(range(population),
+                                               2 * team_size)]
+        request = {"id": i, "teams": [players[:team_size],
+                                      players[team_size:]],
+                   "ranks": rng.sample([1, 2], 2)}
+        sent[i] = time.perf_counter()
+        writer.write(json.dumps(request).encode() + b'\n')
+        await writer.drain()
+        if len(sent) >= pipeline:
+            response = json.loads(await reader.readline())
+            latencies.append(time.perf_counter() - sent.pop(response["id"]))
+    while sent:
+        response = json.loads(await reader.readline())
+        latencies.append(time.perf_counter() - sent.pop(response["id"]))
+    writer.close()
+    await writer.wait_closed()
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q / 100 * len(values)))]
+
+
+async def run(args):
+    rng = random.Random(args.seed)
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*(client(args.host, args.port, args.games,
+                                  latencies, random.Random(rng.random()),
+                                  args.players, args.team_size,
+                                  args.pipeline)
+                           for _ in range(args.connections)))
+    seconds = time.perf_counter() - start
+    print(f"{len(latencies)} games over {args.connections} connections in "
+          f"{seconds:.2f}s: {len(latencies) / seconds:.0f} games/s, "
+          f"p50 {percentile(latencies, 50) * 1e3:.2f}ms, "
+          f"p99 {percentile(latencies, 99) * 1e3:.2f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", type=str, default='127.0.0.1')
+    parser.add_argument("--port", type=int, default=7800)
+    parser.add_argument("--connections", type=int, default=32)
+    parser.add_argument("--games", type=int, default=500,
+                        help="Games sent on each connection.")
+    parser.add_argument("--pipeline", type=int, default=1,
+                        help="Games in flight on each connection.")
+    parser.add_argument("--players", type=int, default=10000)
+    parser.add_argument("--team-size", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--spawn", action='store_true',
+                        help="Start a server in a temporary directory.")
+    args = parser.parse_args()
+    if not args.spawn:
+        asyncio.run(run(args))
+        return
+    with tempfile.TemporaryDirectory() as save_dir:
+        server = subprocess.Popen([sys.executable, "-m", "trueskill.server",
+                                   "--port", str(args.port),
+                                   "--save-dir", save_dir],
+                                  stdout=subprocess.PIPE)
+        try:
+            # wait for the server to print that it is listening
+            server.stdout.readline()
+            asyncio.run(run(args))
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+"""Peak memory and throughput of calculate_skills_stream as the match log
+grows, with a fixed player population. The peak should stay flat.
+
+Run from the repository root with:
+    python -m benchmarks.bench_stream --sizes 10000 50000 200000
+"""
+import argparse
+import gzip
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from trueskill.utils.calculate_ratings import calculate_skills_stream
+
+
+def write_log(path, games, population, rng):
+    with gzip.open(path, 'wt') as f:
+        for i in range(games):
+            players = [f"p{p}" for p in rng.sample(range(population), 4)]
+            f.write(f"{players[0]}|{players[1]};{players[2]}|{players[3]},"
+                    f"{';'.join(map(str, rng.sample([1, 2], 2)))},{i}\n")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs='+',
+                        default=[10000, 50000, 200000])
+    parser.add_argument("--players", type=int, default=5000)
+    parser.add_argument("--checkpoint-every", type=int, default=50000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            match_log = os.path.join(tmp_dir, 'games.csv.gz')
+            write_log(match_log, size, args.players, rng)
+            tracemalloc.start()
+            start = time.perf_counter()
+            calculate_skills_stream(match_log, save_dir=tmp_dir,
+                                    checkpoint_every=args.checkpoint_every)
+            seconds = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        print(f"{size} games: {size / seconds:.0f} games/s, "
+              f"peak {peak / 2 ** 20:.1f}MiB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+"""Memory and per iteration time of TrueSkill Through Time smoothing as the
+match history grows, with a fixed player population. The memory should grow
+by a fixed amount per game.
+
+Run from the repository root with:
+    python -m benchmarks.bench_through_time --sizes 10000 50000 200000
+"""
+import argparse
+import random
+import time
+import tracemalloc
+from trueskill.data.game import Game
+from trueskill.engine.through_time import TrueSkillThroughTime
+
+
+def generate_games(games, population, rng):
+    for _ in range(games):
+        players = [f"p{p}" for p in rng.sample(range(population), 4)]
+        yield Game([players[:2], players[2:]], rng.sample([1, 2], 2))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs='+',
+                        default=[10000, 50000, 200000])
+    parser.add_argument("--players", type=int, default=5000)
+    parser.add_argument("--iterations", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    for size in args.sizes:
+        tracemalloc.start()
+        start = time.perf_counter()
+        smoother = TrueSkillThroughTime(generate_games(size, args.players,
+                                                       rng))
+        build = time.perf_counter() - start
+        memory, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"{size} games: built in {build:.2f}s, "
+              f"{memory / size:.0f} bytes/game")
+        smoother.run(tolerance=0, max_iterations=args.iterations,
+                     on_iteration=lambda stats: print(
+                         f"  step {stats.step:.5f}, {stats.seconds:.2f}s, "
+                         f"{size / stats.seconds:.0f} games/s"))
+
+
+if __name__ == '__main__':
+    main()
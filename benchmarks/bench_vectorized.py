@@ -0,0 +1,78 @@
+"""Throughput of the vectorized closed-form updates against the scalar loop.
+
+Run from the repository root with:
+    python -m benchmarks.bench_vectorized --games 100000
+"""
+import argparse
+import time
+import numpy as np
+from trueskill.engine.true_skill_two_player import update_rating
+from trueskill.engine.true_skill_two_teams import update_ratings_in_team
+from trueskill.engine.true_skill_vectorized import update_rating_arrays, \
+    update_ratings_in_team_arrays
+from trueskill.utils.maths import Gaussian
+
+
+def _games_per_second(fn, games):
+    start = time.perf_counter()
+    fn()
+    return games / (time.perf_counter() - start)
+
+
+def bench_1vs1(games, rng):
+    mu = rng.uniform(0, 50, (2, games))
+    sigma = rng.uniform(0.5, 9, (2, games))
+    winners = [Gaussian(mu=m, sigma=s) for m, s in zip(mu[0], sigma[0])]
+    losers = [Gaussian(mu=m, sigma=s) for m, s in zip(mu[1], sigma[1])]
+
+    def scalar():
+        for winner, loser in zip(winners, losers):
+            update_rating(winner, loser)
+
+    def vectorized():
+        update_rating_arrays(mu[0], sigma[0], mu[1], sigma[1])
+
+    return (_games_per_second(scalar, games),
+            _games_per_second(vectorized, games))
+
+
+def bench_teams(games, team_size, rng):
+    shape = (games, team_size)
+    mu = rng.uniform(0, 50, (2,) + shape)
+    sigma = rng.uniform(0.5, 9, (2,) + shape)
+    mask = np.ones(shape, dtype=bool)
+
+    def scalar():
+        for i in range(games):
+            winning = {j: Gaussian(mu=mu[0, i, j], sigma=sigma[0, i, j])
+                       for j in range(team_size)}
+            losing = {j: Gaussian(mu=mu[1, i, j], sigma=sigma[1, i, j])
+                      for j in range(team_size)}
+            update_ratings_in_team(winning, losing)
+
+    def vectorized():
+        update_ratings_in_team_arrays(mu[0], sigma[0], mask,
+                                      mu[1], sigma[1], mask)
+
+    return (_games_per_second(scalar, games),
+            _games_per_second(vectorized, games))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--games", type=int, default=100000)
+    parser.add_argument("--team-size", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    rng = np.random.default_rng(args.seed)
+
+    scalar, vectorized = bench_1vs1(args.games, rng)
+    print(f"1vs1:  scalar {scalar:,.0f} games/s, vectorized "
+          f"{vectorized:,.0f} games/s ({vectorized / scalar:.0f}x)")
+    scalar, vectorized = bench_teams(args.games, args.team_size, rng)
+    print(f"{args.team_size}vs{args.team_size}:  scalar {scalar:,.0f} games/s,"
+          f" vectorized {vectorized:,.0f} games/s ({vectorized / scalar:.0f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,282 @@
+"""Reproducible benchmark suite of the engines, the CSV data source and
+rating games end to end, on synthetic games from benchmarks.synthetic.
+
+Every case is run --repeats times and the fastest run is kept, as the
+least disturbed by the rest of the machine. The results can be saved as
+JSON and compared against a baseline saved from another commit, a case
+slower than the baseline by more than --threshold is a regression and
+makes the suite exit with status 1.
+
+Run from the repository root with:
+    python -m benchmarks.suite --output before.json
+    python -m benchmarks.suite --compare before.json --threshold 0.1
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Tuple
+from benchmarks.synthetic import generate_games, generate_ratings, \
+    write_match_log, write_ratings
+from trueskill.data.player_ratings import CsvSource
+from trueskill.engine.true_skill import TrueSkillEnv
+from trueskill.engine.true_skill_two_player import update_rating
+from trueskill.engine.true_skill_two_teams import update_ratings_in_team
+from trueskill.utils.calculate_ratings import calculate_skill, \
+    calculate_skills_batch
+from trueskill.utils.maths import v_truncate, w_truncate
+
+# a case sets up its inputs in a temporary directory and returns a
+# function running the operation being timed some number of times, and
+# that number
+Case = Callable[[argparse.Namespace, str], Tuple[Callable[[], None], int]]
+CASES: Dict[str, Case] = {}
+
+
+def case(name: str):
+    def register(setup: Case) -> Case:
+        CASES[name] = setup
+        return setup
+    return register
+
+
+def _ranked_teams(game, ratings):
+    order = sorted(range(len(game.teams)), key=lambda j: game.ranks[j])
+    return [{p: ratings[p] for p in game.teams[j]} for j in order]
+
+
+@case("maths.v_truncate")
+def _v_truncate(args, tmp_dir):
+    rng = random.Random(args.seed)
+    xs = [rng.uniform(-6, 6) for _ in range(args.games * 10)]
+
+    def run():
+        for x in xs:
+            v_truncate(x)
+    return run, len(xs)
+
+
+@case("maths.w_truncate")
+def _w_truncate(args, tmp_dir):
+    rng = random.Random(args.seed)
+    xs = [rng.uniform(-6, 6) for _ in range(args.games * 10)]
+
+    def run():
+        for x in xs:
+            w_truncate(x)
+    return run, len(xs)
+
+
+@case("two_player.update_rating")
+def _update_rating(args, tmp_dir):
+    ratings = generate_ratings(args.population, args.seed)
+    games = generate_games(args.games, args.population, skew=args.skew,
+                           seed=args.seed)
+    pairs = [[rating for team in _ranked_teams(game, ratings)
+              for rating in team.values()] for game in games]
+
+    def run():
+        for winner, loser in pairs:
+            update_rating(winner, loser)
+    return run, len(pairs)
+
+
+@case("two_teams.update_ratings_in_team")
+def _update_ratings_in_team(args, tmp_dir):
+    ratings = generate_ratings(args.population, args.seed)
+    games = generate_games(args.games, args.population,
+                           team_sizes=tuple(args.team_size), skew=args.skew,
+                           seed=args.seed)
+    games = [_ranked_teams(game, ratings) for game in games]
+
+    def run():
+        for winning, losing in games:
+            # the update is in place, so on copies of the teams
+            update_ratings_in_team(dict(winning), dict(losing))
+    return run, len(games)
+
+
+@case("true_skill.TrueSkillEnv.update_ratings")
+def _true_skill_env(args, tmp_dir):
+    ratings = generate_ratings(args.population, args.seed)
+    games = generate_games(args.games, args.population,
+                           team_counts=tuple(args.teams),
+                           team_sizes=tuple(args.team_size), skew=args.skew,
+                           seed=args.seed)
+    games = [_ranked_teams(game, ratings) for game in games]
+
+    def run():
+        for teams in games:
+            TrueSkillEnv(teams).update_ratings()
+    return run, len(games)
+
+
+@case("csv_source.load")
+def _csv_load(args, tmp_dir):
+    write_ratings(tmp_dir, generate_ratings(args.population, args.seed))
+
+    def run():
+        CsvSource(tmp_dir)
+    return run, 1
+
+
+@case("csv_source.save")
+def _csv_save(args, tmp_dir):
+    write_ratings(tmp_dir, generate_ratings(args.population, args.seed))
+    source = CsvSource(tmp_dir)
+
+    def run():
+        source.save_player_ratings()
+    return run, 1
+
+
+@case("calculate_skill")
+def _calculate_skill(args, tmp_dir):
+    ratings = generate_ratings(args.population, args.seed)
+    games = generate_games(max(args.games // 20, 1), args.population,
+                           team_counts=tuple(args.teams),
+                           team_sizes=tuple(args.team_size), skew=args.skew,
+                           seed=args.seed)
+    game_infos = []
+    for i, game in enumerate(games):
+        game_info = os.path.join(tmp_dir, f"game{i}.csv")
+        with open(game_info, "w") as f:
+            f.writelines(",".join(team) + "\n" for team in game.teams)
+        game_infos.append((game_info, game.ranks))
+
+    def run():
+        # every run starts from the same ratings
+        write_ratings(tmp_dir, ratings)
+        for game_info, ranks in game_infos:
+            calculate_skill(game_info, ranks, save_dir=tmp_dir)
+    return run, len(game_infos)
+
+
+@case("calculate_skills_batch")
+def _calculate_skills_batch(args, tmp_dir):
+    ratings = generate_ratings(args.population, args.seed)
+    games = generate_games(args.games, args.population,
+                           team_counts=tuple(args.teams),
+                           team_sizes=tuple(args.team_size), skew=args.skew,
+                           seed=args.seed)
+    match_log = os.path.join(tmp_dir, "games.jsonl")
+    write_match_log(match_log, games)
+
+    def run():
+        write_ratings(tmp_dir, ratings)
+        calculate_skills_batch(match_log, save_dir=tmp_dir)
+    return run, len(games)
+
+
+def time_case(setup: Case, args: argparse.Namespace) -> Dict:
+    """The fastest of args.repeats runs of a case, in seconds per
+    operation."""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        run, ops = setup(args, tmp_dir)
+        times = []
+        for _ in range(args.repeats):
+            gc.collect()
+            gc.disable()
+            try:
+                start = time.perf_counter()
+                run()
+                times.append(time.perf_counter() - start)
+            finally:
+                gc.enable()
+    return {"seconds": min(times) / ops, "ops": ops}
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict],
+            threshold: float) -> List[str]:
+    """Prints the change of every case in both results and baseline.
+
+    Returns:
+        The cases slower than the baseline by more than the threshold, a
+        fraction of the baseline time.
+    """
+    regressions = []
+    for name in results:
+        if name not in baseline:
+            continue
+        old, new = baseline[name]["seconds"], results[name]["seconds"]
+        change = new / old - 1
+        regressed = change > threshold
+        if regressed:
+            regressions.append(name)
+        print(f"{name:40} {old * 1e6:12.2f}us -> {new * 1e6:12.2f}us "
+              f"{change:+7.1%}{'  REGRESSION' if regressed else ''}")
+    return regressions
+
+
+def _commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"],
+                              capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--games", type=int, default=1000,
+                        help="Games rated by each engine case.")
+    parser.add_argument("--population", type=int, default=10000)
+    parser.add_argument("--teams", type=int, nargs=2, default=[2, 4],
+                        metavar=("MIN", "MAX"),
+                        help="Teams per game of the factor graph and end to "
+                             "end cases.")
+    parser.add_argument("--team-size", type=int, nargs=2, default=[1, 4],
+                        metavar=("MIN", "MAX"))
+    parser.add_argument("--skew", type=float, default=1.0,
+                        help="Zipf exponent of player activity, 0 for every "
+                             "player equally active.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--cases", type=str, nargs='+', choices=CASES,
+                        default=list(CASES), metavar="CASE",
+                        help=f"Cases to run, of {', '.join(CASES)}.")
+    parser.add_argument("--output", type=str, required=False,
+                        help="Path to save the results to as JSON.")
+    parser.add_argument("--compare", type=str, required=False,
+                        metavar="BASELINE",
+                        help="Results saved with --output to compare with.")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="With --compare, the fraction slower than the "
+                             "baseline that is a regression.")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    settings = {key: value for key, value in vars(args).items()
+                if key not in ("cases", "output", "compare", "threshold")}
+    results = {}
+    for name in args.cases:
+        results[name] = time_case(CASES[name], args)
+        print(f"{name:40} {results[name]['seconds'] * 1e6:12.2f}us per op")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"commit": _commit(),
+                       "python": platform.python_version(),
+                       "platform": platform.platform(),
+                       "settings": settings, "results": results}, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline["settings"] != settings:
+            print("Warning: the baseline was run with different settings.")
+        print(f"\nAgainst {args.compare} ({baseline['commit']}):")
+        if compare(results, baseline["results"], args.threshold):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
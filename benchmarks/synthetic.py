@@ -0,0 +1,90 @@
+"""Synthetic players, ratings and games for the benchmarks.
+
+Everything is drawn from a seeded random.Random so the same arguments give
+the same games on every machine and commit.
+"""
+import bisect
+import itertools
+import json
+import os
+import random
+from typing import Dict, List, Tuple
+from trueskill.data.game import Game
+from trueskill.utils.maths import Gaussian
+
+
+def activity_weights(population: int, skew: float) -> List[float]:
+    """Cumulative weights of how often each player plays, Zipf distributed
+    so player i plays in proportion to 1 / (i + 1) ** skew. A skew of 0
+    makes every player equally active, 1 is a typical long tail."""
+    return list(itertools.accumulate(1 / (i + 1) ** skew
+                                     for i in range(population)))
+
+
+def player_name(i: int) -> str:
+    return f"player{i}"
+
+
+def generate_ratings(population: int, seed=0) -> Dict[str, Gaussian]:
+    """A rating for every player, with the spread of an established
+    population."""
+    rng = random.Random(seed)
+    return {player_name(i): Gaussian(mu=rng.gauss(25, 5),
+                                     sigma=rng.uniform(1, 25 / 3))
+            for i in range(population)}
+
+
+def generate_games(count: int, population=1000,
+                   team_counts: Tuple[int, int] = (2, 2),
+                   team_sizes: Tuple[int, int] = (1, 1), skew=1.0,
+                   seed=0) -> List[Game]:
+    """Random games between the players of a population.
+
+    Args:
+        count: The number of games.
+        population: The number of players to draw from.
+        team_counts: The least and most teams in a game.
+        team_sizes: The least and most players in a team.
+        skew: The Zipf exponent of how often each player plays, see
+        activity_weights.
+        seed: Seed of the random draws.
+    Returns:
+        The games, one second apart, each team with a distinct rank.
+    Raises:
+        ValueError: If a game could need more players than the population.
+    """
+    if team_counts[1] * team_sizes[1] > population:
+        raise ValueError("The population is too small for the largest "
+                         "game.")
+    rng = random.Random(seed)
+    weights = activity_weights(population, skew)
+    total = weights[-1]
+    games = []
+    for timestamp in range(count):
+        sizes = [rng.randint(*team_sizes)
+                 for _ in range(rng.randint(*team_counts))]
+        players = {}
+        while len(players) < sum(sizes):
+            i = bisect.bisect_left(weights, rng.random() * total)
+            players[player_name(min(i, population - 1))] = None
+        players = iter(players)
+        teams = [[next(players) for _ in range(size)] for size in sizes]
+        ranks = list(range(1, len(teams) + 1))
+        rng.shuffle(ranks)
+        games.append(Game(teams, ranks, timestamp=float(timestamp)))
+    return games
+
+
+def write_match_log(path: str, games: List[Game]):
+    """Writes games as a JSON Lines match log."""
+    with open(path, "w") as f:
+        for game in games:
+            f.write(json.dumps({"teams": game.teams, "ranks": game.ranks,
+                                "timestamp": game.timestamp}) + "\n")
+
+
+def write_ratings(data_dir: str, ratings: Dict[str, Gaussian]):
+    """Writes ratings as the true_skills.csv of a CsvSource."""
+    with open(os.path.join(data_dir, "true_skills.csv"), "w") as f:
+        for name, rating in ratings.items():
+            f.write(f"{name},{rating.mu},{rating.sigma}\n")
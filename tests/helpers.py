@@ -0,0 +1,11 @@
+from trueskill.utils.maths import Gaussian
+
+
+def random_teams(team_sizes, rng):
+    """Teams of the given sizes with ratings drawn from rng."""
+    teams = []
+    for j, size in enumerate(team_sizes):
+        teams.append({f"player{j}_{i}": Gaussian(
+            mu=rng.uniform(0, 50), sigma=rng.uniform(1, 9))
+            for i in range(size)})
+    return teams
@@ -0,0 +1,52 @@
+import unittest
+from collections import Counter
+from benchmarks.suite import compare
+from benchmarks.synthetic import generate_games
+from trueskill.data.game import validate_teams, validate_ranks
+
+
+class TestSyntheticGames(unittest.TestCase):
+    def test_games_follow_the_requested_shape(self):
+        # when
+        games = generate_games(500, population=50, team_counts=(2, 4),
+                               team_sizes=(1, 3), skew=1.0, seed=1)
+
+        # then
+        for game in games:
+            validate_teams(game.teams)
+            validate_ranks(game.teams, game.ranks)
+            self.assertTrue(2 <= len(game.teams) <= 4)
+            self.assertTrue(all(1 <= len(team) <= 3 for team in game.teams))
+            self.assertEqual(sorted(game.ranks),
+                             list(range(1, len(game.teams) + 1)))
+        self.assertEqual(generate_games(500, population=50,
+                                        team_counts=(2, 4),
+                                        team_sizes=(1, 3), skew=1.0, seed=1),
+                         games)
+
+    def test_skew_concentrates_activity(self):
+        # when
+        flat = generate_games(2000, population=100, skew=0.0)
+        skewed = generate_games(2000, population=100, skew=1.5)
+
+        # then
+        def top_share(games):
+            counts = Counter(p for game in games for team in game.teams
+                             for p in team)
+            return counts.most_common(1)[0][1] / sum(counts.values())
+        self.assertGreater(top_share(skewed), 5 * top_share(flat))
+
+
+class TestCompare(unittest.TestCase):
+    def test_slower_cases_past_the_threshold_are_regressions(self):
+        # given
+        baseline = {"a": {"seconds": 1.0}, "b": {"seconds": 1.0},
+                    "c": {"seconds": 1.0}}
+        results = {"a": {"seconds": 1.05}, "b": {"seconds": 1.2},
+                   "d": {"seconds": 5.0}}
+
+        # when
+        regressions = compare(results, baseline, threshold=0.1)
+
+        # then
+        self.assertEqual(regressions, ["b"])
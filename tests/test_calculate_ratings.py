@@ -0,0 +1,359 @@
+import json
+import os
+import tempfile
+import unittest
+from trueskill.data.player_ratings import CsvSource
+from trueskill.utils.calculate_ratings import calculate_skill, \
+    calculate_skills_batch, calculate_skills_stream, calculate_skill_1vs1, \
+    calculate_skills_1teamvs1team
+
+
+class TestCalculateSkillsBatch(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.batch_dir = os.path.join(self.tmp_dir.name, 'batch')
+        self.single_dir = os.path.join(self.tmp_dir.name, 'single')
+        os.mkdir(self.batch_dir)
+        os.mkdir(self.single_dir)
+        self.games = [
+            {"teams": [["a", "b"], ["c", "d"]], "ranks": [2, 1],
+             "weights": {"b": 0.5}},
+            {"teams": [["a"], ["c"], ["e"]], "ranks": [1, 3, 2]},
+            {"teams": [["b"], ["e"]], "ranks": [1, 2]},
+        ]
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def test_batch_agrees_with_one_game_at_a_time(self):
+        # given
+        match_log = os.path.join(self.tmp_dir.name, 'games.jsonl')
+        with open(match_log, 'w') as f:
+            for game in self.games:
+                f.write(json.dumps(game) + '\n')
+
+        # when
+        # we rate the games one invocation at a time
+        game_info = os.path.join(self.tmp_dir.name, 'game.csv')
+        for game in self.games:
+            with open(game_info, 'w') as f:
+                for team in game["teams"]:
+                    f.write(",".join(team) + '\n')
+            calculate_skill(game_info, game["ranks"],
+                            save_dir=self.single_dir,
+                            weights=game.get("weights"))
+        # and we rate the whole match log in one call
+        timings = calculate_skills_batch(match_log, save_dir=self.batch_dir)
+
+        # then
+        self.assertEqual(set(timings), {"parse", "prefetch", "inference",
+                                         "persist"})
+        single = CsvSource(self.single_dir).data
+        batch = CsvSource(self.batch_dir).data
+        self.assertEqual(set(batch), {"a", "b", "c", "d", "e"})
+        for player in single:
+            # ratings round trip through the CSV as mu and sigma
+            self.assertAlmostEqual(batch[player].mu, single[player].mu, 10)
+            self.assertAlmostEqual(batch[player].sigma, single[player].sigma,
+                                   10)
+
+    def test_batch_with_workers_agrees_with_sequential_batch(self):
+        # given
+        match_log = os.path.join(self.tmp_dir.name, 'games.jsonl')
+        with open(match_log, 'w') as f:
+            for game in self.games:
+                f.write(json.dumps(game) + '\n')
+
+        # when
+        calculate_skills_batch(match_log, save_dir=self.single_dir)
+        calculate_skills_batch(match_log, save_dir=self.batch_dir, workers=2)
+
+        # then
+        with open(os.path.join(self.single_dir, 'true_skills.csv')) as f:
+            sequential = f.read()
+        with open(os.path.join(self.batch_dir, 'true_skills.csv')) as f:
+            self.assertEqual(f.read(), sequential)
+
+    def test_tied_ranks_are_rated_as_draws(self):
+        # given
+        match_log = os.path.join(self.tmp_dir.name, 'games.jsonl')
+        with open(match_log, 'w') as f:
+            f.write(json.dumps({"teams": [["a"], ["b"], ["c"]],
+                                "ranks": [2, 1, 1]}) + '\n')
+
+        # when
+        calculate_skills_batch(match_log, save_dir=self.batch_dir,
+                               draw_probability=0.1)
+
+        # then
+        ratings = CsvSource(self.batch_dir).data
+        self.assertAlmostEqual(ratings["b"].mu, ratings["c"].mu, 1)
+        self.assertGreater(ratings["b"].mu, ratings["a"].mu)
+        with self.assertRaises(ValueError):
+            calculate_skills_batch(match_log, save_dir=self.single_dir)
+
+    def test_game_failing_to_rate_is_reported_and_skipped(self):
+        # given
+        # the tie can't be rated without a draw probability
+        games = self.games[:2] + [{"teams": [["c"], ["d"]], "ranks": [1, 1]}]
+        games += self.games[2:]
+        match_log = os.path.join(self.tmp_dir.name, 'games.jsonl')
+        with open(match_log, 'w') as f:
+            for game in games:
+                f.write(json.dumps(game) + '\n')
+        good_log = os.path.join(self.tmp_dir.name, 'good.jsonl')
+        with open(good_log, 'w') as f:
+            for game in self.games:
+                f.write(json.dumps(game) + '\n')
+        calculate_skills_batch(good_log, save_dir=self.single_dir)
+        with open(os.path.join(self.single_dir, 'true_skills.csv')) as f:
+            expected = f.read()
+
+        for workers in [None, 2]:
+            # when
+            skipped = []
+            calculate_skills_batch(
+                match_log, save_dir=self.batch_dir, workers=workers,
+                on_error=lambda game, e: skipped.append(game.line_num))
+            os.rename(os.path.join(self.batch_dir, 'true_skills.csv'),
+                      os.path.join(self.batch_dir, f'{workers}.csv'))
+
+            # then
+            self.assertEqual(skipped, [3])
+            with open(os.path.join(self.batch_dir, f'{workers}.csv')) as f:
+                self.assertEqual(f.read(), expected)
+
+    def test_game_failing_to_rate_keeps_the_games_before_it(self):
+        # given
+        match_log = os.path.join(self.tmp_dir.name, 'games.jsonl')
+        with open(match_log, 'w') as f:
+            f.write(json.dumps(self.games[0]) + '\n')
+            f.write(json.dumps({"teams": [["a"], ["e"]],
+                                "ranks": [1, 1]}) + '\n')
+
+        # when, then
+        with self.assertRaisesRegex(ValueError, "line 2"):
+            calculate_skills_batch(match_log, save_dir=self.batch_dir)
+        ratings = CsvSource(self.batch_dir).data
+        self.assertLess(ratings["c"].sigma, 25 / 3)
+
+
+class TestCalculateSkillsStream(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.match_log = os.path.join(self.tmp_dir.name, 'games.jsonl')
+        with open(self.match_log, 'w') as f:
+            for i in range(5):
+                game = {"teams": [["a", "b"], ["c"], [f"d{i}"]],
+                        "ranks": [i % 3 + 1, (i + 1) % 3 + 1,
+                                  (i + 2) % 3 + 1]}
+                f.write(json.dumps(game) + '\n')
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def assert_same_ratings(self, data_dir, expected_dir):
+        ratings = CsvSource(data_dir).data
+        expected = CsvSource(expected_dir).data
+        self.assertEqual(set(ratings), set(expected))
+        for player in expected:
+            # ratings round trip through the CSV as mu and sigma
+            self.assertAlmostEqual(ratings[player].mu, expected[player].mu,
+                                   10)
+            self.assertAlmostEqual(ratings[player].sigma,
+                                   expected[player].sigma, 10)
+
+    def test_stream_agrees_with_batch_and_checkpoints(self):
+        # given
+        stream_dir = os.path.join(self.tmp_dir.name, 'stream')
+        batch_dir = os.path.join(self.tmp_dir.name, 'batch')
+        os.mkdir(stream_dir)
+        os.mkdir(batch_dir)
+        checkpoints = []
+
+        # when
+        rated = calculate_skills_stream(self.match_log, save_dir=stream_dir,
+                                        checkpoint_every=2,
+                                        on_checkpoint=checkpoints.append)
+        calculate_skills_batch(self.match_log, save_dir=batch_dir)
+
+        # then
+        self.assertEqual(rated, 5)
+        self.assertEqual(checkpoints, [2, 4, 5])
+        self.assert_same_ratings(stream_dir, batch_dir)
+
+    def test_resuming_from_a_checkpoint_gives_the_same_ratings(self):
+        # given
+        resumed_dir = os.path.join(self.tmp_dir.name, 'resumed')
+        full_dir = os.path.join(self.tmp_dir.name, 'full')
+        os.mkdir(resumed_dir)
+        os.mkdir(full_dir)
+        calculate_skills_stream(self.match_log, save_dir=full_dir)
+        # a run that was interrupted after its first checkpoint
+        lines = open(self.match_log).readlines()
+        partial_log = os.path.join(self.tmp_dir.name, 'partial.jsonl')
+        with open(partial_log, 'w') as f:
+            f.writelines(lines[:3])
+        calculate_skills_stream(partial_log, save_dir=resumed_dir)
+
+        # when
+        rated = calculate_skills_stream(self.match_log, save_dir=resumed_dir,
+                                        start=3)
+
+        # then
+        self.assertEqual(rated, 5)
+        self.assert_same_ratings(resumed_dir, full_dir)
+
+    def test_game_failing_to_rate_saves_the_games_before_it(self):
+        # given
+        lines = open(self.match_log).readlines()
+        # the tie can't be rated without a draw probability
+        lines[2] = json.dumps({"teams": [["a"], ["c"]],
+                               "ranks": [1, 1]}) + '\n'
+        with open(self.match_log, 'w') as f:
+            f.writelines(lines)
+        good_log = os.path.join(self.tmp_dir.name, 'good.jsonl')
+        with open(good_log, 'w') as f:
+            f.writelines(lines[:2])
+        good_dir = os.path.join(self.tmp_dir.name, 'good')
+        stream_dir = os.path.join(self.tmp_dir.name, 'stream')
+        os.mkdir(good_dir)
+        os.mkdir(stream_dir)
+        calculate_skills_stream(good_log, save_dir=good_dir)
+        checkpoints = []
+
+        # when, then
+        with self.assertRaisesRegex(ValueError, "line 3"):
+            calculate_skills_stream(self.match_log, save_dir=stream_dir,
+                                    checkpoint_every=10,
+                                    on_checkpoint=checkpoints.append)
+        self.assertEqual(checkpoints, [2])
+        self.assert_same_ratings(stream_dir, good_dir)
+
+    def test_game_failing_to_rate_is_reported_and_skipped(self):
+        # given
+        lines = open(self.match_log).readlines()
+        bad_log = os.path.join(self.tmp_dir.name, 'bad.jsonl')
+        with open(bad_log, 'w') as f:
+            f.writelines(lines[:2])
+            f.write(json.dumps({"teams": [["a"], ["c"]],
+                                "ranks": [1, 1]}) + '\n')
+            f.writelines(lines[2:])
+        good_dir = os.path.join(self.tmp_dir.name, 'good')
+        stream_dir = os.path.join(self.tmp_dir.name, 'stream')
+        os.mkdir(good_dir)
+        os.mkdir(stream_dir)
+        calculate_skills_stream(self.match_log, save_dir=good_dir)
+        skipped = []
+
+        # when
+        rated = calculate_skills_stream(
+            bad_log, save_dir=stream_dir,
+            on_error=lambda game, e: skipped.append(game.line_num))
+
+        # then
+        self.assertEqual(rated, 6)
+        self.assertEqual(skipped, [3])
+        self.assert_same_ratings(stream_dir, good_dir)
+
+
+class TestTimeDecay(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        day = 86400
+        self.games = [
+            {"teams": [["a"], ["b"]], "ranks": [1, 2], "timestamp": 0},
+            {"teams": [["b"], ["c"]], "ranks": [1, 2], "timestamp": day},
+            {"teams": [["a"], ["c"]], "ranks": [2, 1],
+             "timestamp": 30 * day},
+        ]
+        self.match_log = os.path.join(self.tmp_dir.name, 'games.jsonl')
+        with open(self.match_log, 'w') as f:
+            for game in self.games:
+                f.write(json.dumps(game) + '\n')
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def _dir(self, name):
+        path = os.path.join(self.tmp_dir.name, name)
+        os.mkdir(path)
+        return path
+
+    def test_every_path_decays_ratings_by_the_time_between_games(self):
+        # given
+        single_dir, batch_dir, stream_dir, workers_dir = (
+            self._dir(name) for name in ('single', 'batch', 'stream',
+                                         'workers'))
+
+        # when
+        game_info = os.path.join(self.tmp_dir.name, 'game.csv')
+        for game in self.games:
+            with open(game_info, 'w') as f:
+                for team in game["teams"]:
+                    f.write(",".join(team) + '\n')
+            calculate_skill(game_info, game["ranks"], save_dir=single_dir,
+                            timestamp=game["timestamp"], time_decay=0.5)
+        calculate_skills_batch(self.match_log, save_dir=batch_dir,
+                               time_decay=0.5)
+        calculate_skills_batch(self.match_log, save_dir=workers_dir,
+                               workers=2, time_decay=0.5)
+        calculate_skills_stream(self.match_log, save_dir=stream_dir,
+                                time_decay=0.5)
+
+        # then
+        expected = CsvSource(single_dir)
+        self.assertEqual(expected.last_played,
+                         {"a": 30 * 86400, "b": 86400, "c": 30 * 86400})
+        for data_dir in (batch_dir, workers_dir, stream_dir):
+            source = CsvSource(data_dir)
+            self.assertEqual(source.last_played, expected.last_played)
+            for player, rating in expected.data.items():
+                self.assertAlmostEqual(source.data[player].mu, rating.mu, 10)
+                self.assertAlmostEqual(source.data[player].sigma,
+                                       rating.sigma, 10)
+
+    def test_returning_players_are_more_uncertain(self):
+        # given
+        decayed_dir, fixed_dir = self._dir('decayed'), self._dir('fixed')
+
+        # when
+        calculate_skills_batch(self.match_log, save_dir=decayed_dir,
+                               time_decay=0.5)
+        calculate_skills_batch(self.match_log, save_dir=fixed_dir)
+
+        # then
+        # a comes back after a month, b after a day
+        decayed = CsvSource(decayed_dir).data
+        fixed = CsvSource(fixed_dir).data
+        self.assertGreater(decayed["a"].sigma - fixed["a"].sigma,
+                           decayed["b"].sigma - fixed["b"].sigma)
+        self.assertGreater(decayed["b"].sigma, fixed["b"].sigma)
+        # a larger move for a's loss after the break
+        self.assertLess(decayed["a"].mu, fixed["a"].mu)
+
+
+class TestLegacyHelpers(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def test_calculate_skills_1teamvs1team_saves_ratings(self):
+        # when
+        calculate_skills_1teamvs1team(["a", "b"], ["c"],
+                                      save_dir=self.tmp_dir.name)
+
+        # then
+        ratings = CsvSource(self.tmp_dir.name).data
+        self.assertEqual(set(ratings), {"a", "b", "c"})
+        self.assertGreater(ratings["a"].mu, ratings["c"].mu)
+
+    def test_calculate_skill_1vs1_saves_ratings(self):
+        # when
+        calculate_skill_1vs1("a", "b", save_dir=self.tmp_dir.name)
+
+        # then
+        ratings = CsvSource(self.tmp_dir.name).data
+        self.assertGreater(ratings["a"].mu, ratings["b"].mu)
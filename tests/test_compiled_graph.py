@@ -0,0 +1,72 @@
+import random
+import unittest
+from trueskill.engine.compiled_graph import CompiledTrueSkillEnv, \
+    get_compiled_graph
+from trueskill.engine.true_skill import TrueSkillEnv
+from tests.helpers import random_teams
+
+
+class TestCompiledGraph(unittest.TestCase):
+    def setUp(self) -> None:
+        self.rng = random.Random(0)
+
+    def test_agrees_exactly_with_true_skill_env(self):
+        for team_sizes in [(1, 1), (2, 3), (1, 1, 1), (4, 4, 4, 4),
+                           (3, 1, 2, 5, 1)]:
+            # given
+            teams = random_teams(team_sizes, self.rng)
+
+            # when
+            expected = TrueSkillEnv(teams).update_ratings()
+            actual = CompiledTrueSkillEnv(teams).update_ratings()
+
+            # then
+            self.assertEqual(expected, actual, msg=f"shape {team_sizes}")
+
+    def test_agrees_exactly_with_true_skill_env_with_draws(self):
+        for team_sizes, ranks in [((1, 1), [1, 1]), ((2, 3), [1, 2]),
+                                  ((1, 1, 1), [1, 1, 2]),
+                                  ((4, 4, 4, 4), [1, 2, 2, 3])]:
+            # given
+            teams = random_teams(team_sizes, self.rng)
+
+            # when
+            expected = TrueSkillEnv(teams, ranks=ranks,
+                                    draw_probability=0.1).update_ratings()
+            actual = CompiledTrueSkillEnv(teams, ranks=ranks,
+                                          draw_probability=0.1) \
+                .update_ratings()
+
+            # then
+            self.assertEqual(expected, actual, msg=f"ranks {ranks}")
+
+    def test_agrees_exactly_with_true_skill_env_with_weights(self):
+        # given
+        teams = random_teams((3, 2, 4), self.rng)
+        players = [player for team in teams for player in team]
+        weights = {player: self.rng.uniform(0, 1) for player in players[::2]}
+        weights[players[1]] = 0.0
+
+        # when
+        expected = TrueSkillEnv(teams, weights=weights).update_ratings()
+        actual = CompiledTrueSkillEnv(teams, weights=weights).update_ratings()
+
+        # then
+        self.assertEqual(expected, actual)
+
+    def test_graph_is_reused_for_the_same_shape(self):
+        # given
+        first = random_teams((2, 2), self.rng)
+        second = random_teams((2, 2), self.rng)
+
+        # when
+        first_env = CompiledTrueSkillEnv(first)
+        first_ratings = first_env.update_ratings()
+        second_env = CompiledTrueSkillEnv(second)
+        second_env.update_ratings()
+
+        # then
+        self.assertIs(first_env.graph, second_env.graph)
+        self.assertIs(first_env.graph, get_compiled_graph((2, 2)))
+        # rerunning the graph starts from fresh messages
+        self.assertEqual(first_env.update_ratings(), first_ratings)
@@ -1,6 +1,19 @@
+import gzip
+import json
+import os
+import sqlite3
+import struct
+import tempfile
+import threading
 import unittest
 from trueskill.utils.constants import MU, SIGMA
 from trueskill.data.player_ratings import CsvSource
+from trueskill.data.game import load_games_from_match_log, iter_games
+from trueskill.data.log_source import LogSource
+from trueskill.data.sqlite_source import SqliteSource
+from trueskill.data.cached_source import CachedSource
+from trueskill.data.binary_source import BinarySource, \
+    convert_csv_to_binary, write_binary_snapshot
 from trueskill.utils.maths import Gaussian
 
 
@@ -41,4 +54,540 @@ class TestCsvSource(unittest.TestCase):
         self.source.update_player_rating(player, rating)
 
         # then
-        self.assertEqual(self.source.data[player], rating)
\ No newline at end of file
+        self.assertEqual(self.source.data[player], rating)
+
+    def test_load_many(self):
+        # given
+        self.source.data['foo'] = Gaussian(mu=1, sigma=1)
+
+        # when
+        ratings = self.source.load_many(['foo', 'bar'])
+
+        # then
+        self.assertEqual(ratings, {'foo': Gaussian(mu=1, sigma=1),
+                                   'bar': Gaussian(mu=MU, sigma=SIGMA)})
+
+    def test_last_played_is_saved_as_a_fourth_column(self):
+        # given
+        tmp_dir = tempfile.TemporaryDirectory()
+        source = CsvSource(tmp_dir.name)
+        source.bulk_update_player_ratings({'a': Gaussian(mu=1, sigma=1),
+                                           'b': Gaussian(mu=2, sigma=1)},
+                                          {'a': 1600000000.0})
+
+        # when
+        source.update_player_rating('b', Gaussian(mu=3, sigma=1))
+        source.save_player_ratings()
+        reloaded = CsvSource(tmp_dir.name)
+
+        # then
+        # b was never given a time so has the old three columns
+        with open(os.path.join(tmp_dir.name, source.DATA_SOURCE)) as f:
+            self.assertEqual([len(line.split(',')) for line in f], [4, 3])
+        self.assertEqual(reloaded.load_last_played(['a', 'b', 'c']),
+                         {'a': 1600000000.0})
+        self.assertEqual(reloaded.data['b'], Gaussian(mu=3, sigma=1))
+        tmp_dir.cleanup()
+
+class TestMatchLog(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.match_log = os.path.join(self.tmp_dir.name, 'games.jsonl')
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def write_log(self, records):
+        with open(self.match_log, 'w') as f:
+            for record in records:
+                f.write(json.dumps(record) + '\n')
+
+    def test_games_are_sorted_by_timestamp(self):
+        # given
+        self.write_log([
+            {"teams": [["a"], ["b"]], "ranks": [1, 2], "timestamp": 2},
+            {"teams": [["c"], ["d"]], "ranks": [2, 1], "timestamp": 1},
+        ])
+
+        # when
+        games = load_games_from_match_log(self.match_log)
+
+        # then
+        self.assertEqual([g.teams for g in games], [[["c"], ["d"]],
+                                                   [["a"], ["b"]]])
+        self.assertEqual(games[0].ranks, [2, 1])
+
+    def test_games_without_timestamps_keep_log_order(self):
+        # given
+        self.write_log([
+            {"teams": [["a"], ["b"]], "ranks": [1, 2]},
+            {"teams": [["c"], ["d"]], "ranks": [1, 2]},
+        ])
+
+        # when
+        games = load_games_from_match_log(self.match_log)
+
+        # then
+        self.assertEqual([g.teams[0] for g in games], [["a"], ["c"]])
+
+    def test_tied_ranks_are_draws(self):
+        # given
+        self.write_log([{"teams": [["a"], ["b"], ["c"]], "ranks": [1, 1, 2]}])
+
+        # when
+        games = load_games_from_match_log(self.match_log)
+
+        # then
+        self.assertEqual(games[0].ranks, [1, 1, 2])
+
+    def test_partial_play_weights_are_loaded(self):
+        # given
+        self.write_log([
+            {"teams": [["a", "b"], ["c"]], "ranks": [1, 2],
+             "weights": {"b": 0.5}},
+            {"teams": [["a"], ["c"]], "ranks": [1, 2]},
+        ])
+
+        # when
+        games = load_games_from_match_log(self.match_log)
+
+        # then
+        self.assertEqual(games[0].weights, {"b": 0.5})
+        self.assertIsNone(games[1].weights)
+
+    def test_invalid_weights_raise_value_error(self):
+        for weights in [{"d": 0.5}, {"a": 1.5}, {"a": -0.1}, [1],
+                        {"a": "x"}, {"a": True}]:
+            # given
+            self.write_log([{"teams": [["a"], ["b"]], "ranks": [1, 2],
+                             "weights": weights}])
+
+            # when, then
+            with self.assertRaises(ValueError):
+                load_games_from_match_log(self.match_log)
+
+    def test_invalid_game_error_names_its_line(self):
+        # given
+        self.write_log([{"teams": [["a"], ["b"]], "ranks": [1, 2]},
+                        {"teams": [["a"], ["b"]], "ranks": [1, 2],
+                         "weights": {"a": "x"}}])
+
+        # when, then
+        with self.assertRaisesRegex(ValueError, "line 2"):
+            load_games_from_match_log(self.match_log)
+
+    def test_missing_ranks_raise_value_error(self):
+        # given
+        self.write_log([{"teams": [["a"], ["b"]], "ranks": [1]}])
+
+        # when, then
+        with self.assertRaises(ValueError):
+            load_games_from_match_log(self.match_log)
+
+    def test_ranks_that_are_not_numbers_raise_value_error(self):
+        for ranks in [["10", "9"], [1, None], [True, False], "12"]:
+            # given
+            self.write_log([{"teams": [["a"], ["b"]], "ranks": ranks}])
+
+            # when, then
+            with self.assertRaises(ValueError):
+                load_games_from_match_log(self.match_log)
+
+    def test_mixed_timestamps_raise_value_error(self):
+        # given
+        self.write_log([
+            {"teams": [["a"], ["b"]], "ranks": [1, 2], "timestamp": 1},
+            {"teams": [["c"], ["d"]], "ranks": [1, 2]},
+        ])
+
+        # when, then
+        with self.assertRaises(ValueError):
+            load_games_from_match_log(self.match_log)
+
+
+class TestIterGames(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def test_gzipped_csv_games_are_parsed(self):
+        # given
+        path = os.path.join(self.tmp_dir.name, 'games.csv.gz')
+        with gzip.open(path, 'wt') as f:
+            f.write("a|b;c,2;1,10\n\nd;e;f,1;3;2,11.5\n")
+
+        # when
+        games = list(iter_games(path))
+
+        # then
+        self.assertEqual(games[0].teams, [["a", "b"], ["c"]])
+        self.assertEqual(games[0].ranks, [2, 1])
+        self.assertEqual(games[0].timestamp, 10)
+        self.assertEqual(games[1].teams, [["d"], ["e"], ["f"]])
+
+    def test_games_are_yielded_before_later_lines_are_read(self):
+        # given
+        path = os.path.join(self.tmp_dir.name, 'games.jsonl')
+        with open(path, 'w') as f:
+            f.write(json.dumps({"teams": [["a"], ["b"]], "ranks": [1, 2]}))
+            f.write("\nnot json\n")
+
+        # when
+        games = iter_games(path)
+
+        # then
+        self.assertEqual(next(games).teams, [["a"], ["b"]])
+        with self.assertRaises(ValueError):
+            next(games)
+
+    def test_out_of_order_timestamps_raise_value_error(self):
+        # given
+        path = os.path.join(self.tmp_dir.name, 'games.csv')
+        with open(path, 'w') as f:
+            f.write("a;b,1;2,2\nc;d,1;2,1\n")
+
+        # when, then
+        with self.assertRaises(ValueError):
+            list(iter_games(path))
+
+
+class TestLogSource(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.data_dir = self.tmp_dir.name
+        self.log_path = os.path.join(self.data_dir, LogSource.DATA_LOG)
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def test_save_appends_only_changed_ratings(self):
+        # given
+        source = LogSource(self.data_dir)
+        source.bulk_update_player_ratings({'a': Gaussian(mu=1, sigma=1),
+                                           'b': Gaussian(mu=2, sigma=2)})
+        source.save_player_ratings()
+
+        # when
+        source.update_player_rating('a', Gaussian(mu=3, sigma=1))
+        source.save_player_ratings()
+
+        # then
+        with open(self.log_path) as f:
+            lines = f.readlines()
+        self.assertEqual(len(lines), 3)
+        self.assertTrue(lines[-1].startswith('a,3'))
+
+    def test_recovery_replays_log_over_snapshot(self):
+        # given
+        source = LogSource(self.data_dir)
+        source.bulk_update_player_ratings({'a': Gaussian(mu=1, sigma=1),
+                                           'b': Gaussian(mu=2, sigma=2)})
+        source.compact()
+        source.update_player_rating('b', Gaussian(mu=5, sigma=0.5))
+        source.save_player_ratings()
+
+        # when
+        recovered = LogSource(self.data_dir)
+
+        # then
+        self.assertAlmostEqual(recovered.data['a'].mu, 1)
+        self.assertAlmostEqual(recovered.data['b'].mu, 5)
+        self.assertAlmostEqual(recovered.data['b'].sigma, 0.5)
+
+    def test_log_is_compacted_into_snapshot(self):
+        # given
+        source = LogSource(self.data_dir, compact_every=2)
+        source.update_player_rating('a', Gaussian(mu=1, sigma=1))
+        source.save_player_ratings()
+
+        # when
+        source.update_player_rating('b', Gaussian(mu=2, sigma=1))
+        source.save_player_ratings()
+
+        # then
+        self.assertEqual(os.path.getsize(self.log_path), 0)
+        snapshot = CsvSource(self.data_dir)
+        self.assertEqual(set(snapshot.data), {'a', 'b'})
+
+    def test_partial_log_line_is_dropped(self):
+        # given
+        source = LogSource(self.data_dir)
+        source.update_player_rating('a', Gaussian(mu=1, sigma=1))
+        source.save_player_ratings()
+        with open(self.log_path, 'a') as f:
+            f.write('b,2.0,1')
+
+        # when
+        recovered = LogSource(self.data_dir)
+        recovered.update_player_rating('c', Gaussian(mu=3, sigma=1))
+        recovered.save_player_ratings()
+
+        # then
+        self.assertNotIn('b', recovered.data)
+        self.assertEqual(set(LogSource(self.data_dir).data), {'a', 'c'})
+
+    def test_last_played_is_replayed_from_the_log(self):
+        # given
+        source = LogSource(self.data_dir)
+        source.update_player_rating('a', Gaussian(mu=1, sigma=1), 10.0)
+        source.compact()
+        source.update_player_rating('a', Gaussian(mu=2, sigma=1), 20.0)
+        source.save_player_ratings()
+
+        # when
+        recovered = LogSource(self.data_dir)
+
+        # then
+        self.assertEqual(recovered.load_last_played(['a']), {'a': 20.0})
+
+
+class TestBinarySource(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.data_dir = self.tmp_dir.name
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def test_convert_csv_to_binary(self):
+        # given
+        csv_source = CsvSource(self.data_dir)
+        csv_source.bulk_update_player_ratings({
+            'zoe': Gaussian(mu=30, sigma=2), 'adam': Gaussian(mu=20, sigma=3),
+            'mia': Gaussian(mu=25, sigma=4)})
+        csv_source.save_player_ratings(data_dir=self.data_dir)
+
+        # when
+        convert_csv_to_binary(
+            os.path.join(self.data_dir, csv_source.DATA_SOURCE),
+            os.path.join(self.data_dir, BinarySource.DATA_SOURCE))
+        source = BinarySource(self.data_dir)
+
+        # then
+        self.assertEqual(source.count, 3)
+        for name, rating in csv_source.data.items():
+            loaded = source.load_player_ratings(name)
+            self.assertAlmostEqual(loaded.mu, rating.mu)
+            self.assertAlmostEqual(loaded.sigma, rating.sigma)
+        self.assertEqual(source.load_player_ratings('new'),
+                         Gaussian(mu=MU, sigma=SIGMA))
+        source.close()
+
+    def test_updates_in_place_and_new_players_persist(self):
+        # given
+        write_binary_snapshot({'a': (1.0, 1.0), 'b': (2.0, 2.0)},
+                              os.path.join(self.data_dir,
+                                           BinarySource.DATA_SOURCE))
+        source = BinarySource(self.data_dir)
+
+        # when
+        source.bulk_update_player_ratings({'b': Gaussian(mu=5, sigma=0.5),
+                                           'c': Gaussian(mu=7, sigma=1)})
+        self.assertEqual(list(source.new_players), ['c'])
+        source.save_player_ratings()
+        source.close()
+        reopened = BinarySource(self.data_dir)
+
+        # then
+        self.assertEqual(reopened.count, 3)
+        self.assertAlmostEqual(reopened.load_player_ratings('a').mu, 1)
+        self.assertAlmostEqual(reopened.load_player_ratings('b').mu, 5)
+        self.assertAlmostEqual(reopened.load_player_ratings('b').sigma, 0.5)
+        self.assertAlmostEqual(reopened.load_player_ratings('c').mu, 7)
+        reopened.close()
+
+    def test_last_played_is_stored_in_the_records(self):
+        # given
+        write_binary_snapshot({'a': (1.0, 1.0), 'b': (2.0, 2.0, 5.0)},
+                              os.path.join(self.data_dir,
+                                           BinarySource.DATA_SOURCE))
+        source = BinarySource(self.data_dir)
+        self.assertEqual(source.load_last_played(['a', 'b']), {'b': 5.0})
+
+        # when
+        source.bulk_update_player_ratings({'a': Gaussian(mu=3, sigma=1),
+                                           'c': Gaussian(mu=7, sigma=1)},
+                                          {'a': 10.0, 'c': 20.0})
+        source.save_player_ratings()
+        source.close()
+        reopened = BinarySource(self.data_dir)
+
+        # then
+        self.assertEqual(reopened.load_last_played(['a', 'b', 'c', 'd']),
+                         {'a': 10.0, 'b': 5.0, 'c': 20.0})
+        reopened.close()
+
+    def test_version_1_snapshot_is_upgraded(self):
+        # given
+        # a version 1 snapshot of a single (mu, sigma) record
+        path = os.path.join(self.data_dir, BinarySource.DATA_SOURCE)
+        with open(path, 'wb') as f:
+            f.write(struct.pack('=4sIQ', b'TSKB', 1, 1))
+            f.write(struct.pack('=ddQQ', 1.5, 0.5, 0, 1))
+            f.write(b'a')
+
+        # when
+        source = BinarySource(self.data_dir)
+
+        # then
+        self.assertEqual(source.load_player_ratings('a'),
+                         Gaussian(mu=1.5, sigma=0.5))
+        self.assertEqual(source.load_last_played(['a']), {})
+        source.close()
+        with open(path, 'rb') as f:
+            self.assertEqual(struct.unpack_from('=4sIQ', f.read()),
+                             (b'TSKB', 2, 1))
+
+
+class TestSqliteSource(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.source = SqliteSource(self.tmp_dir.name)
+
+    def tearDown(self) -> None:
+        self.source.close()
+        self.tmp_dir.cleanup()
+
+    def test_load_player_ratings_for_new_player(self):
+        # when
+        rating = self.source.load_player_ratings('new')
+
+        # then
+        self.assertEqual(rating, Gaussian(mu=MU, sigma=SIGMA))
+
+    def test_bulk_update_and_load_many(self):
+        # given
+        ratings = {f'player{i}': Gaussian(mu=i, sigma=1) for i in range(2000)}
+
+        # when
+        self.source.bulk_update_player_ratings(ratings)
+        loaded = self.source.load_many(list(ratings) + ['new'])
+
+        # then
+        self.assertEqual(len(loaded), 2001)
+        self.assertAlmostEqual(loaded['player1234'].mu, 1234)
+        self.assertEqual(loaded['new'], Gaussian(mu=MU, sigma=SIGMA))
+
+    def test_concurrent_updates_from_threads(self):
+        # given
+        def rate(thread):
+            for i in range(20):
+                self.source.bulk_update_player_ratings(
+                    {f't{thread}_{i}': Gaussian(mu=thread, sigma=1)})
+
+        # when
+        threads = [threading.Thread(target=rate, args=(t,)) for t in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.source.save_player_ratings()
+
+        # then
+        reopened = SqliteSource(self.tmp_dir.name)
+        loaded = reopened.load_many([f't{t}_{i}' for t in range(8)
+                                     for i in range(20)])
+        reopened.close()
+        self.assertEqual({rating.mu for rating in loaded.values()},
+                         set(range(8)))
+
+    def test_update_without_a_time_keeps_last_played(self):
+        # given
+        self.source.update_player_rating('a', Gaussian(mu=1, sigma=1), 10.0)
+
+        # when
+        self.source.bulk_update_player_ratings({'a': Gaussian(mu=2, sigma=1),
+                                                'b': Gaussian(mu=3, sigma=1)})
+
+        # then
+        self.assertEqual(self.source.load_last_played(['a', 'b']),
+                         {'a': 10.0})
+        self.assertEqual(self.source.load_player_ratings('a').mu, 2)
+
+    def test_database_without_last_played_is_migrated(self):
+        # given
+        data_dir = os.path.join(self.tmp_dir.name, 'old')
+        os.mkdir(data_dir)
+        connection = sqlite3.connect(os.path.join(data_dir,
+                                                  SqliteSource.DATA_SOURCE))
+        with connection:
+            connection.execute("CREATE TABLE ratings (name TEXT PRIMARY "
+                               "KEY, mu REAL NOT NULL, sigma REAL NOT NULL) "
+                               "WITHOUT ROWID")
+            connection.execute("INSERT INTO ratings VALUES ('a', 1, 1)")
+        connection.close()
+
+        # when
+        source = SqliteSource(data_dir)
+        source.update_player_rating('b', Gaussian(mu=2, sigma=1), 10.0)
+
+        # then
+        self.assertEqual(source.load_player_ratings('a').mu, 1)
+        self.assertEqual(source.load_last_played(['a', 'b']), {'b': 10.0})
+        source.close()
+
+
+class TestCachedSource(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.backend = CsvSource(self.tmp_dir.name)
+        self.source = CachedSource(self.backend, capacity=2, flush_every=2)
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def test_hits_and_misses(self):
+        # when
+        self.source.load_player_ratings('a')
+        self.source.load_player_ratings('a')
+        self.source.load_many(['a', 'b'])
+
+        # then
+        self.assertEqual(self.source.hits, 2)
+        self.assertEqual(self.source.misses, 2)
+
+    def test_updates_are_written_back_in_batches_on_eviction(self):
+        # given
+        self.source.update_player_rating('a', Gaussian(mu=1, sigma=1))
+        self.source.update_player_rating('b', Gaussian(mu=2, sigma=1))
+
+        # when
+        self.source.update_player_rating('c', Gaussian(mu=3, sigma=1))
+
+        # then
+        # a was evicted but waits for a second eviction to be written back
+        self.assertEqual(self.source.evictions, 1)
+        self.assertNotIn('a', self.backend.data)
+        self.assertEqual(self.source.load_player_ratings('a'),
+                         Gaussian(mu=1, sigma=1))
+        self.source.update_player_rating('d', Gaussian(mu=4, sigma=1))
+        self.assertEqual(self.source.write_backs, 2)
+        self.assertEqual(self.backend.data['b'], Gaussian(mu=2, sigma=1))
+
+    def test_save_writes_back_dirty_ratings(self):
+        # given
+        self.source.bulk_update_player_ratings({'a': Gaussian(mu=1, sigma=1)})
+
+        # when
+        self.source.save_player_ratings()
+
+        # then
+        self.assertEqual(self.source.stats()["dirty"], 0)
+        self.assertEqual(CsvSource(self.tmp_dir.name).data['a'].mu, 1)
+
+    def test_last_played_is_written_back_with_the_rating(self):
+        # given
+        self.backend.update_player_rating('b', Gaussian(mu=2, sigma=1), 5.0)
+        self.source.update_player_rating('a', Gaussian(mu=1, sigma=1), 10.0)
+        self.assertEqual(self.source.load_last_played(['a', 'b']),
+                         {'a': 10.0, 'b': 5.0})
+        self.assertNotIn('a', self.backend.last_played)
+
+        # when
+        self.source.save_player_ratings()
+
+        # then
+        self.assertEqual(self.backend.load_last_played(['a']), {'a': 10.0})
+        self.assertEqual(self.source.last_played, {})
@@ -0,0 +1,29 @@
+import unittest
+from benchmarks.bench_import_time import IMPORT_BUDGET, fastest_import, \
+    heavy_imports
+
+
+class TestImportTime(unittest.TestCase):
+    def test_command_line_entry_point_is_import_light(self):
+        # when
+        times = fastest_import("trueskill.main", runs=3)
+
+        # then
+        self.assertEqual(heavy_imports(times), [])
+        self.assertIn("trueskill.utils.calculate_ratings", times)
+        self.assertLess(times["trueskill.main"][1], IMPORT_BUDGET)
+
+    def test_scalar_match_quality_is_import_light(self):
+        # when
+        times = fastest_import("trueskill.engine.match_quality", runs=1)
+
+        # then
+        self.assertEqual(heavy_imports(times), [])
+
+    def test_vectorized_engine_still_loads_numpy(self):
+        # when
+        times = fastest_import("trueskill.engine.true_skill_vectorized",
+                               runs=1)
+
+        # then
+        self.assertIn("numpy", heavy_imports(times))
@@ -0,0 +1,110 @@
+import json
+import os
+import pstats
+import tempfile
+import unittest
+from trueskill.engine.compiled_graph import CompiledTrueSkillEnv
+from trueskill.engine.factor_graph import PriorFactor
+from trueskill.engine.instrumentation import Instrumentation
+from trueskill.engine.true_skill import TrueSkillEnv
+from trueskill.utils.maths import Gaussian
+
+
+def _teams(*sizes):
+    return [{f"p{j}_{i}": Gaussian(mu=20 + j, sigma=5) for i in range(size)}
+            for j, size in enumerate(sizes)]
+
+
+class TestInstrumentation(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def test_counts_factor_calls_and_phases(self):
+        # given
+        original = PriorFactor.down
+
+        # when
+        with Instrumentation() as instrumentation:
+            self.assertIsNot(PriorFactor.down, original)
+            TrueSkillEnv(_teams(2, 1)).update_ratings()
+
+        # then
+        self.assertIs(PriorFactor.down, original)
+        counts = instrumentation.to_dict()
+        calls = {name: method["calls"]
+                 for name, method in counts["methods"].items()}
+        self.assertEqual(calls["PriorFactor.down"], 3)
+        self.assertEqual(calls["PerformanceFactor.down"], 3)
+        self.assertEqual(calls["PerformanceFactor.up"], 3)
+        self.assertEqual(calls["TruncateFactor.up"], 1)
+        self.assertEqual({phase: counter["calls"] for phase, counter
+                          in counts["phases"].items()},
+                         {"prior": 1, "performance": 2, "team": 2,
+                          "game": 1})
+        self.assertGreater(counts["gaussian_allocations"], 0)
+        for method in counts["methods"].values():
+            self.assertLessEqual(method["own_seconds"],
+                                 method["seconds"] + 1e-9)
+
+    def test_nothing_is_counted_while_disabled(self):
+        # given
+        instrumentation = Instrumentation()
+        with instrumentation:
+            TrueSkillEnv(_teams(1, 1)).update_ratings()
+        before = instrumentation.to_dict()
+
+        # when
+        TrueSkillEnv(_teams(1, 1)).update_ratings()
+
+        # then
+        self.assertEqual(instrumentation.to_dict(), before)
+        with Instrumentation():
+            with self.assertRaises(RuntimeError):
+                instrumentation.enable()
+
+    def test_ratings_are_unchanged(self):
+        # given
+        expected = TrueSkillEnv(_teams(2, 2, 1)).update_ratings()
+
+        # when
+        with Instrumentation():
+            ratings = TrueSkillEnv(_teams(2, 2, 1)).update_ratings()
+            compiled = CompiledTrueSkillEnv(_teams(2, 2, 1)).update_ratings()
+
+        # then
+        self.assertEqual(ratings, expected)
+        self.assertEqual(compiled, expected)
+
+    def test_exports(self):
+        # given
+        with Instrumentation() as instrumentation:
+            TrueSkillEnv(_teams(1, 1, 1)).update_ratings()
+            CompiledTrueSkillEnv(_teams(1, 1)).update_ratings()
+        report = os.path.join(self.tmp_dir.name, 'graph.prof')
+        prometheus = os.path.join(self.tmp_dir.name, 'graph.prom')
+        as_json = os.path.join(self.tmp_dir.name, 'graph.json')
+
+        # when
+        instrumentation.save(report)
+        instrumentation.save(prometheus)
+        instrumentation.save(as_json)
+
+        # then
+        stats = pstats.Stats(report).stats
+        by_name = {key[2]: value for key, value in stats.items()}
+        # update_marginal is called by the prior factors, in the prior phase
+        callers = {key[2] for key in by_name["Variable.update_marginal"][4]}
+        self.assertIn("PriorFactor.down", callers)
+        self.assertIn("<phase prior>",
+                      {key[2] for key in by_name["PriorFactor.down"][4]})
+        self.assertIn("MessageState.truncate_up", by_name)
+        with open(prometheus) as f:
+            text = f.read()
+        self.assertIn('trueskill_method_calls_total{method="PriorFactor.down"}'
+                      ' 3', text)
+        self.assertIn('trueskill_phase_calls_total{phase="game"} 2', text)
+        with open(as_json) as f:
+            self.assertEqual(json.load(f), instrumentation.to_dict())
@@ -0,0 +1,87 @@
+import random
+import tempfile
+import unittest
+from trueskill.data.leaderboard import IndexableSkipList, Leaderboard
+from trueskill.data.player_ratings import CsvSource
+from trueskill.utils.maths import Gaussian
+
+
+class TestIndexableSkipList(unittest.TestCase):
+    def test_agrees_with_a_sorted_list(self):
+        # given
+        rng = random.Random(0)
+        expected = sorted(rng.sample(range(500), 100))
+        skip_list = IndexableSkipList(expected[::-1], seed=1)
+
+        # when
+        for _ in range(2000):
+            key = rng.randrange(500)
+            if key in expected:
+                skip_list.remove(key)
+                expected.remove(key)
+            else:
+                skip_list.insert(key)
+                expected.append(key)
+                expected.sort()
+
+        # then
+        self.assertEqual(len(skip_list), len(expected))
+        self.assertEqual(list(skip_list.iter_from(0)), expected)
+        for position, key in enumerate(expected):
+            self.assertEqual(skip_list.index(key), position)
+        self.assertEqual(list(skip_list.iter_from(len(expected) - 3)),
+                         expected[-3:])
+        self.assertEqual(list(skip_list.iter_from(len(expected))), [])
+        with self.assertRaises(KeyError):
+            skip_list.remove(-1)
+
+
+class TestLeaderboard(unittest.TestCase):
+    def setUp(self) -> None:
+        rng = random.Random(0)
+        self.ratings = {f"p{i}": Gaussian(mu=rng.gauss(25, 6),
+                                          sigma=rng.uniform(1, 8.3))
+                        for i in range(300)}
+
+    def expected_order(self, ratings):
+        return sorted(ratings, key=lambda p: (-(ratings[p].mu -
+                                                3 * ratings[p].sigma), p))
+
+    def test_rank_and_pages_match_sorting(self):
+        # given
+        leaderboard = Leaderboard(self.ratings, seed=0)
+        order = self.expected_order(self.ratings)
+
+        # when
+        page = leaderboard.page(3, size=25)
+
+        # then
+        self.assertEqual([name for name, _ in page], order[50:75])
+        self.assertEqual([name for name, _ in leaderboard.top(5)], order[:5])
+        self.assertEqual(leaderboard.rank(order[0]), 1)
+        self.assertEqual(leaderboard.rank(order[123]), 124)
+        self.assertEqual(leaderboard.page(100), [])
+
+    def test_leaderboard_follows_data_source_updates(self):
+        # given
+        with tempfile.TemporaryDirectory() as data_dir:
+            source = CsvSource(data_dir)
+            source.bulk_update_player_ratings(self.ratings)
+            leaderboard = Leaderboard.from_source(source)
+
+            # when
+            source.bulk_update_player_ratings(
+                {"p7": Gaussian(mu=60, sigma=1),
+                 "new": Gaussian(mu=0, sigma=1)})
+            ratings = source.all_player_ratings()
+
+        # then
+        order = self.expected_order(ratings)
+        self.assertEqual(len(leaderboard), 301)
+        self.assertEqual(leaderboard.rank("p7"), 1)
+        self.assertEqual([name for name, _ in leaderboard.page(1, 301)],
+                         order)
+
+
+if __name__ == '__main__':
+    unittest.main()
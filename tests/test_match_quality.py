@@ -0,0 +1,88 @@
+import math
+import unittest
+import numpy as np
+from trueskill.engine.match_quality import match_quality, win_probability, \
+    win_probabilities, team_arrays, match_quality_arrays, \
+    win_probability_arrays, _matrix_quality
+from trueskill.utils.maths import Gaussian
+
+
+class TestMatchQuality(unittest.TestCase):
+    def test_fresh_1vs1_quality(self):
+        # given
+        a, b = Gaussian(mu=25, sigma=25 / 3), Gaussian(mu=25, sigma=25 / 3)
+
+        # when
+        quality = match_quality([{"a": a}, {"b": b}])
+
+        # then
+        # 2 b^2 / (2 b^2 + 2 s^2) with s = 2 b for the default constants
+        self.assertAlmostEqual(quality, math.sqrt(0.2), 12)
+
+    def test_matrix_form_agrees_with_two_team_formula(self):
+        # given
+        teams = [[Gaussian(mu=30, sigma=4), Gaussian(mu=22, sigma=6)],
+                 [Gaussian(mu=27, sigma=2)]]
+
+        # when
+        quality = match_quality(teams)
+        matrix_quality = _matrix_quality(teams, 25 / 6)
+
+        # then
+        self.assertAlmostEqual(matrix_quality, quality, 12)
+
+    def test_n_team_quality_is_symmetric_in_team_order(self):
+        # given
+        teams = [[Gaussian(mu=30, sigma=4), Gaussian(mu=22, sigma=6)],
+                 [Gaussian(mu=27, sigma=2)], [Gaussian(mu=20, sigma=5)]]
+
+        # when
+        # reversing the teams only flips the signs of the differences
+        forward = match_quality(teams)
+        backward = match_quality(teams[::-1])
+
+        # then
+        self.assertAlmostEqual(forward, backward, 12)
+
+    def test_win_probability(self):
+        # given
+        strong = {"a": Gaussian(mu=35, sigma=2)}
+        weak = {"b": Gaussian(mu=15, sigma=2)}
+
+        # when
+        matrix = win_probabilities([strong, weak])
+
+        # then
+        self.assertEqual(win_probability(strong, strong), 0.5)
+        self.assertGreater(matrix[0][1], 0.99)
+        self.assertAlmostEqual(matrix[0][1] + matrix[1][0], 1, 12)
+
+    def test_arrays_agree_with_scalar(self):
+        # given
+        rng = np.random.default_rng(0)
+        mu = rng.uniform(10, 40, (6, 3))
+        sigma = rng.uniform(1, 8, (6, 3))
+        mask = rng.uniform(size=(6, 3)) < 0.8
+        mask[:, 0] = True
+        teams = [[Gaussian(mu=mu[i, j], sigma=sigma[i, j])
+                  for j in range(3) if mask[i, j]] for i in range(6)]
+
+        # when
+        sums = team_arrays(mu, sigma, mask)
+        side_a = [x[:, None] for x in sums]
+        side_b = [x[None, :] for x in sums]
+        quality = match_quality_arrays(*side_a, *side_b)
+        win = win_probability_arrays(*side_a, *side_b)
+
+        # then
+        self.assertEqual(quality.shape, (6, 6))
+        for i in range(6):
+            for j in range(6):
+                self.assertAlmostEqual(
+                    quality[i, j], match_quality([teams[i], teams[j]]), 12)
+                self.assertAlmostEqual(
+                    win[i, j], win_probability(teams[i], teams[j]), 12)
+
+
+if __name__ == '__main__':
+    unittest.main()
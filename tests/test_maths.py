@@ -1,5 +1,11 @@
-from trueskill.utils.maths import Gaussian
+from trueskill.utils.maths import Gaussian, v_truncate, w_truncate, \
+    v_truncate_reference, w_truncate_reference, v_truncate_draw, \
+    w_truncate_draw, v_truncate_draw_reference, w_truncate_draw_reference, \
+    draw_margin, game_draw_margins, decay_rating, age_ratings
+from trueskill.utils.constants import SIGMA
+import math
 import unittest
+import warnings
 
 
 class TestGaussian(unittest.TestCase):
@@ -44,3 +50,183 @@ class TestGaussian(unittest.TestCase):
         # when, then
         with self.assertRaises(TypeError):
             x / y
+
+    def test_gaussian_in_place_multiply(self):
+        # given
+        x = Gaussian(pi=3, tau=4)
+        y = Gaussian(pi=5, tau=6)
+
+        # when
+        z = x.imul(y)
+
+        # then
+        self.assertIs(z, x)
+        self.assertEqual(x, Gaussian(pi=8, tau=10))
+
+    def test_gaussian_in_place_divide(self):
+        # given
+        x = Gaussian(pi=4, tau=8)
+        y = Gaussian(pi=2, tau=2)
+
+        # when
+        z = x.idiv(y)
+
+        # then
+        self.assertIs(z, x)
+        self.assertEqual(x, Gaussian(pi=2, tau=6))
+
+    def test_gaussian_augmented_assignment_leaves_aliases_alone(self):
+        # given
+        x = Gaussian(pi=4, tau=8)
+        alias = x
+
+        # when
+        x *= Gaussian(pi=1, tau=1)
+        x /= Gaussian(pi=2, tau=2)
+
+        # then
+        self.assertEqual(x, Gaussian(pi=3, tau=7))
+        self.assertIsNot(x, alias)
+        self.assertEqual(alias, Gaussian(pi=4, tau=8))
+
+    def test_gaussian_has_no_instance_dict(self):
+        # given
+        x = Gaussian(mu=1, sigma=1)
+
+        # when, then
+        with self.assertRaises(AttributeError):
+            x.foo = 1
+
+
+class TestTruncate(unittest.TestCase):
+    def test_fast_truncate_agrees_with_reference(self):
+        # given
+        # below about -10 the reference w loses precision to cancellation
+        xs = [i / 10 for i in range(-100, 100)]
+
+        for x in xs:
+            # when
+            v, w = v_truncate(x), w_truncate(x)
+
+            # then
+            v_ref, w_ref = v_truncate_reference(x), w_truncate_reference(x)
+            self.assertAlmostEqual(v / v_ref, 1, 12, msg=f"v at x={x}")
+            self.assertAlmostEqual(w / w_ref, 1, 10, msg=f"w at x={x}")
+
+    def test_truncate_is_finite_for_large_negative_x(self):
+        # given
+        x = -1000
+
+        # when
+        v, w = v_truncate(x), w_truncate(x)
+
+        # then
+        # v approaches -x and w approaches 1 in the tail
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)
+            self.assertTrue(math.isnan(v_truncate_reference(x)))
+        self.assertAlmostEqual(v, -x, 2)
+        self.assertAlmostEqual(w, 1, 5)
+        self.assertLess(w, 1)
+
+
+class TestTruncateDraw(unittest.TestCase):
+    def test_fast_truncate_draw_agrees_with_reference(self):
+        # given
+        # beyond about |x| - margin = 8 the reference loses precision
+        cases = [(i / 4, margin) for i in range(-32, 33)
+                 for margin in (0.05, 0.5, 2.0)]
+
+        for x, margin in cases:
+            # when
+            v, w = v_truncate_draw(x, margin), w_truncate_draw(x, margin)
+
+            # then
+            v_ref = v_truncate_draw_reference(x, margin)
+            w_ref = w_truncate_draw_reference(x, margin)
+            self.assertAlmostEqual(v, v_ref, 8, msg=f"v at {x}, {margin}")
+            self.assertAlmostEqual(w, w_ref, 7, msg=f"w at {x}, {margin}")
+
+    def test_truncate_draw_is_finite_far_from_the_margin(self):
+        # given
+        x, margin = -200, 0.5
+
+        # when
+        v, w = v_truncate_draw(x, margin), w_truncate_draw(x, margin)
+
+        # then
+        # the truncated Gaussian is pushed against the nearest bound
+        self.assertAlmostEqual(v, -x - margin, 1)
+        self.assertTrue(0 < w < 1)
+
+    def test_truncate_draw_is_total_for_narrow_margins(self):
+        for x in (0.0, 0.5, -3.0, 10.0):
+            for margin in (1e-3, 1e-5, 1e-9, 1e-15, 1e-20, 1e-300):
+                # when
+                v, w = v_truncate_draw(x, margin), w_truncate_draw(x, margin)
+
+                # then
+                # nearly uniform on the narrow interval, so centred on 0
+                # with a variance of margin^2 / 3
+                self.assertAlmostEqual(v, -x, 5)
+                self.assertTrue(0 < w <= 1, msg=f"w at {x}, {margin}")
+                if margin >= 1e-5:
+                    # below this 1 - w is lost to rounding
+                    self.assertAlmostEqual((1 - w) / (margin ** 2 / 3), 1,
+                                           3)
+
+    def test_draw_margin(self):
+        # when
+        margin = draw_margin(0.1, 25 / 6, 2)
+
+        # then
+        # the margin of the default environment of the published TrueSkill
+        self.assertAlmostEqual(margin, 0.7404666, 6)
+        self.assertEqual(draw_margin(0.0, 25 / 6, 2), 0)
+
+    def test_ties_need_a_draw_probability(self):
+        # when
+        margins = game_draw_margins([1, 1, 2], [1, 1, 2], 0.1, 25 / 6)
+
+        # then
+        self.assertEqual([drawn for _, drawn in margins], [True, False])
+        self.assertGreater(margins[1][0], margins[0][0])
+        with self.assertRaises(ValueError):
+            game_draw_margins([1, 1], [1, 1], 0.0, 25 / 6)
+        with self.assertRaises(ValueError):
+            game_draw_margins([1, 1], [2, 1], 0.1, 25 / 6)
+
+
+class TestDecay(unittest.TestCase):
+    def test_variance_grows_with_elapsed_time_up_to_a_new_player(self):
+        # given
+        rating = Gaussian(mu=30, sigma=2)
+
+        # when
+        week = decay_rating(rating, 7 * 86400, time_decay=0.5)
+        years = decay_rating(rating, 1000 * 86400, time_decay=0.5)
+
+        # then
+        self.assertAlmostEqual(week.mu, 30)
+        self.assertAlmostEqual(week.sigma ** 2, 4 + 7 * 0.25)
+        self.assertAlmostEqual(years.sigma, SIGMA)
+        self.assertIs(decay_rating(rating, -5, time_decay=0.5), rating)
+        self.assertIs(decay_rating(rating, 86400, time_decay=0.0), rating)
+
+    def test_age_ratings_decays_then_records_the_game(self):
+        # given
+        ratings = {'a': Gaussian(mu=30, sigma=2),
+                   'b': Gaussian(mu=20, sigma=2)}
+        last_played = {'a': 0.0}
+
+        # when
+        age_ratings(ratings, ['a', 'b'], 86400.0, last_played,
+                    time_decay=1.0)
+
+        # then
+        # b has no known last game so is left as it is
+        self.assertAlmostEqual(ratings['a'].sigma ** 2, 5)
+        self.assertEqual(ratings['b'], Gaussian(mu=20, sigma=2))
+        self.assertEqual(last_played, {'a': 86400.0, 'b': 86400.0})
+        age_ratings(ratings, ['a'], None, last_played, time_decay=1.0)
+        self.assertEqual(last_played['a'], 86400.0)
@@ -0,0 +1,165 @@
+import random
+import tempfile
+import unittest
+from trueskill.data.binary_source import BinarySource
+from trueskill.data.cached_source import CachedSource
+from trueskill.data.log_source import LogSource
+from trueskill.data.player_ratings import CsvSource, DataSource
+from trueskill.data.rating_index import RatingIndex, team_rating
+from trueskill.data.sqlite_source import SqliteSource
+from trueskill.engine.match_quality import match_quality
+from trueskill.utils.maths import Gaussian
+
+
+def random_ratings(count, rng):
+    return {f"p{i}": Gaussian(mu=rng.gauss(25, 6), sigma=rng.uniform(1, 8.3))
+            for i in range(count)}
+
+
+class TestRatingIndex(unittest.TestCase):
+    def setUp(self) -> None:
+        self.rng = random.Random(0)
+        self.ratings = random_ratings(2000, self.rng)
+
+    def brute_force(self, ratings, player, k):
+        qualities = sorted(((match_quality([[ratings[player]], [rating]]),
+                             name) for name, rating in ratings.items()
+                            if name != player), reverse=True)
+        return [(name, quality) for quality, name in qualities[:k]]
+
+    def test_best_opponents_are_exact(self):
+        # given
+        index = RatingIndex(self.ratings)
+
+        # when
+        results = {player: index.best_opponents(player, k=5)
+                   for player in self.rng.sample(sorted(self.ratings), 20)}
+
+        # then
+        for player, result in results.items():
+            expected = self.brute_force(self.ratings, player, 5)
+            self.assertEqual([name for name, _ in result],
+                             [name for name, _ in expected])
+            for (_, quality), (_, expected_quality) in zip(result, expected):
+                self.assertAlmostEqual(quality, expected_quality, 12)
+
+    def test_best_opposing_teams_are_exact(self):
+        # given
+        names = sorted(self.ratings)
+        parties = {f"t{i}": [self.ratings[names[2 * i]],
+                             self.ratings[names[2 * i + 1]]]
+                   for i in range(len(names) // 2)}
+        index = RatingIndex({team: team_rating(skills)
+                             for team, skills in parties.items()},
+                            team_size=2)
+        queued = [Gaussian(mu=24, sigma=3), Gaussian(mu=30, sigma=5),
+                  Gaussian(mu=20, sigma=2)]
+
+        # when
+        result = index.best_opponents(queued, k=5)
+
+        # then
+        expected = sorted(((match_quality([queued, skills]), team)
+                           for team, skills in parties.items()),
+                          reverse=True)[:5]
+        self.assertEqual([team for team, _ in result],
+                         [team for _, team in expected])
+        for (_, quality), (expected_quality, _) in zip(result, expected):
+            self.assertAlmostEqual(quality, expected_quality, 12)
+
+    def test_tolerance_bounds_the_error(self):
+        # given
+        index = RatingIndex(self.ratings)
+        tolerance = 0.2
+
+        # when
+        result = index.best_opponents("p0", k=5, tolerance=tolerance)
+
+        # then
+        expected = self.brute_force(self.ratings, "p0", 5)
+        self.assertGreaterEqual(result[-1][1],
+                                (1 - tolerance) * expected[-1][1])
+
+    def test_index_follows_data_source_updates(self):
+        # given
+        with tempfile.TemporaryDirectory() as data_dir:
+            source = CsvSource(data_dir)
+            source.bulk_update_player_ratings(self.ratings)
+            index = RatingIndex.from_source(source)
+
+            # when
+            # p1 becomes a perfect match for a new rating
+            target = Gaussian(mu=80, sigma=1)
+            source.update_player_rating("p1", Gaussian(mu=80, sigma=1))
+            source.bulk_update_player_ratings(
+                {"p2": Gaussian(mu=79, sigma=1),
+                 "new": Gaussian(mu=-30, sigma=2)})
+            ratings = source.all_player_ratings()
+
+        # then
+        self.assertEqual(len(index), 2001)
+        self.assertEqual([name for name, _ in
+                          index.best_opponents(target, k=2)], ["p1", "p2"])
+        self.assertEqual([name for name, _ in
+                          index.best_opponents("new", k=3)],
+                         [name for name, _ in
+                          self.brute_force(ratings, "new", 3)])
+
+
+class TestDataSourceListeners(unittest.TestCase):
+    def test_every_source_lists_and_notifies_updates(self):
+        with tempfile.TemporaryDirectory() as data_dir:
+            sources = [CsvSource(data_dir), LogSource(data_dir),
+                       BinarySource(data_dir), SqliteSource(data_dir),
+                       CachedSource(CsvSource(data_dir), capacity=1)]
+            for source in sources:
+                # given
+                notified = []
+                source.subscribe(notified.append)
+
+                # when
+                source.update_player_rating('a', Gaussian(mu=1, sigma=1))
+                source.bulk_update_player_ratings(
+                    {'b': Gaussian(mu=2, sigma=2),
+                     'c': Gaussian(mu=3, sigma=3)})
+
+                # then
+                self.assertEqual([set(ratings) for ratings in notified],
+                                 [{'a'}, {'b', 'c'}])
+                self.assertEqual(
+                    {name: rating.mu for name, rating
+                     in source.all_player_ratings().items()},
+                    {'a': 1, 'b': 2, 'c': 3})
+            sources[2].close()
+            sources[3].close()
+
+    def test_source_without_a_listing_can_still_be_used(self):
+        # given
+        class ListlessSource(DataSource):
+            def connect_to_source(self):
+                pass
+
+            def load_player_ratings(self, player_name):
+                return Gaussian(mu=25, sigma=25 / 3)
+
+            def update_player_rating(self, player_name, new_skill,
+                                     last_played=None):
+                pass
+
+            def bulk_update_player_ratings(self, ratings, last_played=None):
+                pass
+
+            def save_player_ratings(self):
+                pass
+
+        # when
+        source = ListlessSource()
+
+        # then
+        self.assertEqual(source.load_many(['a'])['a'].mu, 25)
+        with self.assertRaises(NotImplementedError):
+            RatingIndex.from_source(source)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+import random
+import unittest
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from trueskill.data.game import Game
+from trueskill.engine.convergence import ConvergenceHistogram
+from trueskill.utils.calculate_ratings import _rate_game
+from trueskill.utils.maths import Gaussian
+from trueskill.utils.scheduler import partition_into_waves, \
+    rate_games_parallel
+
+
+def random_games(count, population, rng):
+    games = []
+    for _ in range(count):
+        players = rng.sample(range(population), 4)
+        teams = [[f"p{players[0]}", f"p{players[1]}"], [f"p{players[2]}"],
+                 [f"p{players[3]}"]]
+        ranks = rng.sample([1, 2, 3], 3)
+        games.append(Game(teams, ranks))
+    return games
+
+
+class TestPartitionIntoWaves(unittest.TestCase):
+    def test_games_sharing_a_player_go_in_later_waves(self):
+        # given
+        games = [Game([["a"], ["b"]], [1, 2]),
+                 Game([["c"], ["d"]], [1, 2]),
+                 Game([["b"], ["c"]], [1, 2]),
+                 Game([["e"], ["f"]], [1, 2]),
+                 Game([["a"], ["e"]], [1, 2])]
+
+        # when
+        waves = partition_into_waves(games)
+
+        # then
+        self.assertEqual(waves, [[0, 1, 3], [2, 4]])
+
+    def test_no_wave_shares_a_player_and_order_is_kept(self):
+        # given
+        games = random_games(500, 60, random.Random(1))
+
+        # when
+        waves = partition_into_waves(games)
+
+        # then
+        self.assertEqual(sorted(i for wave in waves for i in wave),
+                         list(range(len(games))))
+        wave_of = {}
+        for w, wave in enumerate(waves):
+            players = [p for i in wave for team in games[i].teams
+                       for p in team]
+            self.assertEqual(len(players), len(set(players)))
+            for i in wave:
+                wave_of[i] = w
+        last_game = {}
+        for i, game in enumerate(games):
+            for player in (p for team in game.teams for p in team):
+                if player in last_game:
+                    self.assertLess(wave_of[last_game[player]], wave_of[i])
+                last_game[player] = i
+
+
+class TestRateGamesParallel(unittest.TestCase):
+    def setUp(self) -> None:
+        self.games = random_games(300, 200, random.Random(2))
+        players = {p for game in self.games for team in game.teams
+                   for p in team}
+        self.sequential = {p: Gaussian(mu=25, sigma=25 / 3) for p in players}
+        self.sequential_stats = ConvergenceHistogram()
+        for game in self.games:
+            _, stats = _rate_game(self.sequential, game.teams, game.ranks,
+                                  25 / 300, 25 / 6)
+            self.sequential_stats.record(stats)
+
+    def assert_identical(self, ratings):
+        self.assertEqual(set(ratings), set(self.sequential))
+        for player, rating in self.sequential.items():
+            self.assertEqual(ratings[player].pi, rating.pi)
+            self.assertEqual(ratings[player].tau, rating.tau)
+
+    def test_threads_are_bit_identical_to_sequential(self):
+        # given
+        ratings = {p: Gaussian(mu=25, sigma=25 / 3) for p in self.sequential}
+
+        # when
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            rate_games_parallel(ratings, self.games, executor=executor,
+                                max_workers=4)
+
+        # then
+        self.assert_identical(ratings)
+
+    def test_processes_are_bit_identical_to_sequential(self):
+        # given
+        ratings = {p: Gaussian(mu=25, sigma=25 / 3) for p in self.sequential}
+
+        # when
+        convergence = ConvergenceHistogram()
+        with ProcessPoolExecutor(max_workers=2) as executor:
+            rate_games_parallel(ratings, self.games, executor=executor,
+                                max_workers=2, convergence=convergence)
+
+        # then
+        self.assert_identical(ratings)
+        self.assertEqual(convergence.games, len(self.games))
+        self.assertEqual(convergence.sweeps, self.sequential_stats.sweeps)
+        self.assertEqual(convergence.deltas.counts,
+                         self.sequential_stats.deltas.counts)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,145 @@
+import asyncio
+import json
+import tempfile
+import unittest
+from trueskill.data.game import Game
+from trueskill.data.player_ratings import CsvSource
+from trueskill.server import RatingServer
+from trueskill.utils.calculate_ratings import _rate_game
+from trueskill.utils.maths import Gaussian
+
+
+class TestRatingServer(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.server = RatingServer(CsvSource(self.tmp_dir.name),
+                                   max_delay=0.05)
+        listener = await self.server.start(port=0)
+        self.port = listener.sockets[0].getsockname()[1]
+
+    async def asyncTearDown(self) -> None:
+        await self.server.close()
+        self.tmp_dir.cleanup()
+
+    async def send(self, requests):
+        reader, writer = await asyncio.open_connection('127.0.0.1',
+                                                       self.port)
+        for request in requests:
+            writer.write(json.dumps(request).encode() + b'\n')
+        await writer.drain()
+        responses = [json.loads(await reader.readline()) for _ in requests]
+        writer.close()
+        await writer.wait_closed()
+        return responses
+
+    async def test_pipelined_games_match_sequential_ratings(self):
+        # given
+        games = [{"id": 1, "teams": [["a", "b"], ["c"]], "ranks": [2, 1]},
+                 {"id": 2, "teams": [["a"], ["c"], ["d"]],
+                  "ranks": [1, 3, 2]},
+                 {"id": 3, "teams": [["b"], ["d"]], "ranks": [1, 2]}]
+        expected = {p: Gaussian(mu=25, sigma=25 / 3) for p in "abcd"}
+
+        # when
+        responses = await self.send(games)
+
+        # then
+        self.assertEqual([r["id"] for r in responses], [1, 2, 3])
+        for game, response in zip(games, responses):
+            new_ratings, _ = _rate_game(expected, game["teams"],
+                                        game["ranks"], 25 / 300, 25 / 6)
+            self.assertEqual(response["ratings"],
+                             {p: [r.mu, r.sigma]
+                              for p, r in new_ratings.items()})
+        # and the three games were coalesced into one micro-batch
+        self.assertEqual(self.server.batches, 1)
+
+    async def test_concurrent_connections_serialize_updates(self):
+        # given
+        game = {"teams": [["a"], ["b"]], "ranks": [1, 2]}
+
+        # when
+        # every connection rates the same two players at once
+        results = await asyncio.gather(*(self.send([dict(game, id=i)])
+                                         for i in range(10)))
+
+        # then
+        sigmas = sorted(r[0]["ratings"]["a"][1] for r in results)
+        self.assertEqual(len(set(sigmas)), 10)
+        self.assertEqual(self.server.games, 10)
+
+    async def test_invalid_game_gets_an_error(self):
+        # when
+        responses = await self.send([
+            {"id": "x", "teams": [["a"], ["a"]], "ranks": [1, 2]},
+            {"id": "y", "teams": [["a"], ["b"]]}])
+
+        # then
+        self.assertIn("present multiple times", responses[0]["error"])
+        self.assertEqual(responses[0]["id"], "x")
+        self.assertIn("error", responses[1])
+        self.assertEqual(self.server.games, 0)
+
+    async def test_bad_game_in_a_batch_only_fails_itself(self):
+        # when
+        responses = await self.send([
+            {"id": 1, "teams": [["a"], ["b"]], "ranks": [1, 2]},
+            {"id": 2, "teams": [["a"], ["c"]], "ranks": ["x", 2]},
+            {"id": 3, "teams": [["b"], ["c"]], "ranks": [1, 2]}])
+
+        # then
+        self.assertIn("must be a number", responses[1]["error"])
+        self.assertIn("ratings", responses[0])
+        self.assertIn("ratings", responses[2])
+        self.assertEqual(self.server.games, 2)
+
+    def test_game_failing_to_rate_only_fails_itself(self):
+        # given
+        # unvalidated, so it fails in the engine rather than on submit
+        games = [Game([["a"], ["b"]], [1, 2]),
+                 Game([["a"], ["c"]], ["x", 2]),
+                 Game([["b"], ["c"]], [1, 2])]
+
+        # when
+        results = self.server._rate_batch(games)
+
+        # then
+        self.assertIn("error", results[1])
+        self.assertIn("ratings", results[0])
+        self.assertIn("ratings", results[2])
+
+    async def test_rejected_game_leaves_ratings_alone(self):
+        # given
+        self.server.draw_probability = 0
+        self.server.time_decay = 1.0
+        await self.send([{"teams": [["a"], ["b"]], "ranks": [1, 2],
+                          "timestamp": 0}])
+        data_src = self.server.data_src
+        ratings = data_src.load_many(["a", "b"])
+
+        # when
+        # a tie can't be rated without a draw probability
+        responses = await self.send([{"teams": [["a"], ["b"]],
+                                      "ranks": [1, 1],
+                                      "timestamp": 30 * 86400}])
+
+        # then
+        self.assertIn("error", responses[0])
+        self.assertEqual(data_src.load_many(["a", "b"]), ratings)
+        self.assertEqual(data_src.load_last_played(["a", "b"]),
+                         {"a": 0, "b": 0})
+
+    async def test_close_saves_ratings(self):
+        # given
+        await self.send([{"teams": [["a"], ["b"]], "ranks": [1, 2]}])
+
+        # when
+        await self.server.close()
+
+        # then
+        ratings = CsvSource(self.tmp_dir.name).data
+        self.assertGreater(ratings["a"].mu, ratings["b"].mu)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+import os
+import random
+import tempfile
+import unittest
+from trueskill.data.game import Game
+from trueskill.data.player_ratings import CsvSource
+from trueskill.engine.compiled_graph import CompiledTrueSkillEnv
+from trueskill.engine.through_time import TrueSkillThroughTime
+from trueskill.utils.calculate_ratings import calculate_skills_smoothed
+from trueskill.utils.constants import MU, SIGMA
+from trueskill.utils.maths import Gaussian
+
+
+class TestTrueSkillThroughTime(unittest.TestCase):
+    def test_single_game_agrees_with_the_game_graph(self):
+        # given
+        games = [Game([["a", "b"], ["c"]], [2, 1], weights={"b": 0.5})]
+        teams = [{"c": Gaussian(mu=MU, sigma=SIGMA)},
+                 {"a": Gaussian(mu=MU, sigma=SIGMA),
+                  "b": Gaussian(mu=MU, sigma=SIGMA)}]
+
+        # when
+        smoother = TrueSkillThroughTime(games, dynamics=0.0)
+        iterations = smoother.run()
+        expected = CompiledTrueSkillEnv(teams, dynamics=0.0,
+                                        weights={"b": 0.5}).update_ratings()
+
+        # then
+        ratings = smoother.ratings()
+        for player in expected:
+            self.assertAlmostEqual(ratings[player].mu, expected[player].mu,
+                                   9)
+            self.assertAlmostEqual(ratings[player].sigma,
+                                   expected[player].sigma, 9)
+        self.assertEqual(len(iterations), 2)
+        self.assertEqual(iterations[-1].step, 0)
+
+    def test_early_games_use_later_evidence(self):
+        # given
+        # a beats b, who then turns out to be strong by beating c many times
+        games = [Game([["a"], ["b"]], [1, 2])]
+        games += [Game([["b"], [f"c{i}"]], [1, 2]) for i in range(10)]
+
+        # when
+        # filtering only knows about the first game when rating a
+        filtered = CompiledTrueSkillEnv(
+            [{"a": Gaussian(mu=MU, sigma=SIGMA)},
+             {"b": Gaussian(mu=MU, sigma=SIGMA)}]).update_ratings()["a"]
+        smoother = TrueSkillThroughTime(games)
+        smoother.run()
+
+        # then
+        smoothed = smoother.history("a")[0][1]
+        self.assertGreater(smoothed.mu, filtered.mu + 1)
+        history = smoother.history("b")
+        self.assertEqual([game for game, _ in history], list(range(11)))
+        # b's first game is now rated knowing b is strong
+        self.assertGreater(history[0][1].mu, MU + 5)
+
+    def test_iterations_converge(self):
+        # given
+        rng = random.Random(0)
+        skills = {f"p{i}": rng.gauss(MU, SIGMA) for i in range(20)}
+        games = []
+        for _ in range(300):
+            one, two = rng.sample(sorted(skills), 2)
+            won = (skills[one] + rng.gauss(0, 4) >
+                   skills[two] + rng.gauss(0, 4))
+            games.append(Game([[one], [two]], [1, 2] if won else [2, 1]))
+
+        # when
+        iterations = TrueSkillThroughTime(games).run(tolerance=1e-3)
+
+        # then
+        self.assertLessEqual(iterations[-1].step, 1e-3)
+        self.assertLess(len(iterations), 30)
+        self.assertTrue(all(stats.seconds > 0 for stats in iterations))
+
+    def test_ties_without_draw_probability_raise_value_error(self):
+        # given
+        games = [Game([["a"], ["b"]], [1, 1])]
+
+        # when, then
+        with self.assertRaises(ValueError):
+            TrueSkillThroughTime(games)
+        TrueSkillThroughTime(games, draw_probability=0.1).run()
+
+
+class TestCalculateSkillsSmoothed(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def test_smoothed_ratings_are_saved(self):
+        # given
+        match_log = os.path.join(self.tmp_dir.name, 'games.csv')
+        with open(match_log, 'w') as f:
+            f.write("a;b,1;2\nb;c,1;2\nc;a,1;1\n")
+        seen = []
+
+        # when
+        iterations = calculate_skills_smoothed(
+            match_log, save_dir=self.tmp_dir.name, draw_probability=0.1,
+            on_iteration=seen.append)
+
+        # then
+        self.assertEqual(seen, iterations)
+        ratings = CsvSource(self.tmp_dir.name).data
+        self.assertEqual(set(ratings), {"a", "b", "c"})
+        self.assertGreater(ratings["a"].mu, ratings["c"].mu)
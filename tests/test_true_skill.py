@@ -1,9 +1,13 @@
+import math
 import unittest
 from unittest.mock import patch
 from trueskill.engine.true_skill_two_player import update_rating
 from trueskill.engine.true_skill_two_teams import update_ratings_in_team
 from trueskill.engine.true_skill import TrueSkillEnv
-from trueskill.utils.constants import MU, SIGMA
+from trueskill.engine.compiled_graph import CompiledTrueSkillEnv
+from trueskill.engine.true_skill_array import ArrayTrueSkillEnv
+from trueskill.engine.convergence import ConvergenceHistogram, GameStats
+from trueskill.utils.constants import MU, SIGMA, DYNAMIC_FACTOR
 from trueskill.utils.maths import Gaussian
 from trueskill.engine.factor_graph import Variable, PriorFactor, \
     PerformanceFactor, TruncateFactor, SumFactor
@@ -63,6 +67,46 @@ class TestTrueSkill(unittest.TestCase):
         self.assertAlmostEqual(new_ratings["player3"].sigma,
                                losing_team["player3"].sigma, 2)
 
+    def test_factor_graph_agrees_with_two_team_explicit_weights(self):
+        # given
+        winning_team = {"player1": Gaussian(mu=30, sigma=5),
+                        "player2": Gaussian(mu=MU, sigma=SIGMA)}
+        losing_team = {"player3": Gaussian(mu=MU, sigma=SIGMA),
+                       "player4": Gaussian(mu=20, sigma=4)}
+        teams = [dict(winning_team), dict(losing_team)]
+        weights = {"player1": 0.5, "player4": 0.25}
+
+        # when
+        update_ratings_in_team(winning_team, losing_team, weights=weights)
+        new_ratings = TrueSkillEnv(teams, weights=weights).update_ratings()
+
+        # then
+        for player, rating in {**winning_team, **losing_team}.items():
+            self.assertAlmostEqual(new_ratings[player].mu, rating.mu,
+                                   delta=0.01)
+            self.assertAlmostEqual(new_ratings[player].sigma, rating.sigma,
+                                   delta=0.01)
+
+    def test_partial_play_weights_scale_the_update(self):
+        # given
+        teams = [{"player1": Gaussian(mu=MU, sigma=SIGMA),
+                  "player2": Gaussian(mu=MU, sigma=SIGMA)},
+                 {"player3": Gaussian(mu=MU, sigma=SIGMA)}]
+
+        # when
+        full = TrueSkillEnv(teams).update_ratings()
+        ones = TrueSkillEnv(teams, weights={"player1": 1.0}).update_ratings()
+        partial = TrueSkillEnv(teams, weights={"player2": 0.0}) \
+            .update_ratings()
+
+        # then
+        self.assertEqual(full, ones)
+        # a player who didn't play is barely changed
+        self.assertAlmostEqual(partial["player2"].mu, MU, 1)
+        self.assertAlmostEqual(partial["player2"].sigma, SIGMA, 2)
+        self.assertGreater(partial["player1"].mu - MU,
+                           full["player1"].mu - MU)
+
     def test_three_team_converges(self):
         # given
         p1 = Gaussian(mu=MU, sigma=SIGMA)
@@ -77,6 +121,305 @@ class TestTrueSkill(unittest.TestCase):
         # then expect a convergence
 
 
+class TestLopsidedGames(unittest.TestCase):
+    def test_expected_winner_far_ahead_is_rated(self):
+        for mu, sigma in [(60, 1), (75, 2), (120, 2)]:
+            # given
+            winner, loser = Gaussian(mu=mu, sigma=sigma), \
+                Gaussian(mu=0, sigma=sigma)
+            teams = [{"winner": winner}, {"loser": loser}]
+            expected_winner, expected_loser = update_rating(winner, loser)
+
+            # when
+            results = [engine(teams).update_ratings()
+                       for engine in (TrueSkillEnv, CompiledTrueSkillEnv,
+                                      ArrayTrueSkillEnv)]
+
+            # then
+            for ratings in results:
+                self.assertEqual(ratings, results[0])
+                self.assertAlmostEqual(ratings["winner"].sigma,
+                                       expected_winner.sigma, 9)
+                self.assertAlmostEqual(ratings["loser"].sigma,
+                                       expected_loser.sigma, 9)
+                self.assertGreaterEqual(ratings["winner"].mu, mu)
+
+
+class TestDraws(unittest.TestCase):
+    """Checks against the published TrueSkill, whose default environment
+    has a draw probability of 0.1 and the same mu, sigma, beta and tau."""
+    def new_teams(self, num_teams):
+        return [{f"player{j}": Gaussian(mu=MU, sigma=SIGMA)}
+                for j in range(num_teams)]
+
+    def test_tiny_draw_probability_is_rated(self):
+        # given
+        teams = [{"player0": Gaussian(mu=30, sigma=8)},
+                 {"player1": Gaussian(mu=20, sigma=8)}]
+        expected = CompiledTrueSkillEnv(teams, ranks=[1, 1],
+                                        draw_probability=1e-6)
+        expected = expected.update_ratings()
+
+        for engine in (TrueSkillEnv, CompiledTrueSkillEnv):
+            # when
+            # 1 - w rounds to 0 for the draw margin of this probability
+            actual = engine(teams, ranks=[1, 1],
+                            draw_probability=1e-15).update_ratings()
+
+            # then
+            for player in expected:
+                self.assertAlmostEqual(actual[player].mu,
+                                       expected[player].mu, 6)
+                self.assertAlmostEqual(actual[player].sigma,
+                                       expected[player].sigma, 6)
+
+    def test_two_player_draw_matches_published_values(self):
+        # given
+        # the explicit update doesn't add the dynamics to c, so they are
+        # added to the prior here instead
+        prior = math.sqrt(SIGMA ** 2 + DYNAMIC_FACTOR ** 2)
+        one, two = Gaussian(mu=MU, sigma=prior), Gaussian(mu=MU, sigma=prior)
+
+        # when
+        drawn = update_rating(one, two, dynamics_factor=0, drawn=True,
+                              draw_probability=0.1)
+        won = update_rating(one, two, dynamics_factor=0,
+                            draw_probability=0.1)
+
+        # then
+        self.assertAlmostEqual(drawn[0].mu, 25.0, 9)
+        self.assertAlmostEqual(drawn[1].mu, 25.0, 9)
+        self.assertAlmostEqual(drawn[0].sigma, 6.4575196623173081, 5)
+        self.assertAlmostEqual(won[0].mu, 29.39583201999924, 5)
+        self.assertAlmostEqual(won[1].mu, 20.60416798000076, 5)
+        self.assertAlmostEqual(won[0].sigma, 7.171475587326186, 5)
+
+    def test_factor_graph_draw_matches_published_values(self):
+        # when
+        drawn = TrueSkillEnv(self.new_teams(2), ranks=[1, 1],
+                             draw_probability=0.1).update_ratings()
+        won = TrueSkillEnv(self.new_teams(2), ranks=[1, 2],
+                           draw_probability=0.1).update_ratings()
+
+        # then
+        self.assertAlmostEqual(drawn["player0"].mu, drawn["player1"].mu, 9)
+        self.assertAlmostEqual(drawn["player0"].mu, 25.0, 2)
+        self.assertAlmostEqual(drawn["player0"].sigma, 6.4575196623173081, 5)
+        self.assertAlmostEqual(won["player0"].mu, 29.39583201999924, 2)
+        self.assertAlmostEqual(won["player1"].mu, 20.60416798000076, 2)
+        self.assertAlmostEqual(won["player0"].sigma, 7.171475587326186, 5)
+
+    def test_free_for_all_matches_published_values(self):
+        # when
+        ratings = TrueSkillEnv(self.new_teams(3), ranks=[1, 2, 3],
+                               draw_probability=0.1).update_ratings()
+
+        # then
+        self.assertAlmostEqual(ratings["player0"].mu, 31.675352884500876, 2)
+        self.assertAlmostEqual(ratings["player1"].mu, 25.000000000003553, 2)
+        self.assertAlmostEqual(ratings["player2"].mu, 18.324647115501967, 2)
+        self.assertAlmostEqual(ratings["player0"].sigma, 6.6559853776206905,
+                               5)
+        self.assertAlmostEqual(ratings["player1"].sigma, 6.2078966412243233,
+                               5)
+        self.assertAlmostEqual(ratings["player2"].sigma, 6.6559853776206905,
+                               5)
+
+    def test_partial_ranking_draw(self):
+        # when
+        ratings = TrueSkillEnv(self.new_teams(3), ranks=[1, 1, 2],
+                               draw_probability=0.1).update_ratings()
+
+        # then
+        # the two teams that drew beat the last one
+        self.assertAlmostEqual(ratings["player0"].mu, ratings["player1"].mu,
+                               1)
+        self.assertGreater(ratings["player1"].mu, MU)
+        self.assertLess(ratings["player2"].mu, MU)
+
+    def test_factor_graph_agrees_with_two_team_explicit_draw(self):
+        # given
+        winning_team = {"player1": Gaussian(mu=30, sigma=5),
+                        "player2": Gaussian(mu=MU, sigma=SIGMA)}
+        losing_team = {"player3": Gaussian(mu=MU, sigma=SIGMA),
+                       "player4": Gaussian(mu=20, sigma=4)}
+        teams = [dict(winning_team), dict(losing_team)]
+
+        # when
+        update_ratings_in_team(winning_team, losing_team, drawn=True,
+                               draw_probability=0.2)
+        new_ratings = TrueSkillEnv(teams, ranks=[1, 1],
+                                   draw_probability=0.2).update_ratings()
+
+        # then
+        for player, rating in {**winning_team, **losing_team}.items():
+            self.assertAlmostEqual(new_ratings[player].mu, rating.mu,
+                                   delta=0.01)
+            self.assertAlmostEqual(new_ratings[player].sigma, rating.sigma,
+                                   delta=0.01)
+
+    def test_ties_without_draw_probability_raise_value_error(self):
+        for engine in (TrueSkillEnv, CompiledTrueSkillEnv, ArrayTrueSkillEnv):
+            # when, then
+            with self.assertRaises(ValueError):
+                engine(self.new_teams(2), ranks=[1, 1])
+        with self.assertRaises(ValueError):
+            update_rating(Gaussian(mu=MU, sigma=SIGMA),
+                          Gaussian(mu=MU, sigma=SIGMA), drawn=True)
+
+
+class TestConvergence(unittest.TestCase):
+    def setUp(self) -> None:
+        self.teams = [{"player1": Gaussian(mu=30, sigma=4)},
+                      {"player2": Gaussian(mu=MU, sigma=SIGMA)},
+                      {"player3": Gaussian(mu=20, sigma=6)},
+                      {"player4": Gaussian(mu=MU, sigma=2)}]
+
+    def test_stats_record_sweeps_until_converged(self):
+        # given
+        ts = TrueSkillEnv(self.teams)
+
+        # when
+        ts.update_ratings()
+
+        # then
+        self.assertTrue(ts.stats.converged)
+        self.assertGreater(ts.stats.sweeps, 1)
+        self.assertLessEqual(ts.stats.delta, ts.delta)
+        self.assertGreater(ts.stats.layer_times["game"], 0)
+
+    def test_max_iterations_caps_sweeps(self):
+        # given
+        ts = TrueSkillEnv(self.teams, delta=0, max_iterations=3)
+
+        # when
+        ts.update_ratings()
+
+        # then
+        self.assertEqual(ts.stats.sweeps, 3)
+        self.assertFalse(ts.stats.converged)
+
+    def test_stats_are_per_run(self):
+        for engine in (TrueSkillEnv, CompiledTrueSkillEnv, ArrayTrueSkillEnv):
+            # given
+            ts = engine(self.teams[:3], max_iterations=5)
+            expected = ts.update_ratings()
+            first = ts.stats
+
+            # when
+            actual = ts.update_ratings()
+
+            # then
+            self.assertIsNot(ts.stats, first)
+            self.assertEqual(ts.stats.sweeps, first.sweeps)
+            self.assertTrue(ts.stats.converged)
+            self.assertEqual(actual, expected)
+
+    def test_damping_converges_to_the_same_ratings(self):
+        # given
+        undamped = TrueSkillEnv(self.teams, delta=1e-12)
+        damped = TrueSkillEnv(self.teams, delta=1e-12, damping=0.5)
+
+        # when
+        expected = undamped.update_ratings()
+        actual = damped.update_ratings()
+
+        # then
+        for player in expected:
+            self.assertAlmostEqual(actual[player].mu, expected[player].mu, 5)
+            self.assertAlmostEqual(actual[player].sigma,
+                                   expected[player].sigma, 5)
+
+    def test_damping_leaves_two_team_games_alone(self):
+        for engine in (TrueSkillEnv, CompiledTrueSkillEnv, ArrayTrueSkillEnv):
+            # given
+            expected = engine(self.teams[:2]).update_ratings()
+
+            # when
+            actual = engine(self.teams[:2], damping=0.5).update_ratings()
+
+            # then
+            self.assertEqual(actual, expected)
+
+    def test_engines_agree_on_stats(self):
+        for damping in (0.0, 0.3):
+            # given
+            ts = TrueSkillEnv(self.teams, damping=damping)
+            compiled = CompiledTrueSkillEnv(self.teams, damping=damping)
+            array = ArrayTrueSkillEnv(self.teams, damping=damping)
+
+            # when
+            expected = ts.update_ratings()
+            actual = compiled.update_ratings()
+            array.update_ratings()
+
+            # then
+            self.assertEqual(expected, actual)
+            self.assertEqual(ts.stats.sweeps, compiled.stats.sweeps)
+            self.assertEqual(ts.stats.sweeps, array.stats.sweeps)
+
+    def test_histogram_percentiles(self):
+        # given
+        histogram = ConvergenceHistogram()
+        for i, sweeps in enumerate([1] * 90 + [5] * 9 + [40]):
+            stats = GameStats()
+            stats.sweeps = sweeps
+            stats.delta = i * 1e-6
+            stats.layer_times["game"] = i / 1000
+            histogram.record(stats)
+
+        # when, then
+        self.assertEqual(histogram.percentile(50), 1)
+        self.assertEqual(histogram.percentile(99), 5)
+        self.assertEqual(histogram.percentile(100), 40)
+        # to within the width of a bucket
+        self.assert_in_bucket(histogram.delta_percentile(50), 49e-6)
+        self.assert_in_bucket(histogram.seconds_percentile(99), 0.098)
+        self.assertEqual(histogram.delta_percentile(1), 0)
+        summary = histogram.to_dict()
+        self.assertEqual(summary["sweeps"], {"1": 90, "5": 9, "40": 1})
+        self.assert_in_bucket(summary["delta"]["p90"], 89e-6)
+        self.assertEqual(summary["delta"]["p99"],
+                         histogram.delta_percentile(99))
+        self.assertAlmostEqual(summary["seconds"]["max"], 0.099)
+
+    def assert_in_bucket(self, percentile, exact):
+        self.assertGreaterEqual(percentile, exact)
+        self.assertLessEqual(percentile, exact * 1.024)
+
+    def test_histogram_memory_is_bounded(self):
+        # given
+        histogram = ConvergenceHistogram()
+        stats = GameStats()
+
+        # when
+        for i in range(1, 100001):
+            stats.delta = i * 1e-9
+            histogram.record(stats)
+
+        # then
+        # five decades of deltas
+        self.assertLessEqual(len(histogram.deltas.counts), 501)
+        self.assert_in_bucket(histogram.delta_percentile(50), 50000e-9)
+        self.assertEqual(histogram.delta_percentile(100), 100000e-9)
+
+    def test_histogram_records_game_latency(self):
+        # given
+        histogram = ConvergenceHistogram()
+        ts = TrueSkillEnv(self.teams)
+        ts.update_ratings()
+
+        # when
+        histogram.record(ts.stats)
+
+        # then
+        self.assertEqual(histogram.deltas.count, 1)
+        self.assertEqual(histogram.delta_percentile(100), ts.stats.delta)
+        self.assertGreater(histogram.seconds_percentile(100), 0)
+        self.assertAlmostEqual(histogram.seconds.max,
+                               sum(ts.stats.layer_times.values()))
+
+
 class TestFactorGraph(unittest.TestCase):
     def test_prior_factor_down(self):
         # given
@@ -213,9 +556,3 @@ class TestFactorGraph(unittest.TestCase):
         expected_pi = 1
         expected_marginal = Gaussian(pi=expected_pi, tau=expected_tau)
         mock_kl.assert_called_with(expected_marginal)
-
-
-
-
-
-
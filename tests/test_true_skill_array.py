@@ -0,0 +1,67 @@
+import random
+import unittest
+from trueskill.engine.true_skill import TrueSkillEnv
+from trueskill.engine.true_skill_array import ArrayTrueSkillEnv
+from tests.helpers import random_teams
+
+
+class TestArrayTrueSkillEnv(unittest.TestCase):
+    def setUp(self) -> None:
+        self.rng = random.Random(0)
+
+    def test_agrees_with_true_skill_env(self):
+        for team_sizes in [(1, 1), (2, 3), (1, 1, 1), (4, 4, 4, 4),
+                           (3, 1, 2, 5, 1), (1,) * 30, (3,) * 20]:
+            # given
+            teams = random_teams(team_sizes, self.rng)
+
+            # when
+            expected = TrueSkillEnv(teams).update_ratings()
+            actual = ArrayTrueSkillEnv(teams).update_ratings()
+
+            # then
+            self.assertEqual(set(expected), set(actual))
+            for player in expected:
+                self.assertAlmostEqual(actual[player].mu,
+                                       expected[player].mu, 9,
+                                       msg=f"shape {team_sizes}")
+                self.assertAlmostEqual(actual[player].sigma,
+                                       expected[player].sigma, 9,
+                                       msg=f"shape {team_sizes}")
+
+    def test_agrees_with_true_skill_env_with_weights(self):
+        # given
+        teams = random_teams((3, 2, 4, 1), self.rng)
+        players = [player for team in teams for player in team]
+        weights = {player: self.rng.uniform(0, 1) for player in players[::2]}
+
+        # when
+        expected = TrueSkillEnv(teams, weights=weights).update_ratings()
+        actual = ArrayTrueSkillEnv(teams, weights=weights).update_ratings()
+
+        # then
+        for player in expected:
+            self.assertAlmostEqual(actual[player].mu, expected[player].mu, 9)
+            self.assertAlmostEqual(actual[player].sigma,
+                                   expected[player].sigma, 9)
+
+    def test_agrees_with_true_skill_env_with_draws(self):
+        for team_sizes, ranks in [((1, 1), [1, 1]), ((2, 3, 1), [1, 1, 2]),
+                                  ((1,) * 10, [1, 2, 2, 2, 3, 4, 4, 5, 6, 7])]:
+            # given
+            teams = random_teams(team_sizes, self.rng)
+
+            # when
+            expected = TrueSkillEnv(teams, ranks=ranks,
+                                    draw_probability=0.1).update_ratings()
+            actual = ArrayTrueSkillEnv(teams, ranks=ranks,
+                                       draw_probability=0.1).update_ratings()
+
+            # then
+            for player in expected:
+                self.assertAlmostEqual(actual[player].mu,
+                                       expected[player].mu, 9,
+                                       msg=f"ranks {ranks}")
+                self.assertAlmostEqual(actual[player].sigma,
+                                       expected[player].sigma, 9,
+                                       msg=f"ranks {ranks}")
@@ -0,0 +1,165 @@
+import unittest
+import numpy as np
+from trueskill.engine.true_skill_two_player import update_rating
+from trueskill.engine.true_skill_two_teams import update_ratings_in_team
+from trueskill.engine.true_skill_vectorized import update_rating_arrays, \
+    update_ratings_in_team_arrays
+from trueskill.utils.maths import Gaussian, decay_rating
+
+
+class TestVectorizedTrueSkill(unittest.TestCase):
+    def setUp(self) -> None:
+        self.rng = np.random.default_rng(0)
+
+    def test_1vs1_agrees_with_scalar(self):
+        # given
+        n = 200
+        winner_mu = self.rng.uniform(0, 50, n)
+        winner_sigma = self.rng.uniform(0.5, 9, n)
+        loser_mu = self.rng.uniform(0, 50, n)
+        loser_sigma = self.rng.uniform(0.5, 9, n)
+
+        # when
+        new_wmu, new_wsigma, new_lmu, new_lsigma = update_rating_arrays(
+            winner_mu, winner_sigma, loser_mu, loser_sigma)
+
+        # then
+        for i in range(n):
+            winner, loser = update_rating(
+                Gaussian(mu=winner_mu[i], sigma=winner_sigma[i]),
+                Gaussian(mu=loser_mu[i], sigma=loser_sigma[i]))
+            self.assertAlmostEqual(new_wmu[i], winner.mu, delta=1e-12)
+            self.assertAlmostEqual(new_wsigma[i], winner.sigma, delta=1e-12)
+            self.assertAlmostEqual(new_lmu[i], loser.mu, delta=1e-12)
+            self.assertAlmostEqual(new_lsigma[i], loser.sigma, delta=1e-12)
+
+    def test_two_teams_agrees_with_scalar(self):
+        # given
+        n, size = 100, 4
+        shape = (n, size)
+        winning_mu = self.rng.uniform(0, 50, shape)
+        winning_sigma = self.rng.uniform(0.5, 9, shape)
+        losing_mu = self.rng.uniform(0, 50, shape)
+        losing_sigma = self.rng.uniform(0.5, 9, shape)
+        # every team has at least one player and the rest are padding
+        winning_mask = np.arange(size) < self.rng.integers(1, size+1, n)[:, None]
+        losing_mask = np.arange(size) < self.rng.integers(1, size+1, n)[:, None]
+
+        # when
+        new_wmu, new_wsigma, new_lmu, new_lsigma = \
+            update_ratings_in_team_arrays(winning_mu, winning_sigma,
+                                          winning_mask, losing_mu,
+                                          losing_sigma, losing_mask)
+
+        # then
+        for i in range(n):
+            winning_team = {j: Gaussian(mu=winning_mu[i, j],
+                                        sigma=winning_sigma[i, j])
+                            for j in range(size) if winning_mask[i, j]}
+            losing_team = {j: Gaussian(mu=losing_mu[i, j],
+                                       sigma=losing_sigma[i, j])
+                           for j in range(size) if losing_mask[i, j]}
+            update_ratings_in_team(winning_team, losing_team)
+            for j in range(size):
+                if winning_mask[i, j]:
+                    self.assertAlmostEqual(new_wmu[i, j],
+                                           winning_team[j].mu, delta=1e-12)
+                    self.assertAlmostEqual(new_wsigma[i, j],
+                                           winning_team[j].sigma, delta=1e-12)
+                else:
+                    self.assertEqual(new_wmu[i, j], winning_mu[i, j])
+                if losing_mask[i, j]:
+                    self.assertAlmostEqual(new_lmu[i, j],
+                                           losing_team[j].mu, delta=1e-12)
+                    self.assertAlmostEqual(new_lsigma[i, j],
+                                           losing_team[j].sigma, delta=1e-12)
+
+    def test_two_teams_with_weights_agrees_with_scalar(self):
+        # given
+        n, size = 100, 3
+        shape = (n, size)
+        winning_mu = self.rng.uniform(0, 50, shape)
+        winning_sigma = self.rng.uniform(0.5, 9, shape)
+        losing_mu = self.rng.uniform(0, 50, shape)
+        losing_sigma = self.rng.uniform(0.5, 9, shape)
+        mask = np.ones(shape, dtype=bool)
+        winning_weights = self.rng.uniform(0, 1, shape)
+        losing_weights = self.rng.uniform(0, 1, shape)
+
+        # when
+        new_wmu, new_wsigma, new_lmu, new_lsigma = \
+            update_ratings_in_team_arrays(winning_mu, winning_sigma, mask,
+                                          losing_mu, losing_sigma, mask,
+                                          winning_weights=winning_weights,
+                                          losing_weights=losing_weights)
+
+        # then
+        for i in range(n):
+            winning_team = {("w", j): Gaussian(mu=winning_mu[i, j],
+                                               sigma=winning_sigma[i, j])
+                            for j in range(size)}
+            losing_team = {("l", j): Gaussian(mu=losing_mu[i, j],
+                                              sigma=losing_sigma[i, j])
+                           for j in range(size)}
+            weights = {**{("w", j): winning_weights[i, j]
+                          for j in range(size)},
+                       **{("l", j): losing_weights[i, j]
+                          for j in range(size)}}
+            update_ratings_in_team(winning_team, losing_team,
+                                   weights=weights)
+            for j in range(size):
+                self.assertAlmostEqual(new_wmu[i, j],
+                                       winning_team[("w", j)].mu, delta=1e-12)
+                self.assertAlmostEqual(new_wsigma[i, j],
+                                       winning_team[("w", j)].sigma,
+                                       delta=1e-12)
+                self.assertAlmostEqual(new_lmu[i, j],
+                                       losing_team[("l", j)].mu, delta=1e-12)
+                self.assertAlmostEqual(new_lsigma[i, j],
+                                       losing_team[("l", j)].sigma,
+                                       delta=1e-12)
+
+    def test_elapsed_time_agrees_with_decayed_scalar(self):
+        # given
+        n, size = 100, 3
+        shape = (n, size)
+        winning_mu = self.rng.uniform(0, 50, shape)
+        winning_sigma = self.rng.uniform(0.5, 9, shape)
+        losing_mu = self.rng.uniform(0, 50, shape)
+        losing_sigma = self.rng.uniform(0.5, 9, shape)
+        winning_mask = np.arange(size) < self.rng.integers(1, size+1, n)[:, None]
+        losing_mask = np.ones(shape, dtype=bool)
+        winning_elapsed = self.rng.uniform(0, 100 * 86400, shape)
+        losing_elapsed = self.rng.uniform(0, 100 * 86400, shape)
+
+        # when
+        new_wmu, new_wsigma, new_lmu, new_lsigma = \
+            update_ratings_in_team_arrays(winning_mu, winning_sigma,
+                                          winning_mask, losing_mu,
+                                          losing_sigma, losing_mask,
+                                          winning_elapsed=winning_elapsed,
+                                          losing_elapsed=losing_elapsed,
+                                          time_decay=0.5)
+
+        # then
+        for i in range(n):
+            winning_team = {j: decay_rating(
+                Gaussian(mu=winning_mu[i, j], sigma=winning_sigma[i, j]),
+                winning_elapsed[i, j], time_decay=0.5)
+                for j in range(size) if winning_mask[i, j]}
+            losing_team = {j: decay_rating(
+                Gaussian(mu=losing_mu[i, j], sigma=losing_sigma[i, j]),
+                losing_elapsed[i, j], time_decay=0.5) for j in range(size)}
+            update_ratings_in_team(winning_team, losing_team)
+            for j in range(size):
+                if winning_mask[i, j]:
+                    self.assertAlmostEqual(new_wsigma[i, j],
+                                           winning_team[j].sigma, delta=1e-9)
+                    self.assertAlmostEqual(new_wmu[i, j],
+                                           winning_team[j].mu, delta=1e-9)
+                else:
+                    self.assertEqual(new_wsigma[i, j], winning_sigma[i, j])
+                self.assertAlmostEqual(new_lsigma[i, j],
+                                       losing_team[j].sigma, delta=1e-9)
+                self.assertAlmostEqual(new_lmu[i, j], losing_team[j].mu,
+                                       delta=1e-9)
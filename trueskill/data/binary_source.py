@@ -0,0 +1,242 @@
+import argparse
+import math
+import mmap
+from array import array
+import os
+import struct
+from typing import Dict, Optional, Tuple
+from trueskill.data.player_ratings import DataSource, parse_rating
+from trueskill.utils.maths import Gaussian
+from trueskill.utils.constants import MU, SIGMA
+
+# header: magic, format version, number of players. Like the records it is
+# in native byte order so the records can be read through memoryview casts.
+_HEADER = struct.Struct('=4sIQ')
+_MAGIC = b'TSKB'
+_VERSION = 2
+_RECORD_SIZE = 24
+# version 1 records had no time of the last game
+_V1_RECORD_SIZE = 16
+
+
+def _record(values: Tuple[float, ...]) -> Tuple[float, float, float]:
+    mu, sigma, *last_played = values
+    if not last_played or last_played[0] is None:
+        return mu, sigma, math.nan
+    return mu, sigma, last_played[0]
+
+
+def write_binary_snapshot(ratings: Dict[str, Tuple[float, ...]], path: str):
+    """Writes ratings to a binary snapshot.
+
+    The file is a header followed by a fixed width (mu, sigma, last played)
+    float64 record per player, the offset of each player's name in the name
+    table and then the UTF-8 name table itself. Records are sorted by name
+    so that the name table doubles as the index, searched by bisection. An
+    unknown time of the last game is stored as nan.
+
+    Args:
+        ratings: The (mu, sigma) or (mu, sigma, last played) of every
+        player keyed by name.
+        path: Where to write the snapshot, it is replaced atomically.
+    """
+    names = sorted(ratings, key=lambda name: name.encode())
+    encoded = [name.encode() for name in names]
+    offsets = [0]
+    for name in encoded:
+        offsets.append(offsets[-1] + len(name))
+    with open(path + '.tmp', 'wb') as f:
+        f.write(_HEADER.pack(_MAGIC, _VERSION, len(names)))
+        f.write(array('d', [x for name in names
+                            for x in _record(ratings[name])]).tobytes())
+        f.write(array('Q', offsets).tobytes())
+        f.write(b''.join(encoded))
+    os.replace(path + '.tmp', path)
+
+
+def convert_csv_to_binary(csv_path: str, binary_path: str):
+    """Converts a true_skills.csv file into a binary snapshot."""
+    ratings = {}
+    with open(csv_path, 'r') as f:
+        for line in f:
+            name, rating, last_played = parse_rating(line.rstrip('\n'))
+            ratings[name] = (rating.mu, rating.sigma, last_played)
+    write_binary_snapshot(ratings, binary_path)
+
+
+def _read_version_1(path: str) -> Dict[str, Tuple[float, float]]:
+    """Reads the (mu, sigma) of every player in a version 1 snapshot."""
+    with open(path, 'rb') as f:
+        content = f.read()
+    _, _, count = _HEADER.unpack_from(content)
+    records_end = _HEADER.size + _V1_RECORD_SIZE * count
+    offsets_end = records_end + 8 * (count + 1)
+    records = array('d', content[_HEADER.size:records_end])
+    offsets = array('Q', content[records_end:offsets_end])
+    names = content[offsets_end:]
+    return {names[offsets[i]:offsets[i + 1]].decode():
+            (records[2 * i], records[2 * i + 1]) for i in range(count)}
+
+
+class BinarySource(DataSource):
+    """Rating store backed by a memory mapped binary snapshot.
+
+    Opening the store only maps the file, ratings are read straight out of
+    the mapping when a player is loaded and existing players are updated in
+    place. Players that are not yet in the snapshot are held in memory until
+    the next save, which rewrites the snapshot to add them. A version 1
+    snapshot, without the time of each player's last game, is rewritten in
+    the current format when it is opened.
+    """
+    DATA_SOURCE = 'true_skills.bin'
+
+    def __init__(self, data_dir='.'):
+        super().__init__()
+        if not os.path.exists(data_dir):
+            raise NotADirectoryError("Data directory doesn't exist.")
+        self.data_dir = data_dir
+        self.new_players = {}
+        self.new_last_played = {}
+        self._file = None
+        self._map = None
+        self._records = None
+        self._offsets = None
+        self.count = 0
+        self.connect_to_source(data_dir=data_dir)
+
+    def connect_to_source(self, data_dir='.'):
+        path = os.path.join(data_dir, self.DATA_SOURCE)
+        if not os.path.exists(path):
+            write_binary_snapshot({}, path)
+        with open(path, 'rb') as f:
+            magic, version, _ = _HEADER.unpack(f.read(_HEADER.size))
+        if magic != _MAGIC or version not in (1, _VERSION):
+            raise ValueError(f"{path} is not a version 1 or {_VERSION} "
+                             f"rating snapshot.")
+        if version == 1:
+            write_binary_snapshot(_read_version_1(path), path)
+        self._file = open(path, 'r+b')
+        self._map = mmap.mmap(self._file.fileno(), 0)
+        _, _, self.count = _HEADER.unpack_from(self._map)
+        records_end = _HEADER.size + _RECORD_SIZE * self.count
+        offsets_end = records_end + 8 * (self.count + 1)
+        view = memoryview(self._map)
+        self._records = view[_HEADER.size:records_end].cast('d')
+        self._offsets = view[records_end:offsets_end].cast('Q')
+        self._names_start = offsets_end
+        view.release()
+
+    def close(self):
+        """Releases the memory map, pending new players are not saved."""
+        if self._map is not None:
+            self._records.release()
+            self._offsets.release()
+            self._map.close()
+            self._file.close()
+            self._map = None
+
+    def _name_at(self, idx: int) -> bytes:
+        start = self._names_start + self._offsets[idx]
+        return self._map[start:self._names_start + self._offsets[idx + 1]]
+
+    def _find(self, player_name: str) -> int:
+        """Bisects the sorted name table, returns -1 if not found."""
+        key = player_name.encode()
+        low, high = 0, self.count
+        while low < high:
+            mid = (low + high) // 2
+            if self._name_at(mid) < key:
+                low = mid + 1
+            else:
+                high = mid
+        if low < self.count and self._name_at(low) == key:
+            return low
+        return -1
+
+    def load_player_ratings(self, player_name):
+        if player_name in self.new_players:
+            return self.new_players[player_name]
+        idx = self._find(player_name)
+        if idx < 0:
+            return Gaussian(mu=MU, sigma=SIGMA)
+        return Gaussian(mu=self._records[3 * idx],
+                        sigma=self._records[3 * idx + 1])
+
+    def _last_played(self, player_name) -> Optional[float]:
+        if player_name in self.new_players:
+            return self.new_last_played.get(player_name)
+        idx = self._find(player_name)
+        if idx < 0 or math.isnan(self._records[3 * idx + 2]):
+            return None
+        return self._records[3 * idx + 2]
+
+    def load_last_played(self, player_names):
+        last_played = {}
+        for player_name in player_names:
+            played = self._last_played(player_name)
+            if played is not None:
+                last_played[player_name] = played
+        return last_played
+
+    def _update(self, player_name, new_skill, last_played=None):
+        idx = (self._find(player_name)
+               if player_name not in self.new_players else -1)
+        if idx < 0:
+            self.new_players[player_name] = new_skill
+            if last_played is not None:
+                self.new_last_played[player_name] = last_played
+        else:
+            self._records[3 * idx] = new_skill.mu
+            self._records[3 * idx + 1] = new_skill.sigma
+            if last_played is not None:
+                self._records[3 * idx + 2] = last_played
+
+    def update_player_rating(self, player_name, new_skill,
+                             last_played=None):
+        self._update(player_name, new_skill, last_played)
+        self._notify({player_name: new_skill})
+
+    def bulk_update_player_ratings(self, ratings, last_played=None):
+        last_played = last_played or {}
+        for player_name, new_skill in ratings.items():
+            self._update(player_name, new_skill,
+                         last_played.get(player_name))
+        self._notify(ratings)
+
+    def all_player_ratings(self):
+        ratings = {self._name_at(i).decode():
+                   Gaussian(mu=self._records[3 * i],
+                            sigma=self._records[3 * i + 1])
+                   for i in range(self.count)}
+        ratings.update(self.new_players)
+        return ratings
+
+    def save_player_ratings(self):
+        """Flushes in place updates, rewriting the snapshot only if there
+        are new players to add to it."""
+        if not self.new_players:
+            self._map.flush()
+            return
+        records = self._records
+        ratings = {self._name_at(i).decode(): (records[3 * i],
+                                               records[3 * i + 1],
+                                               records[3 * i + 2])
+                   for i in range(self.count)}
+        ratings.update({name: (rating.mu, rating.sigma,
+                               self.new_last_played.get(name))
+                        for name, rating in self.new_players.items()})
+        self.close()
+        write_binary_snapshot(ratings,
+                              os.path.join(self.data_dir, self.DATA_SOURCE))
+        self.new_players = {}
+        self.new_last_played = {}
+        self.connect_to_source(data_dir=self.data_dir)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Convert a true_skills.csv file to a binary snapshot.")
+    parser.add_argument("csv_path", type=str)
+    parser.add_argument("binary_path", type=str)
+    args = parser.parse_args()
+    convert_csv_to_binary(args.csv_path, args.binary_path)
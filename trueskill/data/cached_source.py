@@ -0,0 +1,156 @@
+from collections import OrderedDict
+from trueskill.data.player_ratings import DataSource
+
+
+class CachedSource(DataSource):
+    """LRU cache of ratings with write-back in front of another DataSource.
+
+    Updates only mark the cached rating as dirty. A dirty rating is written
+    to the backing source when it is evicted, in batches of flush_every
+    ratings, or on save_player_ratings, which writes back everything that
+    is dirty and then saves the backing source. The time of each player's
+    last game is kept with their dirty rating and written back with it,
+    other times are read from the backing source.
+
+    Attributes:
+        hits: Loads served from the cache.
+        misses: Loads that went to the backing source.
+        evictions: Ratings evicted to stay within capacity.
+        write_backs: Dirty ratings written to the backing source.
+    """
+    def __init__(self, backend: DataSource, capacity=100000, flush_every=1000):
+        super().__init__()
+        if capacity < 1:
+            raise ValueError("Cache capacity must be at least one.")
+        self.backend = backend
+        self.capacity = capacity
+        self.flush_every = flush_every
+        self.cache = OrderedDict()
+        self.dirty = set()
+        # evicted dirty ratings waiting to be written back
+        self.pending = {}
+        # times of the last game of the dirty and pending players
+        self.last_played = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.write_backs = 0
+
+    def connect_to_source(self):
+        # the backing source is connected when it is created
+        pass
+
+    def _cached(self, player_name):
+        """Returns the cached rating and marks it recently used, or None."""
+        if player_name in self.cache:
+            self.cache.move_to_end(player_name)
+            return self.cache[player_name]
+        if player_name in self.pending:
+            # not written back yet so the pending rating is the latest
+            rating = self.pending.pop(player_name)
+            self._insert(player_name, rating, dirty=True)
+            return rating
+        return None
+
+    def _insert(self, player_name, rating, dirty):
+        self.cache[player_name] = rating
+        self.cache.move_to_end(player_name)
+        if dirty:
+            self.dirty.add(player_name)
+        while len(self.cache) > self.capacity:
+            name, evicted = self.cache.popitem(last=False)
+            self.evictions += 1
+            if name in self.dirty:
+                self.dirty.remove(name)
+                self.pending[name] = evicted
+        if len(self.pending) >= self.flush_every:
+            self._write_back()
+
+    def _write_back(self):
+        if self.pending:
+            last_played = {name: self.last_played.pop(name)
+                           for name in self.pending
+                           if name in self.last_played}
+            self.backend.bulk_update_player_ratings(self.pending, last_played)
+            self.write_backs += len(self.pending)
+            self.pending = {}
+
+    def load_player_ratings(self, player_name):
+        rating = self._cached(player_name)
+        if rating is not None:
+            self.hits += 1
+            return rating
+        self.misses += 1
+        rating = self.backend.load_player_ratings(player_name)
+        self._insert(player_name, rating, dirty=False)
+        return rating
+
+    def load_many(self, player_names):
+        ratings = {}
+        missing = []
+        for player_name in player_names:
+            rating = self._cached(player_name)
+            if rating is None:
+                missing.append(player_name)
+            else:
+                ratings[player_name] = rating
+        self.hits += len(ratings)
+        self.misses += len(missing)
+        if missing:
+            loaded = self.backend.load_many(missing)
+            for player_name, rating in loaded.items():
+                self._insert(player_name, rating, dirty=False)
+            ratings.update(loaded)
+        return ratings
+
+    def load_last_played(self, player_names):
+        last_played, missing = {}, []
+        for player_name in player_names:
+            if player_name in self.last_played:
+                last_played[player_name] = self.last_played[player_name]
+            else:
+                missing.append(player_name)
+        if missing:
+            last_played.update(self.backend.load_last_played(missing))
+        return last_played
+
+    def _update(self, player_name, new_skill, last_played=None):
+        self.pending.pop(player_name, None)
+        if last_played is not None:
+            self.last_played[player_name] = last_played
+        self._insert(player_name, new_skill, dirty=True)
+
+    def update_player_rating(self, player_name, new_skill,
+                             last_played=None):
+        self._update(player_name, new_skill, last_played)
+        self._notify({player_name: new_skill})
+
+    def bulk_update_player_ratings(self, ratings, last_played=None):
+        last_played = last_played or {}
+        for player_name, new_skill in ratings.items():
+            self._update(player_name, new_skill,
+                         last_played.get(player_name))
+        self._notify(ratings)
+
+    def all_player_ratings(self):
+        """The backing source's ratings overlaid with the ones not yet
+        written back to it."""
+        ratings = self.backend.all_player_ratings()
+        ratings.update(self.pending)
+        ratings.update({name: self.cache[name] for name in self.dirty})
+        return ratings
+
+    def save_player_ratings(self):
+        """Writes back every dirty rating and saves the backing source."""
+        for player_name in self.dirty:
+            self.pending[player_name] = self.cache[player_name]
+        self.dirty.clear()
+        self._write_back()
+        self.backend.save_player_ratings()
+
+    def stats(self):
+        """The cache counters as a dict."""
+        return {"hits": self.hits, "misses": self.misses,
+                "evictions": self.evictions, "write_backs": self.write_backs,
+                "size": len(self.cache), "dirty": len(self.dirty),
+                "pending": len(self.pending)}
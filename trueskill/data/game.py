@@ -1,7 +1,21 @@
-from typing import List
+from typing import Dict, Iterator, List, NamedTuple, Optional
+import csv
+import gzip
+import json
+import math
 import os
 
 
+class Game(NamedTuple):
+    """A single game outcome read from a match log."""
+    teams: List[List[str]]
+    ranks: List[int]
+    timestamp: Optional[float] = None
+    weights: Optional[Dict[str, float]] = None
+    # where the game was read from, for error messages
+    line_num: Optional[int] = None
+
+
 def load_teams_from_game_info(game_info: str):
     """Load and validate players and teams from a CSV file.
 
@@ -43,3 +57,168 @@ def validate_teams(teams: List[List[str]]):
                 raise ValueError(f"Player {player} present multiple times.")
 
 
+def validate_ranks(teams: List[List[str]], ranks: List[int]):
+    """Validates the ranks given for the teams in a game.
+
+    Args:
+        teams: A list of lists, where each sublist contains players in the team
+        ranks: Where each team ranked in the game, with low being the best.
+        Teams with the same rank drew.
+    Raises:
+        ValueError: If the ranks are not numbers or are not consistent with
+        the teams.
+    """
+    if not isinstance(ranks, (list, tuple)):
+        raise ValueError("Ranks must be a list.")
+    if len(teams) != len(ranks):
+        raise ValueError("Rank must be given for each team.")
+    for rank in ranks:
+        # bools are ints, and strings would sort lexicographically
+        if (isinstance(rank, bool) or not isinstance(rank, (int, float))
+                or math.isnan(rank)):
+            raise ValueError(f"Rank {rank!r} must be a number.")
+
+
+def validate_weights(teams: List[List[str]], weights: Dict[str, float]):
+    """Validates the partial play weights given for the players in a game.
+
+    Args:
+        teams: A list of lists, where each sublist contains players in the team
+        weights: The fraction of the game played by the players who didn't
+        play all of it, keyed by player.
+    Raises:
+        ValueError: If the weights are not keyed by player, or a weight is
+        for a player not in the game or is not a number between 0 and 1.
+    """
+    if not isinstance(weights, dict):
+        raise ValueError("Weights must be keyed by player.")
+    players = {player for team in teams for player in team}
+    for player, weight in weights.items():
+        if player not in players:
+            raise ValueError(f"Weight given for player {player} who is not "
+                             f"in the game.")
+        if isinstance(weight, bool) or not isinstance(weight, (int, float)):
+            raise ValueError(f"Weight of player {player} must be a number.")
+        if not 0 <= weight <= 1:
+            raise ValueError(f"Weight of player {player} must be between 0 "
+                             f"and 1.")
+
+
+def load_games_from_match_log(match_log: str) -> List[Game]:
+    """Load and validate every game in a match log.
+
+    The match log is a JSON Lines file where each line is one game, e.g.
+    {"teams": [["alice", "bob"], ["carol"]], "ranks": [1, 2],
+     "timestamp": 1600000000, "weights": {"bob": 0.5}}. The timestamp is
+    optional, but if any game has one then all of them must. The weights are
+    optional too, they give the fraction of the game played by players who
+    joined late or left early. Games are returned in chronological order,
+    games without timestamps are kept in the order they appear in the log.
+
+    Args:
+        match_log: Path to the match log file.
+
+    Returns:
+        A list of the games in the order they should be rated.
+    Raises:
+        ValueError: If a game in the match log is not valid.
+    """
+    if not os.path.exists(match_log):
+        raise FileExistsError("Invalid path to match log file.")
+    with open(match_log, "r") as f:
+        games = [_parse_json_game(line, line_num)
+                 for line_num, line in enumerate(f, start=1) if line.strip()]
+    _check_timestamps(games)
+    # sort is stable so games with equal timestamps keep their order
+    if games and games[0].timestamp is not None:
+        games.sort(key=lambda game: game.timestamp)
+    return games
+
+
+def iter_games(match_log: str) -> Iterator[Game]:
+    """Lazily read and validate the games of a match log too large to load.
+
+    JSON Lines logs have the format of load_games_from_match_log. CSV logs
+    have a game per row with the columns teams, ranks and an optional
+    timestamp, players in a team are separated by "|" and teams and ranks
+    by ";", e.g. alice|bob;carol,1;2,1600000000. Partial play weights are
+    only supported in JSON Lines logs. A ".gz" suffix after the
+    ".jsonl", ".json" or ".csv" extension means the log is gzip compressed.
+
+    Only one line is held in memory at a time so the games can't be
+    sorted, they must already be in chronological order.
+
+    Args:
+        match_log: Path to the match log file.
+    Yields:
+        The games in the order they appear in the log.
+    Raises:
+        ValueError: If a game is not valid or is older than the game before
+        it, raised when that game is reached.
+    """
+    if not os.path.exists(match_log):
+        raise FileExistsError("Invalid path to match log file.")
+    name = match_log[:-3] if match_log.endswith(".gz") else match_log
+    if name.endswith(".csv"):
+        parse = _parse_csv_game
+    elif name.endswith((".jsonl", ".json")):
+        parse = _parse_json_game
+    else:
+        raise ValueError("Match log must be a .jsonl, .json or .csv file, "
+                         "optionally gzip compressed.")
+    opener = gzip.open if match_log.endswith(".gz") else open
+    previous = None
+    with opener(match_log, "rt") as f:
+        for line_num, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            game = parse(line, line_num)
+            if previous is not None:
+                _check_timestamps([previous, game])
+                if (game.timestamp is not None and
+                        game.timestamp < previous.timestamp):
+                    raise ValueError(f"Game on line {line_num} of match log "
+                                     f"is older than the game before it.")
+            previous = game
+            yield game
+
+
+def _parse_json_game(line: str, line_num: int) -> Game:
+    try:
+        record = json.loads(line)
+        game = Game(teams=record["teams"], ranks=record["ranks"],
+                    timestamp=record.get("timestamp"),
+                    weights=record.get("weights"), line_num=line_num)
+        validate_teams(game.teams)
+        validate_ranks(game.teams, game.ranks)
+        if game.weights is not None:
+            validate_weights(game.teams, game.weights)
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError(f"Invalid game on line {line_num} of match "
+                         f"log: {e}")
+    return game
+
+
+def _parse_csv_game(line: str, line_num: int) -> Game:
+    fields = next(csv.reader([line]))
+    try:
+        if len(fields) not in (2, 3):
+            raise ValueError(f"expected 2 or 3 columns, got {len(fields)}")
+        teams = [team.split("|") for team in fields[0].split(";")]
+        ranks = [int(rank) for rank in fields[1].split(";")]
+        timestamp = float(fields[2]) if len(fields) == 3 else None
+    except ValueError as e:
+        raise ValueError(f"Invalid game on line {line_num} of match "
+                         f"log: {e}")
+    game = Game(teams=teams, ranks=ranks, timestamp=timestamp,
+                line_num=line_num)
+    validate_teams(game.teams)
+    validate_ranks(game.teams, game.ranks)
+    return game
+
+
+def _check_timestamps(games: List[Game]):
+    timestamped = [game.timestamp is not None for game in games]
+    if any(timestamped) and not all(timestamped):
+        raise ValueError("Either all or none of the games in the match "
+                         "log must have a timestamp.")
@@ -0,0 +1,180 @@
+import random
+from typing import Dict, List, Tuple, Iterable, Iterator
+from trueskill.data.player_ratings import DataSource
+from trueskill.utils.maths import Gaussian
+
+_MAX_LEVEL = 32
+
+
+class _Node:
+    __slots__ = ('key', 'next', 'width')
+
+    def __init__(self, key, level):
+        self.key = key
+        self.next = [None] * level
+        # the number of positions each link skips, the links of the last
+        # nodes skip to the position after the end of the list
+        self.width = [1] * level
+
+
+class IndexableSkipList:
+    """Sorted list of unique keys with O(log n) insert, remove, rank and
+    lookup by position, a skip list whose links record how many positions
+    they skip."""
+    def __init__(self, keys: Iterable = (), seed=None):
+        self._head = _Node(None, _MAX_LEVEL)
+        self._random = random.Random(seed)
+        # levels above this one only have the head's links
+        self.level = 1
+        self.size = 0
+        self._build(sorted(keys))
+
+    def __len__(self):
+        return self.size
+
+    def _random_level(self):
+        level = 1
+        while level < _MAX_LEVEL and self._random.random() < 0.5:
+            level += 1
+        return level
+
+    def _build(self, keys: List):
+        """Links sorted keys in one pass."""
+        last = [self._head] * _MAX_LEVEL
+        last_position = [0] * _MAX_LEVEL
+        for position, key in enumerate(keys, start=1):
+            node = _Node(key, self._random_level())
+            self.level = max(self.level, len(node.next))
+            for i in range(len(node.next)):
+                last[i].next[i] = node
+                last[i].width[i] = position - last_position[i]
+                last[i], last_position[i] = node, position
+        self.size = len(keys)
+        for i in range(self.level):
+            last[i].width[i] = self.size + 1 - last_position[i]
+
+    def _path(self, key):
+        """The last node before key on every level and its position."""
+        update = [self._head] * _MAX_LEVEL
+        positions = [0] * _MAX_LEVEL
+        node, position = self._head, 0
+        for i in reversed(range(self.level)):
+            while node.next[i] is not None and node.next[i].key < key:
+                position += node.width[i]
+                node = node.next[i]
+            update[i] = node
+            positions[i] = position
+        return update, positions
+
+    def insert(self, key):
+        update, positions = self._path(key)
+        level = self._random_level()
+        for i in range(self.level, level):
+            # a new level starts with the head linking past the end
+            self._head.width[i] = self.size + 1
+        self.level = max(self.level, level)
+        new = _Node(key, level)
+        position = positions[0]
+        for i in range(self.level):
+            if i < level:
+                new.next[i] = update[i].next[i]
+                update[i].next[i] = new
+                skipped = position - positions[i]
+                new.width[i] = update[i].width[i] - skipped
+                update[i].width[i] = skipped + 1
+            else:
+                update[i].width[i] += 1
+        self.size += 1
+
+    def remove(self, key):
+        update, _ = self._path(key)
+        target = update[0].next[0]
+        if target is None or target.key != key:
+            raise KeyError(key)
+        for i in range(self.level):
+            if update[i].next[i] is target:
+                update[i].width[i] += target.width[i] - 1
+                update[i].next[i] = target.next[i]
+            else:
+                update[i].width[i] -= 1
+        self.size -= 1
+
+    def index(self, key) -> int:
+        """The 0 based position of key."""
+        update, positions = self._path(key)
+        node = update[0].next[0]
+        if node is None or node.key != key:
+            raise KeyError(key)
+        return positions[0]
+
+    def iter_from(self, start: int) -> Iterator:
+        """Iterates over the keys from position start onwards."""
+        node, position = self._head, 0
+        for i in reversed(range(self.level)):
+            while (node.next[i] is not None and
+                   position + node.width[i] <= start + 1):
+                position += node.width[i]
+                node = node.next[i]
+        if position != start + 1:
+            # start is past the end
+            return
+        while node is not None:
+            yield node.key
+            node = node.next[0]
+
+
+class Leaderboard:
+    """Players ordered by their conservative skill, mu - sigmas * sigma.
+
+    The order is kept in an IndexableSkipList, so the rank of a player and a
+    page of the leaderboard take O(log n) plus the page length, and every
+    changed rating costs O(log n) to move. Ties are broken by name.
+    """
+    def __init__(self, ratings: Dict[str, Gaussian] = None, sigmas=3,
+                 seed=None):
+        self.sigmas = sigmas
+        self.scores = {name: rating.mu - sigmas * rating.sigma
+                       for name, rating in (ratings or {}).items()}
+        self._order = IndexableSkipList(
+            ((-score, name) for name, score in self.scores.items()),
+            seed=seed)
+
+    @classmethod
+    def from_source(cls, data_src: DataSource, sigmas=3) -> 'Leaderboard':
+        """Ranks every rating in data_src and follows its updates."""
+        leaderboard = cls(data_src.all_player_ratings(), sigmas)
+        data_src.subscribe(leaderboard.update)
+        return leaderboard
+
+    def __len__(self):
+        return len(self._order)
+
+    def update(self, ratings: Dict[str, Gaussian]):
+        """Moves the changed ratings to their new place."""
+        for name, rating in ratings.items():
+            if name in self.scores:
+                self._order.remove((-self.scores[name], name))
+            score = rating.mu - self.sigmas * rating.sigma
+            self.scores[name] = score
+            self._order.insert((-score, name))
+
+    def rank(self, player_name: str) -> int:
+        """The 1 based rank of a player, 1 being the best."""
+        return self._order.index((-self.scores[player_name],
+                                  player_name)) + 1
+
+    def page(self, number: int, size=20) -> List[Tuple[str, float]]:
+        """The (name, conservative skill) of the players on a page of the
+        leaderboard, pages are numbered from 1."""
+        if number < 1:
+            raise ValueError("Pages are numbered from 1.")
+        players = []
+        for neg_score, name in self._order.iter_from((number - 1) * size):
+            if len(players) == size:
+                break
+            players.append((name, -neg_score))
+        return players
+
+    def top(self, n=10) -> List[Tuple[str, float]]:
+        """The (name, conservative skill) of the n best players."""
+        return self.page(1, size=n)
@@ -0,0 +1,83 @@
+import os
+from trueskill.data.player_ratings import CsvSource, format_rating, \
+    parse_rating
+
+
+class LogSource(CsvSource):
+    """Rating store made of a CSV snapshot plus an append-only log.
+
+    Saving appends only the ratings changed since the last save to the log,
+    so its cost is proportional to the players touched rather than to the
+    whole population. Once the log holds compact_every entries it is
+    compacted into a new snapshot. Loading reads the snapshot and then
+    replays the log on top of it.
+    """
+    DATA_LOG = 'true_skills.log'
+
+    def __init__(self, data_dir='.', compact_every=100000):
+        self.compact_every = compact_every
+        self.dirty = set()
+        self.log_entries = 0
+        super().__init__(data_dir=data_dir)
+
+    def connect_to_source(self, data_dir='.'):
+        super().connect_to_source(data_dir=data_dir)
+        log_path = os.path.join(data_dir, self.DATA_LOG)
+        if os.path.exists(log_path):
+            with open(log_path, 'rb+') as f:
+                content = f.read()
+                complete = content.rfind(b'\n') + 1
+                if complete < len(content):
+                    # drop a save interrupted part way through a line so
+                    # the next save starts on a fresh line
+                    f.truncate(complete)
+            for line in content[:complete].decode().splitlines():
+                try:
+                    name, rating, last_played = parse_rating(line)
+                except ValueError:
+                    raise ValueError(f"Invalid rating in {log_path}: "
+                                     f"{line!r}")
+                self.data[name] = rating
+                if last_played is not None:
+                    self.last_played[name] = last_played
+                self.log_entries += 1
+
+    def update_player_rating(self, player_name, new_skill,
+                             last_played=None):
+        super().update_player_rating(player_name, new_skill, last_played)
+        self.dirty.add(player_name)
+
+    def bulk_update_player_ratings(self, ratings, last_played=None):
+        super().bulk_update_player_ratings(ratings, last_played)
+        self.dirty.update(ratings)
+
+    def save_player_ratings(self, data_dir=None):
+        """Appends the changed ratings to the log, compacting it into the
+        snapshot when it has grown past compact_every entries."""
+        data_dir = self.data_dir if data_dir is None else data_dir
+        if self.dirty:
+            lines = []
+            for name in self.dirty:
+                lines.append(format_rating(name, self.data[name],
+                                           self.last_played.get(name)))
+            with open(os.path.join(data_dir, self.DATA_LOG), 'a') as f:
+                f.write(''.join(lines))
+            self.log_entries += len(lines)
+            self.dirty.clear()
+        if self.log_entries >= self.compact_every:
+            self.compact(data_dir=data_dir)
+
+    def compact(self, data_dir=None):
+        """Writes every rating to a new snapshot and empties the log."""
+        data_dir = self.data_dir if data_dir is None else data_dir
+        snapshot = os.path.join(data_dir, self.DATA_SOURCE)
+        # write then rename so a crash never leaves a partial snapshot, the
+        # log is only emptied once the new snapshot is in place
+        with open(snapshot + '.tmp', 'w') as f:
+            for name in self.data:
+                f.write(format_rating(name, self.data[name],
+                                      self.last_played.get(name)))
+        os.replace(snapshot + '.tmp', snapshot)
+        open(os.path.join(data_dir, self.DATA_LOG), 'w').close()
+        self.log_entries = 0
+        self.dirty.clear()
@@ -1,4 +1,5 @@
 import os
+from typing import Callable, Dict, Iterable, Optional, Tuple
 from trueskill.utils.maths import Gaussian
 from abc import ABC, abstractmethod
 from trueskill.utils.constants import MU, SIGMA
@@ -7,6 +8,7 @@ from trueskill.utils.constants import MU, SIGMA
 class DataSource(ABC):
     def __init__(self):
         super().__init__()
+        self._listeners = []
 
     @abstractmethod
     def connect_to_source(self):
@@ -16,18 +18,92 @@ class DataSource(ABC):
     def load_player_ratings(self, player_name):
         pass
 
+    def load_many(self, player_names):
+        """Loads the ratings of several players at once. Sources with a
+        cost per request should override this with a batched load.
+
+        Args:
+            player_names: The players to load.
+        Returns:
+            The rating of every player keyed by name.
+        """
+        return {player_name: self.load_player_ratings(player_name)
+                for player_name in player_names}
+
+    def load_last_played(self, player_names: Iterable[str]) \
+            -> Dict[str, float]:
+        """Loads when several players last played, to decay their ratings
+        by the time since.
+
+        Args:
+            player_names: The players to look up.
+        Returns:
+            The time of the last game of the players whose last game is
+            known, keyed by name. Sources that don't store it know none.
+        """
+        return {}
+
     @abstractmethod
-    def update_player_rating(self, player_name, new_skill):
+    def update_player_rating(self, player_name, new_skill,
+                             last_played: float = None):
+        """Stores a player's new rating, and the time of the game it came
+        from if last_played is given. Otherwise the time already stored, if
+        any, is kept."""
         pass
 
     @abstractmethod
-    def bulk_update_player_ratings(self, ratings):
+    def bulk_update_player_ratings(self, ratings,
+                                   last_played: Dict[str, float] = None):
+        """Stores several new ratings, and the time of the last game of
+        the players in last_played, as update_player_rating."""
         pass
 
     @abstractmethod
     def save_player_ratings(self):
         pass
 
+    def all_player_ratings(self) -> Dict[str, Gaussian]:
+        """Every rating in the source keyed by player, used to build indexes
+        over the ratings. Sources that can't list their ratings need not
+        implement it."""
+        raise NotImplementedError(f"{type(self).__name__} can't list its "
+                                  f"ratings.")
+
+    def subscribe(self, listener: Callable[[Dict[str, Gaussian]], None]):
+        """Calls listener with the changed ratings, keyed by player, after
+        every update so that indexes over the source can follow it.
+        Implementations call _notify from both update methods."""
+        self._listeners.append(listener)
+
+    def _notify(self, ratings: Dict[str, Gaussian]):
+        for listener in self._listeners:
+            listener(ratings)
+
+
+def format_rating(name: str, rating: Gaussian,
+                  last_played: Optional[float]) -> str:
+    """The line of the CSV database for a player, name,mu,sigma with the
+    time of their last game as a fourth column if it is known."""
+    if last_played is None:
+        return f"{name},{rating.mu},{rating.sigma}\n"
+    return f"{name},{rating.mu},{rating.sigma},{last_played}\n"
+
+
+def parse_rating(line: str) -> Tuple[str, Gaussian, Optional[float]]:
+    """Parses a line written by format_rating.
+
+    Returns:
+        The player's name, rating and the time of their last game or None.
+    Raises:
+        ValueError: If the line doesn't have three or four columns.
+    """
+    fields = line.split(',')
+    if len(fields) not in (3, 4):
+        raise ValueError(f"expected 3 or 4 columns, got {len(fields)}")
+    rating = Gaussian(mu=float(fields[1]), sigma=float(fields[2]))
+    return (fields[0], rating,
+            float(fields[3]) if len(fields) == 4 else None)
+
 
 class CsvSource(DataSource):
     def __init__(self, data_dir='.'):
@@ -35,7 +111,9 @@ class CsvSource(DataSource):
         if not os.path.exists(data_dir):
             raise NotADirectoryError("Data directory doesn't exist.")
         self.DATA_SOURCE = 'true_skills.csv'
+        self.data_dir = data_dir
         self.data = {}
+        self.last_played = {}
         self.connect_to_source(data_dir=data_dir)
 
     def connect_to_source(self, data_dir='.'):
@@ -43,10 +121,10 @@ class CsvSource(DataSource):
             with open(os.path.join(data_dir, self.DATA_SOURCE), 'r') as f:
                 line = f.readline().strip('\n')
                 while line:
-                    name, mu, sigma = line.split(',')
-                    mu, sigma = float(mu), float(sigma)
-                    rating = Gaussian(mu=mu, sigma=sigma)
+                    name, rating, last_played = parse_rating(line)
                     self.data[name] = rating
+                    if last_played is not None:
+                        self.last_played[name] = last_played
                     line = f.readline().strip('\n')
 
     def load_player_ratings(self, player_name):
@@ -54,15 +132,30 @@ class CsvSource(DataSource):
             self.data[player_name] = Gaussian(mu=MU, sigma=SIGMA)
         return self.data[player_name]
 
-    def update_player_rating(self, player_name, new_skill):
+    def load_last_played(self, player_names):
+        return {name: self.last_played[name] for name in player_names
+                if name in self.last_played}
+
+    def update_player_rating(self, player_name, new_skill,
+                             last_played=None):
         self.data[player_name] = new_skill
+        if last_played is not None:
+            self.last_played[player_name] = last_played
+        self._notify({player_name: new_skill})
 
-    def bulk_update_player_ratings(self, ratings):
+    def bulk_update_player_ratings(self, ratings, last_played=None):
         self.data.update(ratings)
+        if last_played:
+            self.last_played.update(last_played)
+        self._notify(ratings)
+
+    def all_player_ratings(self):
+        return dict(self.data)
 
-    def save_player_ratings(self, data_dir='.'):
+    def save_player_ratings(self, data_dir=None):
+        data_dir = self.data_dir if data_dir is None else data_dir
         with open(os.path.join(data_dir, self.DATA_SOURCE), 'w+') as f:
             for name in self.data:
-                rating = self.data[name]
-                f.write(f"{name},{rating.mu},{rating.sigma}\n")
+                f.write(format_rating(name, self.data[name],
+                                      self.last_played.get(name)))
 
@@ -0,0 +1,175 @@
+import bisect
+import heapq
+import math
+from typing import Dict, Iterable, List, Sequence, Tuple, Union
+from trueskill.data.player_ratings import DataSource
+from trueskill.utils.maths import Gaussian
+from trueskill.utils.constants import PERFORMANCE_NOISE
+
+
+def team_rating(skills: Iterable[Gaussian]) -> Gaussian:
+    """The summed skill of a team, whose mu is the sum of its players' and
+    whose variance is the sum of theirs, as used by the two team match
+    quality."""
+    skills = list(skills)
+    return Gaussian(mu=sum(skill.mu for skill in skills),
+                    sigma=math.sqrt(sum(skill.sigma ** 2
+                                        for skill in skills)))
+
+
+class _Band:
+    """The players whose sigma falls in one band, sorted by mu."""
+    __slots__ = ('mus', 'names', 'min_sigma', 'max_sigma')
+
+    def __init__(self):
+        self.mus = []
+        self.names = []
+        self.min_sigma = math.inf
+        self.max_sigma = 0.0
+
+
+class RatingIndex:
+    """Index of ratings for finding the best opponents of a player or team
+    without scanning every rating.
+
+    The match quality of teams a and b of n_a and n_b players is
+
+        sqrt(N / s) * exp(-d^2 / (2s)), N = (n_a + n_b)b^2,
+        s = N + sigma_a^2 + sigma_b^2
+
+    with d the difference of their summed means and sigma^2 their summed
+    variances, for players n_a = n_b = 1. For a given d it is largest at
+    s = d^2, so clamping d^2 to the range of s allowed by a set of sigmas
+    gives an upper bound on the quality of every entry of that set d away.
+
+    The entries of an index are either players, or teams that all have
+    team_size players, keyed by team name with their team_rating.
+
+    Players are split into bands of sigma_width wide ranges of sigma, each
+    sorted by mu. A query walks outwards from the queued player's mu in
+    every band at once, always taking the next player with the highest
+    bound, and stops once no bound can beat the K-th best match found. The
+    sigma range of a band only ever widens, which keeps its bound valid
+    after updates, call rebuild to tighten it.
+    """
+    def __init__(self, ratings: Dict[str, Gaussian] = None,
+                 perf_noise_sigma=PERFORMANCE_NOISE, sigma_width=0.1,
+                 team_size=1):
+        self.perf_noise_sigma = perf_noise_sigma
+        self.sigma_width = sigma_width
+        self.team_size = team_size
+        self.ratings = {}
+        self._bands = {}
+        self.rebuild(ratings or {})
+
+    @classmethod
+    def from_source(cls, data_src: DataSource,
+                    perf_noise_sigma=PERFORMANCE_NOISE,
+                    sigma_width=0.1) -> 'RatingIndex':
+        """Indexes every rating in data_src and follows its updates."""
+        index = cls(data_src.all_player_ratings(), perf_noise_sigma,
+                    sigma_width)
+        data_src.subscribe(index.update)
+        return index
+
+    def __len__(self):
+        return len(self.ratings)
+
+    def _band(self, sigma: float) -> int:
+        return int(sigma / self.sigma_width)
+
+    def rebuild(self, ratings: Dict[str, Gaussian]):
+        """Replaces the contents of the index with ratings."""
+        self.ratings = dict(ratings)
+        entries = sorted((rating.mu, name)
+                         for name, rating in self.ratings.items())
+        self._bands = {}
+        for mu, name in entries:
+            sigma = self.ratings[name].sigma
+            band = self._bands.setdefault(self._band(sigma), _Band())
+            band.mus.append(mu)
+            band.names.append(name)
+            band.min_sigma = min(band.min_sigma, sigma)
+            band.max_sigma = max(band.max_sigma, sigma)
+
+    def update(self, ratings: Dict[str, Gaussian]):
+        """Moves the changed ratings to their new place in the index."""
+        for name, rating in ratings.items():
+            old = self.ratings.get(name)
+            if old is not None:
+                band = self._bands[self._band(old.sigma)]
+                idx = bisect.bisect_left(band.mus, old.mu)
+                while band.names[idx] != name:
+                    idx += 1
+                del band.mus[idx]
+                del band.names[idx]
+            band = self._bands.setdefault(self._band(rating.sigma), _Band())
+            idx = bisect.bisect_left(band.mus, rating.mu)
+            band.mus.insert(idx, rating.mu)
+            band.names.insert(idx, name)
+            band.min_sigma = min(band.min_sigma, rating.sigma)
+            band.max_sigma = max(band.max_sigma, rating.sigma)
+            self.ratings[name] = rating
+
+    def best_opponents(self, player: Union[str, Gaussian,
+                                           Sequence[Gaussian]],
+                       k=10, tolerance=0.0) -> List[Tuple[str, float]]:
+        """Finds the k entries, players or teams, giving the best two team
+        match quality against a queued player or team.
+
+        Args:
+            player: An entry in the index, which is left out of the
+            results, the rating of an entry that isn't, or the skills of
+            the players of a queued team of any size.
+            k: The number of opponents to find.
+            tolerance: With 0 the result is exact. Otherwise the search may
+            stop early, the k-th result is then at least (1 - tolerance)
+            times the quality of any entry not returned.
+        Returns:
+            (name, quality) of the opponents, best first.
+        """
+        size = self.team_size
+        if isinstance(player, str):
+            name, rating = player, self.ratings[player]
+        elif isinstance(player, Gaussian):
+            name, rating = None, player
+        else:
+            name, rating, size = None, team_rating(player), len(player)
+        noise = (size + self.team_size) * self.perf_noise_sigma ** 2
+        base = noise + rating.sigma ** 2
+        slack = 1 / (1 - tolerance) if tolerance else 1.0
+
+        # a cursor is (-bound, band, index, step), walking away from mu
+        cursors = []
+
+        def push(band, idx, step):
+            if 0 <= idx < len(band.mus):
+                d = band.mus[idx] - rating.mu
+                s = min(max(d * d, base + band.min_sigma ** 2),
+                        base + band.max_sigma ** 2)
+                bound = math.sqrt(noise / s) * math.exp(-d * d / (2 * s))
+                heapq.heappush(cursors, (-bound, id(band), band, idx, step))
+
+        for band in self._bands.values():
+            idx = bisect.bisect_left(band.mus, rating.mu)
+            push(band, idx, 1)
+            push(band, idx - 1, -1)
+
+        best = []
+        while cursors:
+            bound, _, band, idx, step = heapq.heappop(cursors)
+            if len(best) == k and -bound <= best[0][0] * slack:
+                break
+            push(band, idx + step, step)
+            opponent = band.names[idx]
+            if opponent == name:
+                continue
+            d = band.mus[idx] - rating.mu
+            s = base + self.ratings[opponent].sigma ** 2
+            quality = math.sqrt(noise / s) * math.exp(-d * d / (2 * s))
+            if len(best) < k:
+                heapq.heappush(best, (quality, opponent))
+            elif quality > best[0][0]:
+                heapq.heapreplace(best, (quality, opponent))
+        return [(opponent, quality)
+                for quality, opponent in sorted(best, reverse=True)]
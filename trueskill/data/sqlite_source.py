@@ -0,0 +1,145 @@
+import os
+import queue
+import sqlite3
+from contextlib import contextmanager
+from typing import Dict, Iterable
+from trueskill.data.player_ratings import DataSource
+from trueskill.utils.maths import Gaussian
+from trueskill.utils.constants import MU, SIGMA
+
+_CREATE = ("CREATE TABLE IF NOT EXISTS ratings (name TEXT PRIMARY KEY, "
+           "mu REAL NOT NULL, sigma REAL NOT NULL, last_played REAL) "
+           "WITHOUT ROWID")
+# databases created before the time of the last game was stored
+_ADD_LAST_PLAYED = "ALTER TABLE ratings ADD COLUMN last_played REAL"
+_SELECT = "SELECT mu, sigma FROM ratings WHERE name = ?"
+_SELECT_MANY = "SELECT name, mu, sigma FROM ratings WHERE name IN ({})"
+_SELECT_LAST_PLAYED = ("SELECT name, last_played FROM ratings WHERE name IN "
+                       "({}) AND last_played IS NOT NULL")
+_SELECT_ALL = "SELECT name, mu, sigma FROM ratings"
+# an update without a time keeps the stored one
+_UPSERT = ("INSERT INTO ratings (name, mu, sigma, last_played) "
+           "VALUES (?, ?, ?, ?) ON CONFLICT (name) DO UPDATE SET "
+           "mu = excluded.mu, sigma = excluded.sigma, "
+           "last_played = COALESCE(excluded.last_played, last_played)")
+# stay below SQLITE_MAX_VARIABLE_NUMBER on older SQLite builds
+_MAX_VARIABLES = 900
+
+
+class ConnectionPool:
+    """A fixed size pool of SQLite connections shared between threads."""
+    def __init__(self, path: str, size=4):
+        self._connections = queue.Queue()
+        for _ in range(size):
+            connection = sqlite3.connect(path, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._connections.put(connection)
+        self.size = size
+
+    @contextmanager
+    def connection(self):
+        """Borrows a connection, blocking until one is free."""
+        connection = self._connections.get()
+        try:
+            yield connection
+        finally:
+            self._connections.put(connection)
+
+    def close(self):
+        for _ in range(self.size):
+            self._connections.get().close()
+
+
+class SqliteSource(DataSource):
+    """Rating store in an SQLite database in WAL mode.
+
+    Updates are written straight to the database, a bulk update is a single
+    transaction. The methods can be called from several threads at once,
+    each call borrows a connection from the pool.
+    """
+    DATA_SOURCE = 'true_skills.db'
+
+    def __init__(self, data_dir='.', pool_size=4):
+        super().__init__()
+        if not os.path.exists(data_dir):
+            raise NotADirectoryError("Data directory doesn't exist.")
+        self.data_dir = data_dir
+        self.pool_size = pool_size
+        self.pool = None
+        self.connect_to_source(data_dir=data_dir)
+
+    def connect_to_source(self, data_dir='.'):
+        self.pool = ConnectionPool(os.path.join(data_dir, self.DATA_SOURCE),
+                                   size=self.pool_size)
+        with self.pool.connection() as connection, connection:
+            connection.execute(_CREATE)
+            columns = [row[1] for row in
+                       connection.execute("PRAGMA table_info(ratings)")]
+            if "last_played" not in columns:
+                connection.execute(_ADD_LAST_PLAYED)
+
+    def close(self):
+        self.pool.close()
+
+    def load_player_ratings(self, player_name):
+        with self.pool.connection() as connection:
+            row = connection.execute(_SELECT, (player_name,)).fetchone()
+        if row is None:
+            return Gaussian(mu=MU, sigma=SIGMA)
+        return Gaussian(mu=row[0], sigma=row[1])
+
+    def load_many(self, player_names: Iterable[str]) -> Dict[str, Gaussian]:
+        """Loads the ratings of several players with one query per
+        _MAX_VARIABLES players.
+
+        Returns:
+            The rating of every player keyed by name, players who aren't in
+            the database get the default rating.
+        """
+        player_names = list(dict.fromkeys(player_names))
+        found = {}
+        with self.pool.connection() as connection:
+            for start in range(0, len(player_names), _MAX_VARIABLES):
+                chunk = player_names[start:start + _MAX_VARIABLES]
+                query = _SELECT_MANY.format(",".join("?" * len(chunk)))
+                for name, mu, sigma in connection.execute(query, chunk):
+                    found[name] = Gaussian(mu=mu, sigma=sigma)
+        return {name: found[name] if name in found
+                else Gaussian(mu=MU, sigma=SIGMA) for name in player_names}
+
+    def load_last_played(self, player_names):
+        player_names = list(dict.fromkeys(player_names))
+        last_played = {}
+        with self.pool.connection() as connection:
+            for start in range(0, len(player_names), _MAX_VARIABLES):
+                chunk = player_names[start:start + _MAX_VARIABLES]
+                query = _SELECT_LAST_PLAYED.format(",".join("?" * len(chunk)))
+                last_played.update(connection.execute(query, chunk))
+        return last_played
+
+    def update_player_rating(self, player_name, new_skill,
+                             last_played=None):
+        with self.pool.connection() as connection, connection:
+            connection.execute(_UPSERT, (player_name, new_skill.mu,
+                                         new_skill.sigma, last_played))
+        self._notify({player_name: new_skill})
+
+    def bulk_update_player_ratings(self, ratings, last_played=None):
+        last_played = last_played or {}
+        rows = [(name, rating.mu, rating.sigma, last_played.get(name))
+                for name, rating in ratings.items()]
+        with self.pool.connection() as connection, connection:
+            connection.executemany(_UPSERT, rows)
+        self._notify(ratings)
+
+    def all_player_ratings(self):
+        with self.pool.connection() as connection:
+            return {name: Gaussian(mu=mu, sigma=sigma) for name, mu, sigma
+                    in connection.execute(_SELECT_ALL)}
+
+    def save_player_ratings(self):
+        """Updates are committed as they are made, this only checkpoints the
+        write ahead log into the database file."""
+        with self.pool.connection() as connection:
+            connection.execute("PRAGMA wal_checkpoint(PASSIVE)")
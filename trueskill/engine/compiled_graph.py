@@ -0,0 +1,378 @@
+import math
+import sys
+from functools import lru_cache
+from typing import List, Dict, Tuple
+from trueskill.utils.maths import Gaussian, v_truncate, w_truncate, \
+    v_truncate_draw, w_truncate_draw, game_draw_margins, partial_play_coeffs
+from trueskill.utils.constants import DYNAMIC_FACTOR, PERFORMANCE_NOISE, \
+    DELTA, MAX_ITERATIONS, DAMPING, DRAW_PROBABILITY
+from trueskill.engine.convergence import GameStats
+
+# (difference, higher ranked team, lower ranked team) (variable, edge) pairs
+GameFactor = Tuple[Tuple[int, int], Tuple[int, int], Tuple[int, int]]
+
+
+def _kl_divergence(pi: float, tau: float, other_pi: float,
+                   other_tau: float) -> float:
+    """Gaussian.kl_divergence on natural parameters."""
+    sigma = 1 / math.sqrt(pi)
+    other_sigma = 1 / math.sqrt(other_pi)
+    mu = tau / pi if pi != 0 else 0
+    other_mu = other_tau / other_pi if other_pi != 0 else 0
+    return (math.log(other_sigma / sigma) +
+            ((sigma ** 2 + (mu - other_mu) ** 2) / (2 * other_sigma ** 2))
+            - 0.5)
+
+
+class MessageState:
+    """Marginals and messages of a compiled factor graph held in flat lists.
+
+    Variables are integer indices into the marginal lists and every
+    (factor, variable) pair is an integer edge ID into the message lists.
+    The methods mirror the operations of the factor_graph module with the
+    same arithmetic, so results are identical to the object graph.
+    """
+    def __init__(self, num_vars: int, num_edges: int):
+        self.var_pi = [0.0] * num_vars
+        self.var_tau = [0.0] * num_vars
+        self.msg_pi = [0.0] * num_edges
+        self.msg_tau = [0.0] * num_edges
+
+    def update_message(self, var: int, edge: int, pi: float, tau: float):
+        """See Variable.update_message."""
+        self.var_pi[var] = self.var_pi[var] - self.msg_pi[edge] + pi
+        self.var_tau[var] = self.var_tau[var] - self.msg_tau[edge] + tau
+        self.msg_pi[edge] = pi
+        self.msg_tau[edge] = tau
+
+    def update_marginal(self, var: int, edge: int, pi: float, tau: float):
+        """See Variable.update_marginal."""
+        self.msg_pi[edge] = pi + self.msg_pi[edge] - self.var_pi[var]
+        self.msg_tau[edge] = tau + self.msg_tau[edge] - self.var_tau[var]
+        self.var_pi[var] = pi
+        self.var_tau[var] = tau
+
+    def perf_update(self, var_one: int, edge_one: int, var_two: int,
+                    edge_two: int, perf_noise_sigma: float):
+        """See PerformanceFactor._update_helper."""
+        pi = self.var_pi[var_one] - self.msg_pi[edge_one]
+        tau = self.var_tau[var_one] - self.msg_tau[edge_one]
+        a = 1 / (1 + perf_noise_sigma ** 2 * pi)
+        self.update_message(var_two, edge_two, a * pi, a * tau)
+
+    def sum_update(self, var: int, edge: int,
+                   var_edges: List[Tuple[int, int]], coeffs: List[float]):
+        """See SumFactor._update_helper, var_edges holds the (variable,
+        edge) pairs of the other variables of the sum factor."""
+        var_pi, var_tau = self.var_pi, self.var_tau
+        msg_pi, msg_tau = self.msg_pi, self.msg_tau
+        cavity_pi = [var_pi[v] - msg_pi[e] for v, e in var_edges]
+        if 0.0 in cavity_pi:
+            # see SumFactor._update_helper
+            self.update_message(var, edge, 0.0, 0.0)
+            return
+        pi = 1.0 / sum([coeffs[i] ** 2 / cavity_pi[i]
+                        for i in range(len(coeffs))])
+        tau = pi * sum([coeffs[i] * (var_tau[v] - msg_tau[e]) / cavity_pi[i]
+                        for i, (v, e) in enumerate(var_edges)])
+        self.update_message(var, edge, pi, tau)
+
+    def truncate_up(self, var: int, edge: int, damping=0.0,
+                    draw_margin=0.0, drawn=False) -> float:
+        """See TruncateFactor.up, damping is only applied once the factor
+        has sent a message."""
+        c = self.var_pi[var] - self.msg_pi[edge]
+        d = self.var_tau[var] - self.msg_tau[edge]
+        sqrt_c = math.sqrt(c)
+        x = d / sqrt_c
+        margin = draw_margin * sqrt_c
+        if drawn:
+            v, w = v_truncate_draw(x, margin), w_truncate_draw(x, margin)
+        else:
+            v, w = v_truncate(x - margin), w_truncate(x - margin)
+        # 1 - w rounds to 0 for draw margins far narrower than the skill
+        # uncertainty, the difference is then pinned as tightly as floats
+        # allow
+        remaining = max(1 - w, sys.float_info.epsilon)
+        pi = c / remaining
+        tau = (d + sqrt_c * v) / remaining
+        if damping and self.msg_pi[edge]:
+            pi = c + ((1 - damping) * (pi - c) + damping * self.msg_pi[edge])
+            tau = d + ((1 - damping) * (tau - d) +
+                       damping * self.msg_tau[edge])
+        old_pi, old_tau = self.var_pi[var], self.var_tau[var]
+        self.update_marginal(var, edge, pi, tau)
+        return _kl_divergence(old_pi, old_tau, self.var_pi[var],
+                              self.var_tau[var])
+
+    def run_game_chain(self, game_factors: List[GameFactor],
+                       truncate_edges: List[int], delta: float,
+                       max_iterations=MAX_ITERATIONS, damping=DAMPING,
+                       stats: GameStats = None,
+                       truncations: List[Tuple[float, bool]] = None):
+        """Runs the game layer of the schedule in TrueSkillEnv._run.
+
+        Args:
+            game_factors: The difference, higher ranked team and lower
+            ranked team (variable, edge) pairs of each game sum factor.
+            truncate_edges: The edge of each truncate factor on the
+            difference variable of the matching game factor.
+            delta: Convergence threshold for games of more than two teams.
+            max_iterations: The most sweeps over the game factors.
+            damping: Fraction of the previous truncate message kept in
+            the sweeps of games of more than two teams.
+            stats: Records the number of sweeps and the final delta.
+            truncations: The (draw margin, drawn) of each truncate factor,
+            see game_draw_margins. Defaults to no margin and no draws.
+        """
+        if stats is None:
+            stats = GameStats()
+        if truncations is None:
+            truncations = [(0.0, False)] * len(game_factors)
+
+        def game_down(i):
+            diff, higher, lower = game_factors[i]
+            self.sum_update(diff[0], diff[1], [higher, lower], [1, -1])
+
+        def game_up(i, idx):
+            diff, higher, lower = game_factors[i]
+            if idx == 0:
+                self.sum_update(higher[0], higher[1], [lower, diff],
+                                [1.0, 1.0])
+            else:
+                self.sum_update(lower[0], lower[1], [higher, diff],
+                                [1.0, -1.0])
+
+        def truncate_up(i, damping=0.0):
+            return self.truncate_up(game_factors[i][0][0], truncate_edges[i],
+                                    damping, *truncations[i])
+
+        num_games = len(game_factors)
+        if num_games > 1:
+            # iterate till approximate game outcome marginals don't change
+            while True:
+                max_delta = 0
+                for i in range(num_games - 1):
+                    game_down(i)
+                    max_delta = max(max_delta, truncate_up(i, damping))
+                    game_up(i, 1)
+                    game_down(i + 1)
+                    max_delta = max(max_delta, truncate_up(i + 1, damping))
+                    game_up(i + 1, 0)
+                stats.sweeps += 1
+                stats.delta = max_delta
+                if max_delta <= delta:
+                    break
+                if stats.sweeps >= max_iterations:
+                    stats.converged = False
+                    break
+        else:
+            game_down(0)
+            stats.delta = truncate_up(0)
+            stats.sweeps = 1
+        game_up(0, 0)
+        game_up(num_games - 1, 1)
+
+
+class CompiledGraph:
+    """The TrueSkill factor graph for one shape of game, compiled to flat
+    lists so it can be rerun for every game of that shape.
+
+    Running the graph starts from a fresh MessageState and replays the same
+    schedule as TrueSkillEnv._run, so the posteriors are identical.
+    """
+    def __init__(self, team_sizes: Tuple[int, ...]):
+        """Compiles the factor graph for a game.
+
+        Args:
+            team_sizes: The number of players in each team, in the order the
+            teams ranked.
+        """
+        if len(team_sizes) < 2:
+            raise ValueError("Need at least two teams in the game!")
+        self.team_sizes = team_sizes
+        num_players = sum(team_sizes)
+        num_teams = len(team_sizes)
+        self.num_players = num_players
+
+        # variables: skills, performances, team performances then differences
+        skill_vars = list(range(num_players))
+        perf_vars = [num_players + i for i in range(num_players)]
+        team_vars = [2 * num_players + j for j in range(num_teams)]
+        diff_vars = [2 * num_players + num_teams + i
+                     for i in range(num_teams - 1)]
+        self.num_vars = 2 * num_players + 2 * num_teams - 1
+
+        self.num_edges = 0
+
+        def new_edge():
+            self.num_edges += 1
+            return self.num_edges - 1
+
+        # prior and performance factors, one of each per player
+        self.prior_edges = [new_edge() for _ in skill_vars]
+        self.perf_edges = [(new_edge(), new_edge()) for _ in skill_vars]
+
+        # team sum factors: (team var, team edge, [(perf var, perf edge)])
+        self.team_factors = []
+        start = 0
+        for j, size in enumerate(team_sizes):
+            team_edge = new_edge()
+            players = [(perf_vars[i], new_edge())
+                       for i in range(start, start + size)]
+            self.team_factors.append((team_vars[j], team_edge, players))
+            start += size
+
+        self.game_factors = [
+            ((diff_vars[i], new_edge()), (team_vars[i], new_edge()),
+             (team_vars[i + 1], new_edge()))
+            for i in range(num_teams - 1)]
+        self.truncate_edges = [new_edge() for _ in diff_vars]
+
+    def run(self, priors: List[Gaussian], dynamics=DYNAMIC_FACTOR,
+            perf_noise_sigma=PERFORMANCE_NOISE, delta=DELTA,
+            coeffs: List[float] = None, max_iterations=MAX_ITERATIONS,
+            damping=DAMPING, stats: GameStats = None,
+            truncations: List[Tuple[float, bool]] = None) \
+            -> List[Tuple[float, float]]:
+        """Runs the message passing schedule for one game.
+
+        Args:
+            priors: The skill of each player, teams in ranked order.
+            dynamics: The standard deviation on the prior skill.
+            perf_noise_sigma: The standard deviation of the performance noise.
+            delta: Convergence threshold for games of more than two teams.
+            coeffs: The coefficient of each player in their team sum,
+            defaults to one for everyone.
+            max_iterations: The most sweeps over the game factors.
+            damping: Fraction of the previous truncate message kept.
+            stats: Records the sweeps, final delta and layer times.
+            truncations: The (draw margin, drawn) of each pair of
+            neighbouring teams, see game_draw_margins.
+        Returns:
+            The posterior (pi, tau) of each player, in the order of priors.
+        """
+        if len(priors) != self.num_players:
+            raise ValueError("Expected a prior for each player.")
+        if coeffs is None:
+            coeffs = [1.0] * self.num_players
+        if stats is None:
+            stats = GameStats()
+        state = MessageState(self.num_vars, self.num_edges)
+
+        def team_up(team_factor, team_coeffs, idx):
+            team_var, team_edge, players = team_factor
+            var_edges = ([p for i, p in enumerate(players) if i != idx]
+                         + [(team_var, team_edge)])
+            sum_coeffs = [- (team_coeffs[i] / team_coeffs[idx])
+                          for i in range(len(team_coeffs)) if i != idx]
+            sum_coeffs += [1.0 / team_coeffs[idx]]
+            var, edge = players[idx]
+            state.sum_update(var, edge, var_edges, sum_coeffs)
+
+        # priors and performances down
+        stats.start("prior")
+        for i, prior in enumerate(priors):
+            pi = 1 / (prior.pi ** -1 + dynamics ** 2)
+            state.update_marginal(i, self.prior_edges[i], pi, prior.tau)
+        stats.start("performance")
+        for i, (skill_edge, perf_edge) in enumerate(self.perf_edges):
+            state.perf_update(i, skill_edge, self.num_players + i, perf_edge,
+                              perf_noise_sigma)
+
+        # team performances down
+        stats.start("team")
+        team_coeffs = []
+        start = 0
+        for team_var, team_edge, players in self.team_factors:
+            team_coeffs.append(coeffs[start:start + len(players)])
+            state.sum_update(team_var, team_edge, players, team_coeffs[-1])
+            start += len(players)
+
+        stats.start("game")
+        state.run_game_chain(self.game_factors, self.truncate_edges, delta,
+                             max_iterations, damping, stats, truncations)
+
+        # team performances, performances and skills up
+        stats.start("team")
+        for j, team_factor in enumerate(self.team_factors):
+            for idx in range(len(team_factor[2])):
+                team_up(team_factor, team_coeffs[j], idx)
+        stats.start("performance")
+        for i, (skill_edge, perf_edge) in enumerate(self.perf_edges):
+            state.perf_update(self.num_players + i, perf_edge, i, skill_edge,
+                              perf_noise_sigma)
+        stats.stop()
+        return [(state.var_pi[i], state.var_tau[i])
+                for i in range(self.num_players)]
+
+
+@lru_cache(maxsize=256)
+def get_compiled_graph(team_sizes: Tuple[int, ...]) -> CompiledGraph:
+    """Returns the compiled graph for a game shape, compiling it the first
+    time the shape is seen."""
+    return CompiledGraph(team_sizes)
+
+
+class CompiledTrueSkillEnv:
+    def __init__(self, teams: List[Dict[str, Gaussian]],
+                 dynamics=DYNAMIC_FACTOR,
+                 perf_noise_sigma=PERFORMANCE_NOISE,
+                 delta=DELTA,
+                 max_iterations=MAX_ITERATIONS,
+                 damping=DAMPING,
+                 ranks: List[int] = None,
+                 draw_probability=DRAW_PROBABILITY,
+                 weights: Dict[str, float] = None):
+        """Drop in replacement for TrueSkillEnv which reuses a compiled graph
+        for every game with the same team sizes.
+
+        Args:
+            teams: List of the team skills sorted in the order they ranked.
+            dynamics: The standard deviation on the prior skill which allows
+            the skill to vary over time.
+            perf_noise_sigma: The standard deviation of the performance noise.
+            delta: The minimum difference two marginals have to satisfy to be
+            considered approximately equal (for the approximation of game
+            marginals.)
+            max_iterations: The most sweeps over the game factors for games
+            of more than two teams, even if they haven't converged.
+            damping: Fraction of the previous truncate factor message kept
+            at each update, to stop the sweeps from oscillating.
+            ranks: The rank of each team, in the order of teams. Teams with
+            the same rank drew, by default every team beat the next one.
+            draw_probability: The probability of a draw between two evenly
+            matched teams, it must be above zero if any teams drew.
+            weights: The fraction of the game played by players who joined
+            late or left early, keyed by player. Players not in it played
+            the whole game.
+        Raises:
+            ValueError: If teams drew with a zero draw probability.
+        """
+        self.dynamics = dynamics
+        self.perf_sigma = perf_noise_sigma
+        self.delta = delta
+        self.max_iterations = max_iterations
+        self.damping = damping
+        self.stats = GameStats()
+        self.teams = teams
+        self.draw_margins = game_draw_margins([len(team) for team in teams],
+                                              ranks, draw_probability,
+                                              perf_noise_sigma)
+        self.coeffs = partial_play_coeffs(
+            [player for team in teams for player in team], weights)
+        self.graph = get_compiled_graph(tuple(len(team) for team in teams))
+
+    def update_ratings(self):
+        names = [player for team in self.teams for player in team]
+        priors = [team[player] for team in self.teams for player in team]
+        self.stats = GameStats()
+        posteriors = self.graph.run(priors, dynamics=self.dynamics,
+                                    perf_noise_sigma=self.perf_sigma,
+                                    delta=self.delta,
+                                    max_iterations=self.max_iterations,
+                                    damping=self.damping, stats=self.stats,
+                                    truncations=self.draw_margins,
+                                    coeffs=self.coeffs)
+        return {name: Gaussian(pi=pi, tau=tau)
+                for name, (pi, tau) in zip(names, posteriors)}
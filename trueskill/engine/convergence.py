@@ -0,0 +1,170 @@
+import json
+import math
+import time
+from typing import Dict
+
+PERCENTILES = (50, 90, 99)
+
+
+class GameStats:
+    """Convergence and timing information for rating a single game.
+
+    Attributes:
+        sweeps: Number of sweeps over the game factor chain, always one for
+        two team games.
+        delta: The largest KL divergence of a game marginal in the last
+        sweep.
+        converged: False if the sweeps stopped at the iteration cap before
+        delta fell to the threshold.
+        layer_times: Seconds spent in each layer of the schedule.
+    """
+    LAYERS = ("prior", "performance", "team", "game")
+
+    def __init__(self):
+        self.sweeps = 0
+        self.delta = 0.0
+        self.converged = True
+        self.layer_times = {layer: 0.0 for layer in self.LAYERS}
+        self._layer = None
+        self._layer_start = 0.0
+
+    def start(self, layer: str):
+        """Starts timing a layer, stopping the timer of any previous one."""
+        now = time.perf_counter()
+        if self._layer is not None:
+            self.layer_times[self._layer] += now - self._layer_start
+        self._layer = layer
+        self._layer_start = now
+
+    def stop(self):
+        """Stops timing the current layer."""
+        if self._layer is not None:
+            self.layer_times[self._layer] += (time.perf_counter() -
+                                              self._layer_start)
+            self._layer = None
+
+    @property
+    def seconds(self) -> float:
+        """Wall time of the game, from the first start to stop."""
+        return sum(self.layer_times.values())
+
+    def to_dict(self) -> Dict:
+        return {"sweeps": self.sweeps, "delta": self.delta,
+                "converged": self.converged,
+                "layer_times": dict(self.layer_times)}
+
+    def __repr__(self):
+        return (f"GameStats(sweeps={self.sweeps}, delta={self.delta}, "
+                f"converged={self.converged})")
+
+
+class LogHistogram:
+    """Counts of non-negative values in log spaced buckets, so their
+    percentiles can be taken in bounded memory however many are recorded.
+
+    Every power of ten is split into BUCKETS_PER_DECADE buckets, a
+    percentile is the upper edge of its bucket so it is at most 2.3% above
+    the exact value, and never above the largest value recorded.
+
+    Attributes:
+        count: Number of values recorded.
+        zeros: Number of values recorded that were zero.
+        counts: Number of the other values in each bucket, keyed by the
+        index of the bucket.
+        max: The largest value recorded.
+    """
+    BUCKETS_PER_DECADE = 100
+
+    def __init__(self):
+        self.count = 0
+        self.zeros = 0
+        self.counts = {}
+        self.max = 0.0
+
+    def record(self, value: float):
+        self.count += 1
+        self.max = max(self.max, value)
+        if value <= 0:
+            self.zeros += 1
+            return
+        bucket = math.floor(math.log10(value) * self.BUCKETS_PER_DECADE)
+        self.counts[bucket] = self.counts.get(bucket, 0) + 1
+
+    def percentile(self, q: float) -> float:
+        """The value that q percent of the values are at most."""
+        if not self.count:
+            raise ValueError("No games recorded.")
+        rank = max(math.ceil(q / 100 * self.count), 1)
+        seen = self.zeros
+        if seen >= rank:
+            return 0.0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= rank:
+                return min(10 ** ((bucket + 1) / self.BUCKETS_PER_DECADE),
+                           self.max)
+        return self.max
+
+
+class ConvergenceHistogram:
+    """Aggregates the GameStats of many games, e.g. to tune DELTA and
+    MAX_ITERATIONS against tail latency.
+
+    The sweeps are kept as a histogram, the final delta and wall time of
+    the games in LogHistograms, so memory stays bounded over long runs.
+    """
+    def __init__(self):
+        self.games = 0
+        self.not_converged = 0
+        self.sweeps = {}
+        self.deltas = LogHistogram()
+        self.seconds = LogHistogram()
+        self.layer_times = {layer: 0.0 for layer in GameStats.LAYERS}
+
+    def record(self, stats: GameStats):
+        self.games += 1
+        if not stats.converged:
+            self.not_converged += 1
+        self.sweeps[stats.sweeps] = self.sweeps.get(stats.sweeps, 0) + 1
+        self.deltas.record(stats.delta)
+        self.seconds.record(stats.seconds)
+        for layer, seconds in stats.layer_times.items():
+            self.layer_times[layer] = self.layer_times.get(layer, 0) + seconds
+
+    def percentile(self, q: float) -> int:
+        """The number of sweeps that q percent of games needed at most."""
+        if not self.games:
+            raise ValueError("No games recorded.")
+        target = q / 100 * self.games
+        seen = 0
+        for sweeps in sorted(self.sweeps):
+            seen += self.sweeps[sweeps]
+            if seen >= target:
+                return sweeps
+        return max(self.sweeps)
+
+    def delta_percentile(self, q: float) -> float:
+        """The final delta that q percent of games ended with at most."""
+        return self.deltas.percentile(q)
+
+    def seconds_percentile(self, q: float) -> float:
+        """The wall time that q percent of games took at most."""
+        return self.seconds.percentile(q)
+
+    def to_dict(self) -> Dict:
+        summary = {"games": self.games, "not_converged": self.not_converged,
+                   "sweeps": {str(sweeps): self.sweeps[sweeps]
+                              for sweeps in sorted(self.sweeps)},
+                   "layer_times": dict(self.layer_times)}
+        if self.games:
+            for key, values in (("delta", self.deltas),
+                                ("seconds", self.seconds)):
+                summary[key] = {f"p{q}": values.percentile(q)
+                                for q in PERCENTILES}
+                summary[key]["max"] = values.max
+        return summary
+
+    def save(self, path: str):
+        """Writes the histogram to a JSON file."""
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
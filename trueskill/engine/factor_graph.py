@@ -1,8 +1,11 @@
 import math
-from trueskill.utils.maths import Gaussian, v_truncate, w_truncate
+import sys
+from trueskill.utils.maths import Gaussian, v_truncate, w_truncate, \
+    v_truncate_draw, w_truncate_draw
 from typing import List
 from abc import ABC, abstractmethod
-from trueskill.utils.constants import PERFORMANCE_NOISE, DYNAMIC_FACTOR
+from trueskill.utils.constants import PERFORMANCE_NOISE, DYNAMIC_FACTOR, \
+    DAMPING
 
 
 class Factor(ABC):
@@ -21,6 +24,8 @@ class Factor(ABC):
 
 
 class Variable(Gaussian):
+    __slots__ = ('messages', 'name')
+
     def __init__(self, name=""):
         # each entry in the messages dict is a factor whose value is the
         # message from that factor to this variable
@@ -40,11 +45,11 @@ class Variable(Gaussian):
     def update_message(self, factor: Factor, message: Gaussian):
         # update the factor to variable message
         old_message, self.messages[factor] = self.messages[factor], message
-        self.marginal = self / old_message * message
+        self.idiv(old_message).imul(message)
 
     def update_marginal(self, factor: Factor, value: Gaussian):
         old_message = self.messages[factor]
-        self.messages[factor] = value * old_message / self
+        self.messages[factor] = (value * old_message).idiv(self)
         self.marginal = value
 
 
@@ -98,11 +103,19 @@ class SumFactor(Factor):
                        perf_messages: List[Gaussian], coeffs: List[float]):
         # TODO: Make variables, messages and coeffs a list of named tuples.
         assert len(perf_vars) == len(perf_messages) == len(coeffs)
-        pi = 1.0 / sum([coeffs[i]**2 / (perf_vars[i].pi - perf_messages[i].pi)
+        cavity_pi = [perf_vars[i].pi - perf_messages[i].pi
+                     for i in range(len(coeffs))]
+        if 0.0 in cavity_pi:
+            # a term of infinite variance, e.g. behind a truncate factor
+            # whose w underflowed for a far expected winner, says nothing
+            # about the sum so the message is uniform
+            var.update_message(self, Gaussian())
+            return
+        pi = 1.0 / sum([coeffs[i]**2 / cavity_pi[i]
                         for i in range(len(coeffs))])
         tau = pi * sum([coeffs[i] *
                         (perf_vars[i].tau - perf_messages[i].tau) /
-                        (perf_vars[i].pi - perf_messages[i].pi)
+                        cavity_pi[i]
                         for i in range(len(coeffs))])
         new_message = Gaussian(pi=pi, tau=tau)
         var.update_message(self, new_message)
@@ -124,20 +137,50 @@ class SumFactor(Factor):
 
 
 class TruncateFactor(Factor):
-    def __init__(self, variable: Variable):
+    def __init__(self, variable: Variable, damping=DAMPING, draw_margin=0.0,
+                 drawn=False):
+        """Truncates the performance difference of two neighbouring teams
+        to above draw_margin, or to within it if they drew."""
         super().__init__([variable])
         self.var = variable
-
-    def up(self):
-        c = self.var.pi - self.var.messages[self].pi
-        d = self.var.tau - self.var.messages[self].tau
-        pi = c / (1-w_truncate(d / math.sqrt(c)))
-        tau = ((d + math.sqrt(c) * v_truncate(d / math.sqrt(c))) /
-               (1 - w_truncate(d / math.sqrt(c))))
+        self.damping = damping
+        self.draw_margin = draw_margin
+        self.drawn = drawn
+
+    def up(self, damped=False):
+        """Updates the message to the difference variable.
+
+        Args:
+            damped: Mix the new message with the previous one by damping,
+            for the repeated updates of the multi-team sweeps. The first
+            message is never damped.
+        Returns:
+            The KL divergence of the new marginal from the old one.
+        """
+        old_message = self.var.messages[self]
+        c = self.var.pi - old_message.pi
+        d = self.var.tau - old_message.tau
+        x = d / math.sqrt(c)
+        margin = self.draw_margin * math.sqrt(c)
+        if self.drawn:
+            v, w = v_truncate_draw(x, margin), w_truncate_draw(x, margin)
+        else:
+            v, w = v_truncate(x - margin), w_truncate(x - margin)
+        # 1 - w rounds to 0 for draw margins far narrower than the skill
+        # uncertainty, the difference is then pinned as tightly as floats
+        # allow
+        remaining = max(1 - w, sys.float_info.epsilon)
+        pi = c / remaining
+        tau = (d + math.sqrt(c) * v) / remaining
+        if damped and self.damping and old_message.pi:
+            # mix the new factor message with the old one
+            pi = c + ((1 - self.damping) * (pi - c) +
+                      self.damping * old_message.pi)
+            tau = d + ((1 - self.damping) * (tau - d) +
+                       self.damping * old_message.tau)
         old_marginal = self.var.marginal
         self.var.update_marginal(self, Gaussian(pi=pi, tau=tau))
         return old_marginal.kl_divergence(self.var.marginal)
 
     def down(self):
         return 0
-
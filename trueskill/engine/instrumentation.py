@@ -0,0 +1,269 @@
+import functools
+import json
+import marshal
+import time
+from typing import Dict, List, Tuple
+from trueskill.engine.compiled_graph import MessageState
+from trueskill.engine.convergence import GameStats
+from trueskill.engine.factor_graph import PriorFactor, PerformanceFactor, \
+    SumFactor, TruncateFactor, Variable
+from trueskill.utils.maths import Gaussian
+
+# the methods timed while instrumentation is enabled
+METHODS = [
+    (PriorFactor, ("down", "up")),
+    (PerformanceFactor, ("down", "up")),
+    (SumFactor, ("down", "up")),
+    (TruncateFactor, ("down", "up")),
+    (Variable, ("update_message", "update_marginal")),
+    (MessageState, ("update_message", "update_marginal", "perf_update",
+                    "sum_update", "truncate_up")),
+]
+
+_active = None
+
+
+class _Counter:
+    """Calls and time of one method or schedule phase.
+
+    Attributes:
+        key: The (file, line, name) of the function, as in cProfile.
+        calls: Times it was called or entered.
+        seconds: Time spent in it, including the methods it called.
+        own_seconds: Time spent in it, excluding the timed methods it
+        called.
+        callers: The same three counts split by caller key.
+    """
+    __slots__ = ('key', 'calls', 'seconds', 'own_seconds', 'callers')
+
+    def __init__(self, key: Tuple[str, int, str]):
+        self.key = key
+        self.calls = 0
+        self.seconds = 0.0
+        self.own_seconds = 0.0
+        self.callers = {}
+
+    def record(self, caller, seconds: float, own_seconds: float):
+        self.calls += 1
+        self.seconds += seconds
+        self.own_seconds += own_seconds
+        if caller is not None:
+            edge = self.callers.setdefault(caller.key, [0, 0.0, 0.0])
+            edge[0] += 1
+            edge[1] += seconds
+            edge[2] += own_seconds
+
+    def to_dict(self) -> Dict:
+        return {"calls": self.calls, "seconds": self.seconds,
+                "own_seconds": self.own_seconds}
+
+
+class Instrumentation:
+    """Opt-in call counts and timings of the factor graph engines.
+
+    Enabling it replaces the factor methods in METHODS, GameStats.start and
+    stop, which mark the phases of the schedule in TrueSkillEnv._run and
+    the compiled and array engines, and Gaussian.__init__ with wrappers that
+    count and time them. Disabling it puts the original methods back, so
+    when it isn't enabled it costs nothing at all. Only one instance can be
+    enabled at a time and the counts are not thread safe.
+
+    Usage:
+        with Instrumentation() as instrumentation:
+            TrueSkillEnv(teams).update_ratings()
+        instrumentation.to_dict()
+
+    Attributes:
+        methods: The counter of each method called, keyed by
+        "Class.method".
+        phases: The counter of each phase of the schedule entered, keyed by
+        phase, "prior", "performance", "team" or "game". Factor methods
+        called in a phase have it as their caller.
+        gaussian_allocations: Gaussians created, including Variables.
+    """
+    def __init__(self):
+        self.methods = {}
+        self.phases = {}
+        self.gaussian_allocations = 0
+        # frames of the timed calls in progress, [counter, child seconds,
+        # start], with the current phase at the bottom
+        self._stack = []
+        self._originals = []
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self._originals)
+
+    def enable(self):
+        """Starts counting, raises RuntimeError if another instance is
+        enabled."""
+        global _active
+        if self.enabled:
+            return
+        if _active is not None:
+            raise RuntimeError("Another Instrumentation is already enabled.")
+        _active = self
+        for cls, names in METHODS:
+            for name in names:
+                self._patch(cls, name, self._timed(cls, name,
+                                                   cls.__dict__[name]))
+        self._patch(GameStats, "start", self._phase_start(GameStats.start))
+        self._patch(GameStats, "stop", self._phase_stop(GameStats.stop))
+        self._patch(Gaussian, "__init__", self._counted(Gaussian.__init__))
+
+    def disable(self):
+        """Stops counting and restores the original methods, the counts
+        are kept."""
+        global _active
+        for cls, name, original in reversed(self._originals):
+            setattr(cls, name, original)
+        self._originals = []
+        self._stack = []
+        if _active is self:
+            _active = None
+
+    def __enter__(self) -> 'Instrumentation':
+        self.enable()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.disable()
+
+    def reset(self):
+        """Clears the counts."""
+        self.methods = {}
+        self.phases = {}
+        self.gaussian_allocations = 0
+        self._stack = []
+
+    def _patch(self, cls, name, replacement):
+        self._originals.append((cls, name, cls.__dict__[name]))
+        setattr(cls, name, replacement)
+
+    def _push(self, counter: _Counter):
+        self._stack.append([counter, 0.0, time.perf_counter()])
+
+    def _pop(self):
+        counter, child_seconds, start = self._stack.pop()
+        seconds = time.perf_counter() - start
+        caller = self._stack[-1] if self._stack else None
+        counter.record(caller[0] if caller else None, seconds,
+                       seconds - child_seconds)
+        if caller is not None:
+            caller[1] += seconds
+
+    def _timed(self, cls, name, func):
+        label = f"{cls.__name__}.{name}"
+        code = func.__code__
+        key = (code.co_filename, code.co_firstlineno, func.__qualname__)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            counter = self.methods.get(label)
+            if counter is None:
+                counter = self.methods[label] = _Counter(key)
+            self._push(counter)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self._pop()
+        return wrapper
+
+    def _end_phase(self):
+        if self._stack and self._stack[-1][0].key[0] == '~':
+            self._pop()
+
+    def _phase_start(self, start):
+        @functools.wraps(start)
+        def wrapper(stats, layer):
+            start(stats, layer)
+            self._end_phase()
+            counter = self.phases.get(layer)
+            if counter is None:
+                counter = self.phases[layer] = _Counter(
+                    ('~', 0, f"<phase {layer}>"))
+            self._push(counter)
+        return wrapper
+
+    def _phase_stop(self, stop):
+        @functools.wraps(stop)
+        def wrapper(stats):
+            stop(stats)
+            self._end_phase()
+        return wrapper
+
+    def _counted(self, init):
+        @functools.wraps(init)
+        def wrapper(gaussian, *args, **kwargs):
+            self.gaussian_allocations += 1
+            init(gaussian, *args, **kwargs)
+        return wrapper
+
+    def to_dict(self) -> Dict:
+        """The counts as a dict of "methods" and "phases", each keyed by
+        name with the calls, seconds and own_seconds, and
+        "gaussian_allocations"."""
+        return {"methods": {label: counter.to_dict() for label, counter
+                            in sorted(self.methods.items())},
+                "phases": {layer: counter.to_dict() for layer, counter
+                           in sorted(self.phases.items())},
+                "gaussian_allocations": self.gaussian_allocations}
+
+    def to_prometheus(self, prefix="trueskill") -> str:
+        """The counts in the Prometheus text exposition format."""
+        lines = []
+
+        def metric(name, help_text, label, counters, attribute):
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} counter")
+            for value, counter in sorted(counters.items()):
+                lines.append(f'{prefix}_{name}{{{label}="{value}"}} '
+                             f'{getattr(counter, attribute)}')
+
+        metric("method_calls_total", "Calls of each factor graph method.",
+               "method", self.methods, "calls")
+        metric("method_seconds_total", "Time in each factor graph method, "
+               "including the methods it called.", "method", self.methods,
+               "seconds")
+        metric("phase_calls_total", "Times each phase of the schedule was "
+               "entered.", "phase", self.phases, "calls")
+        metric("phase_seconds_total", "Time in each phase of the schedule.",
+               "phase", self.phases, "seconds")
+        lines.append(f"# HELP {prefix}_gaussian_allocations_total "
+                     f"Gaussians created.")
+        lines.append(f"# TYPE {prefix}_gaussian_allocations_total counter")
+        lines.append(f"{prefix}_gaussian_allocations_total "
+                     f"{self.gaussian_allocations}")
+        return "\n".join(lines) + "\n"
+
+    def pstats(self) -> Dict:
+        """The counts in the layout of pstats.Stats.stats, keyed by
+        (file, line, name) with (calls, calls, own seconds, seconds,
+        callers) values."""
+        counters: List[_Counter] = (list(self.phases.values()) +
+                                    list(self.methods.values()))
+        return {counter.key: (counter.calls, counter.calls,
+                              counter.own_seconds, counter.seconds,
+                              {caller: (calls, calls, own_seconds, seconds)
+                               for caller, (calls, seconds, own_seconds)
+                               in counter.callers.items()})
+                for counter in counters}
+
+    def dump_stats(self, path: str):
+        """Writes the counts as a cProfile report, which can be read with
+        pstats.Stats(path) or profile viewers such as snakeviz."""
+        with open(path, "wb") as f:
+            marshal.dump(self.pstats(), f)
+
+    def save(self, path: str):
+        """Writes the counts to path, as Prometheus text if it ends with
+        ".prom", as JSON if it ends with ".json" and as a cProfile report
+        otherwise."""
+        if path.endswith(".prom"):
+            with open(path, "w") as f:
+                f.write(self.to_prometheus())
+        elif path.endswith(".json"):
+            with open(path, "w") as f:
+                json.dump(self.to_dict(), f, indent=2)
+        else:
+            self.dump_stats(path)
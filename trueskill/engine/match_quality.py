@@ -0,0 +1,153 @@
+import math
+from typing import Dict, List, Tuple, Union, Iterable, TYPE_CHECKING
+from trueskill.utils.maths import Gaussian
+from trueskill.utils.constants import PERFORMANCE_NOISE
+
+# numpy and scipy are only imported by the matrix and array scorers, so the
+# scalar two team API stays cheap to import
+if TYPE_CHECKING:
+    import numpy as np
+
+Team = Union[Dict[str, Gaussian], Iterable[Gaussian]]
+
+
+def _skills(team: Team) -> List[Gaussian]:
+    return list(team.values()) if isinstance(team, dict) else list(team)
+
+
+def _team_sums(team: Team) -> Tuple[float, float, int]:
+    skills = _skills(team)
+    return (sum(skill.mu for skill in skills),
+            sum(skill.sigma ** 2 for skill in skills), len(skills))
+
+
+def match_quality(teams: List[Team], perf_noise_sigma=PERFORMANCE_NOISE) \
+        -> float:
+    """The match quality of a game between two or more teams.
+
+    This is the probability of a draw relative to the most likely draw,
+    between 0 and 1 where 1 is a perfectly even match. For more than two
+    teams it uses the matrix form from the TrueSkill paper, with A the
+    players by neighbouring team pairs matrix of +1 and -1 entries:
+
+        sqrt(det(b^2 A'A) / det(b^2 A'A + A'SA)) *
+            exp(-m'A (b^2 A'A + A'SA)^-1 A'm / 2)
+
+    Args:
+        teams: The skills of the players in each team, either keyed by
+        player or just the Gaussians.
+        perf_noise_sigma: The standard deviation of the performance noise.
+    Returns:
+        The match quality.
+    """
+    if len(teams) < 2:
+        raise ValueError("Need at least two teams in the game!")
+    if len(teams) == 2:
+        mu_a, var_a, size_a = _team_sums(teams[0])
+        mu_b, var_b, size_b = _team_sums(teams[1])
+        noise = (size_a + size_b) * perf_noise_sigma ** 2
+        total = noise + var_a + var_b
+        return (math.sqrt(noise / total) *
+                math.exp(-(mu_a - mu_b) ** 2 / (2 * total)))
+    return _matrix_quality(teams, perf_noise_sigma)
+
+
+def _matrix_quality(teams: List[Team], perf_noise_sigma: float) -> float:
+    import numpy as np
+    skills = [_skills(team) for team in teams]
+    mean = np.array([s.mu for team in skills for s in team])
+    variance = np.array([s.sigma ** 2 for team in skills for s in team])
+    a = np.zeros((len(mean), len(teams) - 1))
+    start = 0
+    for i, team in enumerate(skills):
+        if i < len(teams) - 1:
+            a[start:start + len(team), i] = 1
+        if i > 0:
+            a[start:start + len(team), i - 1] = -1
+        start += len(team)
+    ata = perf_noise_sigma ** 2 * a.T @ a
+    middle = ata + a.T @ (variance[:, None] * a)
+    am = a.T @ mean
+    exponent = -0.5 * am @ np.linalg.solve(middle, am)
+    return float(math.sqrt(np.linalg.det(ata) / np.linalg.det(middle)) *
+                 math.exp(exponent))
+
+
+def win_probability(team_a: Team, team_b: Team,
+                    perf_noise_sigma=PERFORMANCE_NOISE) -> float:
+    """The probability that team_a performs better than team_b.
+
+    Args:
+        team_a: The skills of the players in the first team.
+        team_b: The skills of the players in the second team.
+        perf_noise_sigma: The standard deviation of the performance noise.
+    Returns:
+        The win probability of team_a.
+    """
+    mu_a, var_a, size_a = _team_sums(team_a)
+    mu_b, var_b, size_b = _team_sums(team_b)
+    c = math.sqrt((size_a + size_b) * perf_noise_sigma ** 2 + var_a + var_b)
+    return 0.5 * math.erfc(-(mu_a - mu_b) / (c * math.sqrt(2)))
+
+
+def win_probabilities(teams: List[Team], perf_noise_sigma=PERFORMANCE_NOISE) \
+        -> List[List[float]]:
+    """The pairwise win probabilities of two or more teams.
+
+    Returns:
+        A matrix whose entry [i][j] is the probability that team i performs
+        better than team j, the diagonal is 0.5.
+    """
+    return [[win_probability(team_a, team_b, perf_noise_sigma)
+             for team_b in teams] for team_a in teams]
+
+
+def team_arrays(mu: "np.ndarray", sigma: "np.ndarray",
+                mask: "np.ndarray" = None) \
+        -> Tuple["np.ndarray", "np.ndarray", "np.ndarray"]:
+    """Sums padded (teams, players) rating arrays into the per team mean,
+    variance and size used by the array scorers.
+
+    Args:
+        mu: The means of the players in each team.
+        sigma: The standard deviations of the players in each team.
+        mask: True where a slot holds a player, defaults to all of them.
+    Returns:
+        The sum of the means, the sum of the variances and the number of
+        players of each team.
+    """
+    import numpy as np
+    if mask is None:
+        mask = np.ones(np.shape(mu), dtype=bool)
+    return (np.where(mask, mu, 0).sum(axis=-1),
+            (np.where(mask, sigma, 0) ** 2).sum(axis=-1),
+            mask.sum(axis=-1))
+
+
+def match_quality_arrays(mu_a: "np.ndarray", var_a: "np.ndarray",
+                         size_a: "np.ndarray", mu_b: "np.ndarray",
+                         var_b: "np.ndarray", size_b: "np.ndarray",
+                         perf_noise_sigma=PERFORMANCE_NOISE) -> "np.ndarray":
+    """Vectorized two team match_quality over many candidate pairings.
+
+    The arguments are the outputs of team_arrays for the two sides and
+    broadcast against each other, so passing mu_a[:, None] etc. and
+    mu_b[None, :] etc. scores every team in a against every team in b as a
+    matrix.
+    """
+    import numpy as np
+    noise = (size_a + size_b) * perf_noise_sigma ** 2
+    total = noise + var_a + var_b
+    return np.sqrt(noise / total) * np.exp(-(mu_a - mu_b) ** 2 / (2 * total))
+
+
+def win_probability_arrays(mu_a: "np.ndarray", var_a: "np.ndarray",
+                           size_a: "np.ndarray", mu_b: "np.ndarray",
+                           var_b: "np.ndarray", size_b: "np.ndarray",
+                           perf_noise_sigma=PERFORMANCE_NOISE) -> "np.ndarray":
+    """Vectorized win_probability of team a over many candidate pairings,
+    the arguments broadcast as in match_quality_arrays."""
+    import numpy as np
+    from scipy.special import ndtr
+    c = np.sqrt((size_a + size_b) * perf_noise_sigma ** 2 + var_a + var_b)
+    return ndtr((mu_a - mu_b) / c)
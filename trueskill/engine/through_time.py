@@ -0,0 +1,300 @@
+import bisect
+import math
+import time
+from array import array
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, List, NamedTuple, Tuple
+from trueskill.data.game import Game
+from trueskill.engine.compiled_graph import get_compiled_graph
+from trueskill.engine.convergence import GameStats
+from trueskill.utils.maths import Gaussian, game_draw_margins, \
+    partial_play_coeffs
+from trueskill.utils.constants import MU, SIGMA, DYNAMIC_FACTOR, \
+    PERFORMANCE_NOISE, DELTA, MAX_ITERATIONS, DAMPING, DRAW_PROBABILITY
+
+
+class IterationStats(NamedTuple):
+    """Convergence and timing of one forward and backward sweep over the
+    history.
+
+    Attributes:
+        step: The largest change of the mean or standard deviation of any
+        player's skill at any game in the sweeps.
+        seconds: Time the sweeps took.
+        unconverged_games: Game runs that stopped at the iteration cap of
+        the game graph.
+    """
+    step: float
+    seconds: float
+    unconverged_games: int
+
+
+@lru_cache(maxsize=1024)
+def _truncations(team_sizes: Tuple[int, ...], drawn: Tuple[bool, ...],
+                 draw_probability: float, beta: float) \
+        -> List[Tuple[float, bool]]:
+    ranks = [0]
+    for tie in drawn:
+        ranks.append(ranks[-1] if tie else ranks[-1] + 1)
+    return game_draw_margins(team_sizes, ranks, draw_probability, beta)
+
+
+def _add_variance(pi: float, tau: float, variance: float) \
+        -> Tuple[float, float]:
+    """Widens a Gaussian in natural parameters by the dynamics, a uniform
+    message stays uniform."""
+    if pi == 0:
+        return 0.0, 0.0
+    new_pi = 1 / (1 / pi + variance)
+    return new_pi, tau * new_pi / pi
+
+
+class TrueSkillThroughTime:
+    """Smooths the ratings of a whole match history, TrueSkill Through Time
+    style, so early games are re-evaluated with the evidence of later ones.
+
+    Every appearance of a player in a game has three messages to their skill
+    at that game: the forward message from their earlier games, the
+    backward message from their later games and the likelihood message from
+    the game itself. The forward and backward messages pass the skill to the
+    neighbouring appearance with the dynamics variance added, once per game
+    as PriorFactor does. A game is rated with the compiled factor graph from
+    the product of the forward and backward messages as the prior and no
+    dynamics, and its likelihood message is the posterior divided by that
+    prior. Each iteration sweeps the games forwards then backwards, the
+    first forward sweep is ordinary filtering.
+
+    The messages are held in flat arrays indexed by appearance instead of
+    Gaussian objects, about 80 bytes per player per game, and the games
+    themselves are only kept as their team sizes, ties and players.
+    """
+    def __init__(self, games: Iterable[Game],
+                 ratings: Dict[str, Gaussian] = None,
+                 dynamics=DYNAMIC_FACTOR,
+                 perf_noise_sigma=PERFORMANCE_NOISE,
+                 draw_probability=DRAW_PROBABILITY,
+                 delta=DELTA,
+                 max_iterations=MAX_ITERATIONS,
+                 damping=DAMPING):
+        """Lays the history out in arrays.
+
+        Args:
+            games: Validated games in chronological order, e.g. from
+            iter_games, they are read once.
+            ratings: The skill of players before their first game, defaults
+            to the skill of a new player.
+            dynamics: The standard deviation added to the skill between
+            consecutive games of a player.
+            perf_noise_sigma: The standard deviation of the performance noise.
+            draw_probability: The probability of a draw between two evenly
+            matched teams, it must be above zero if any teams drew.
+            delta: Convergence threshold of the game graphs.
+            max_iterations: The most sweeps over the game factors of a game
+            graph.
+            damping: Fraction of the previous truncate message kept.
+        Raises:
+            ValueError: If teams drew with a zero draw probability.
+        """
+        self.dynamics = dynamics
+        self.perf_sigma = perf_noise_sigma
+        self.draw_probability = draw_probability
+        self.delta = delta
+        self.max_iterations = max_iterations
+        self.damping = damping
+        self.names = []
+        self._ids = {}
+        # per game, offsets into the appearances and the teams
+        self._game_start = array('q', [0])
+        self._team_start = array('q', [0])
+        # per team and per pair of neighbouring teams
+        self._team_sizes = array('i')
+        self._drawn = array('b')
+        # per appearance
+        self._player = array('i')
+        self._coeff = array('d')
+        self._prev = array('q')
+        self._next = array('q')
+        # per player
+        self._last = array('q')
+        self._prior_pi = array('d')
+        self._prior_tau = array('d')
+
+        ratings = ratings or {}
+        for game in games:
+            self._add_game(game, ratings)
+        # the messages of each appearance, all uniform to start with
+        zeros = array('d', bytes(8 * len(self._player)))
+        self._forward_pi, self._forward_tau = array('d', zeros), \
+            array('d', zeros)
+        self._backward_pi, self._backward_tau = array('d', zeros), \
+            array('d', zeros)
+        self._game_pi, self._game_tau = array('d', zeros), array('d', zeros)
+        self.iterations = []
+
+    def _add_game(self, game: Game, ratings: Dict[str, Gaussian]):
+        order = sorted(range(len(game.teams)), key=lambda j: game.ranks[j])
+        teams = [game.teams[j] for j in order]
+        ranks = [game.ranks[j] for j in order]
+        drawn = tuple(ranks[i] == ranks[i + 1]
+                      for i in range(len(ranks) - 1))
+        sizes = tuple(len(team) for team in teams)
+        # raises for ties without a draw probability
+        _truncations(sizes, drawn, self.draw_probability, self.perf_sigma)
+
+        players = [player for team in teams for player in team]
+        for player, coeff in zip(players,
+                                 partial_play_coeffs(players, game.weights)):
+            idx = len(self._player)
+            player_id = self._ids.get(player)
+            if player_id is None:
+                player_id = self._ids[player] = len(self.names)
+                self.names.append(player)
+                rating = ratings.get(player) or Gaussian(mu=MU, sigma=SIGMA)
+                self._prior_pi.append(rating.pi)
+                self._prior_tau.append(rating.tau)
+                self._last.append(-1)
+            prev = self._last[player_id]
+            if prev >= 0:
+                self._next[prev] = idx
+            self._last[player_id] = idx
+            self._player.append(player_id)
+            self._coeff.append(coeff)
+            self._prev.append(prev)
+            self._next.append(-1)
+        self._team_sizes.extend(sizes)
+        self._drawn.extend(drawn)
+        self._game_start.append(len(self._player))
+        self._team_start.append(len(self._team_sizes))
+
+    @property
+    def num_games(self) -> int:
+        return len(self._game_start) - 1
+
+    def run(self, tolerance=1e-4, max_iterations=30,
+            on_iteration: Callable[[IterationStats], None] = None) \
+            -> List[IterationStats]:
+        """Iterates until no skill changes by more than tolerance.
+
+        Args:
+            tolerance: Stop once the step of an iteration is at most this.
+            max_iterations: The most iterations, even if not converged.
+            on_iteration: Called with the stats of every iteration.
+        Returns:
+            The stats of every iteration run so far.
+        """
+        for _ in range(max_iterations):
+            stats = self.iterate()
+            if on_iteration is not None:
+                on_iteration(stats)
+            if stats.step <= tolerance:
+                break
+        return self.iterations
+
+    def iterate(self) -> IterationStats:
+        """Runs one forward and one backward sweep over the games."""
+        start = time.perf_counter()
+        variance = self.dynamics ** 2
+        step, unconverged = 0.0, 0
+        forward_pi, forward_tau = self._forward_pi, self._forward_tau
+        backward_pi, backward_tau = self._backward_pi, self._backward_tau
+        game_pi, game_tau = self._game_pi, self._game_tau
+
+        for g in range(self.num_games):
+            for i in range(self._game_start[g], self._game_start[g + 1]):
+                j = self._prev[i]
+                if j < 0:
+                    player = self._player[i]
+                    pi, tau = self._prior_pi[player], self._prior_tau[player]
+                else:
+                    pi = forward_pi[j] + game_pi[j]
+                    tau = forward_tau[j] + game_tau[j]
+                forward_pi[i], forward_tau[i] = _add_variance(pi, tau,
+                                                              variance)
+            game_step, converged = self._rate_game(g)
+            step = max(step, game_step)
+            unconverged += not converged
+
+        for g in reversed(range(self.num_games)):
+            for i in range(self._game_start[g], self._game_start[g + 1]):
+                j = self._next[i]
+                if j < 0:
+                    backward_pi[i], backward_tau[i] = 0.0, 0.0
+                else:
+                    backward_pi[i], backward_tau[i] = _add_variance(
+                        backward_pi[j] + game_pi[j],
+                        backward_tau[j] + game_tau[j], variance)
+            game_step, converged = self._rate_game(g)
+            step = max(step, game_step)
+            unconverged += not converged
+
+        stats = IterationStats(step, time.perf_counter() - start, unconverged)
+        self.iterations.append(stats)
+        return stats
+
+    def _rate_game(self, g: int) -> Tuple[float, bool]:
+        """Rates a game given the messages from the rest of the history and
+        replaces its likelihood messages.
+
+        Returns:
+            The largest change of a skill's mean or standard deviation and
+            whether the game graph converged.
+        """
+        start, end = self._game_start[g], self._game_start[g + 1]
+        teams = slice(self._team_start[g], self._team_start[g + 1])
+        pairs = slice(self._team_start[g] - g, self._team_start[g + 1] - g - 1)
+        sizes = tuple(self._team_sizes[teams])
+        priors = [Gaussian(pi=self._forward_pi[i] + self._backward_pi[i],
+                           tau=self._forward_tau[i] + self._backward_tau[i])
+                  for i in range(start, end)]
+        stats = GameStats()
+        posteriors = get_compiled_graph(sizes).run(
+            priors, dynamics=0.0, perf_noise_sigma=self.perf_sigma,
+            delta=self.delta, coeffs=list(self._coeff[start:end]),
+            max_iterations=self.max_iterations, damping=self.damping,
+            stats=stats,
+            truncations=_truncations(sizes,
+                                     tuple(map(bool, self._drawn[pairs])),
+                                     self.draw_probability, self.perf_sigma))
+
+        step = 0.0
+        for i, prior, (pi, tau) in zip(range(start, end), priors,
+                                       posteriors):
+            old_pi = prior.pi + self._game_pi[i]
+            old_tau = prior.tau + self._game_tau[i]
+            step = max(step, abs(tau / pi - old_tau / old_pi),
+                       abs(1 / math.sqrt(pi) - 1 / math.sqrt(old_pi)))
+            self._game_pi[i] = pi - prior.pi
+            self._game_tau[i] = tau - prior.tau
+        return step, stats.converged
+
+    def _posterior(self, i: int) -> Gaussian:
+        return Gaussian(pi=(self._forward_pi[i] + self._backward_pi[i] +
+                            self._game_pi[i]),
+                        tau=(self._forward_tau[i] + self._backward_tau[i] +
+                             self._game_tau[i]))
+
+    def ratings(self) -> Dict[str, Gaussian]:
+        """The skill of every player after their last game."""
+        return {name: self._posterior(self._last[player_id])
+                for player_id, name in enumerate(self.names)}
+
+    def history(self, player: str) -> List[Tuple[int, Gaussian]]:
+        """The skill of a player at each of their games.
+
+        Returns:
+            (game number, skill) of every game of the player, games numbered
+            from 0 in the order they were given.
+        """
+        history = []
+        i = self._first(self._ids[player])
+        while i >= 0:
+            game = bisect.bisect_right(self._game_start, i) - 1
+            history.append((game, self._posterior(i)))
+            i = self._next[i]
+        return history
+
+    def _first(self, player_id: int) -> int:
+        i = self._last[player_id]
+        while self._prev[i] >= 0:
+            i = self._prev[i]
+        return i
@@ -1,16 +1,23 @@
 from typing import List, Dict
-from trueskill.utils.maths import Gaussian
+from trueskill.utils.maths import Gaussian, game_draw_margins, \
+    partial_play_coeffs
 from trueskill.utils.constants import DYNAMIC_FACTOR, PERFORMANCE_NOISE, \
-    DELTA
+    DELTA, MAX_ITERATIONS, DAMPING, DRAW_PROBABILITY
 from trueskill.engine.factor_graph import Variable, PerformanceFactor, \
     PriorFactor, SumFactor, TruncateFactor
+from trueskill.engine.convergence import GameStats
 
 
 class TrueSkillEnv:
     def __init__(self, teams: List[Dict[str, Gaussian]],
                  dynamics=DYNAMIC_FACTOR,
                  perf_noise_sigma=PERFORMANCE_NOISE,
-                 delta=DELTA):
+                 delta=DELTA,
+                 max_iterations=MAX_ITERATIONS,
+                 damping=DAMPING,
+                 ranks: List[int] = None,
+                 draw_probability=DRAW_PROBABILITY,
+                 weights: Dict[str, float] = None):
         """Builds and runs a TrueSkill environment.
 
         Args:
@@ -21,22 +28,45 @@ class TrueSkillEnv:
             delta: The minimum difference two marginals have to satisfy to be
             considered approximately equal (for the approximation of game
             marginals.)
+            max_iterations: The most sweeps over the game factors for games
+            of more than two teams, even if they haven't converged.
+            damping: Fraction of the previous truncate factor message kept
+            at each update, to stop the sweeps from oscillating.
+            ranks: The rank of each team, in the order of teams. Teams with
+            the same rank drew, by default every team beat the next one.
+            draw_probability: The probability of a draw between two evenly
+            matched teams, it must be above zero if any teams drew.
+            weights: The fraction of the game played by players who joined
+            late or left early, keyed by player. Players not in it played
+            the whole game.
+        Raises:
+            ValueError: If teams drew with a zero draw probability.
         """
         self.dynamics = dynamics
         self.perf_sigma = perf_noise_sigma
         self.delta = delta
+        self.max_iterations = max_iterations
+        self.damping = damping
+        self.stats = GameStats()
         self.teams = teams
+        self.draw_margins = game_draw_margins([len(team) for team in teams],
+                                              ranks, draw_probability,
+                                              perf_noise_sigma)
+        self.coeffs = partial_play_coeffs(
+            [player for team in teams for player in team], weights)
         self.players = []
         self.prior_factors = []
         self.perf_factors = []
         self.team_factors = []
         self.truncate_factors = []
+        self._ran = False
         self._build()
 
     def _build(self):
         """Builds the relevant factor graph for this TrueSkill environment
         for the game information given"""
         team_vars = []
+        coeffs = iter(self.coeffs)
         for team in self.teams:
             team_var = Variable()
             team_vars.append(team_var)
@@ -51,50 +81,82 @@ class TrueSkillEnv:
                 self.perf_factors.append(perf_factor)
                 performance_vars.append(performance_var)
             team_factor = SumFactor(team_var, performance_vars,
-                                    [1.0]*len(performance_vars))
+                                    [next(coeffs) for _ in performance_vars])
             self.team_factors.append(team_factor)
         game_vars = [Variable() for _ in range(len(self.teams)-1)]
         self.game_factors = [SumFactor(game_var,
                                        [team_vars[i], team_vars[i+1]],
                                        [1, -1])
                              for i, game_var in enumerate(game_vars)]
-        self.truncate_factors = [TruncateFactor(game_var)
-                                 for game_var in game_vars]
+        self.truncate_factors = [TruncateFactor(game_var,
+                                                damping=self.damping,
+                                                draw_margin=margin,
+                                                drawn=drawn)
+                                 for game_var, (margin, drawn)
+                                 in zip(game_vars, self.draw_margins)]
+
+    def _reset(self):
+        """Clears the messages and marginals left by a previous run, so
+        rerunning the graph gives the same posteriors."""
+        for factors in (self.prior_factors, self.perf_factors,
+                        self.team_factors, self.game_factors,
+                        self.truncate_factors):
+            for factor in factors:
+                for var in factor.vars:
+                    var.messages[factor] = Gaussian()
+                    var.pi = var.tau = 0
 
     def _run(self):
         """Run the built factor graph and update skills with posteriors using
         the schedule described in the original paper."""
+        if self._ran:
+            self._reset()
+        self._ran = True
+        stats = self.stats = GameStats()
+        stats.start("prior")
         for factor in self.prior_factors:
             factor.down()
+        stats.start("performance")
         for factor in self.perf_factors:
             factor.down()
+        stats.start("team")
         for factor in self.team_factors:
             factor.down()
+        stats.start("game")
         if len(self.teams) > 2:
             # iterate till approximate game outcome marginals don't change
             while True:
                 delta = 0
                 for i in range(len(self.game_factors)-1):
                     self.game_factors[i].down()
-                    delta = max(delta, self.truncate_factors[i].up())
+                    delta = max(delta, self.truncate_factors[i].up(True))
                     self.game_factors[i].up(1)
                     self.game_factors[i+1].down()
-                    delta = max(delta, self.truncate_factors[i+1].up())
+                    delta = max(delta, self.truncate_factors[i+1].up(True))
                     self.game_factors[i+1].up(0)
+                stats.sweeps += 1
+                stats.delta = delta
                 if delta <= self.delta:
                     break
+                if stats.sweeps >= self.max_iterations:
+                    stats.converged = False
+                    break
         else:
             self.game_factors[0].down()
-            self.truncate_factors[0].up()
+            stats.delta = self.truncate_factors[0].up()
+            stats.sweeps = 1
         self.game_factors[0].up(0)
         self.game_factors[-1].up(1)
+        stats.start("team")
         for team_factor in self.team_factors:
             # no. of player variables = total variables - team variable
             num_players = len(team_factor.vars) - 1
             for player_num in range(num_players):
                 team_factor.up(player_num)
+        stats.start("performance")
         for perf_factor in self.perf_factors:
             perf_factor.up()
+        stats.stop()
 
     def update_ratings(self):
         self._run()  # run the message passing algorithm
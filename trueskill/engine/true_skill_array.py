@@ -0,0 +1,181 @@
+from typing import List, Dict, Tuple, Sequence
+import numpy as np
+from trueskill.utils.maths import Gaussian, game_draw_margins, \
+    partial_play_coeffs
+from trueskill.utils.constants import DYNAMIC_FACTOR, PERFORMANCE_NOISE, \
+    DELTA, MAX_ITERATIONS, DAMPING, DRAW_PROBABILITY
+from trueskill.engine.compiled_graph import MessageState
+from trueskill.engine.convergence import GameStats
+
+
+def run_array_graph(prior_pi: np.ndarray, prior_tau: np.ndarray,
+                    team_sizes: Sequence[int], coeffs: np.ndarray = None,
+                    dynamics=DYNAMIC_FACTOR,
+                    perf_noise_sigma=PERFORMANCE_NOISE,
+                    delta=DELTA, max_iterations=MAX_ITERATIONS,
+                    damping=DAMPING, stats: GameStats = None,
+                    truncations: List[Tuple[float, bool]] = None) \
+        -> Tuple[np.ndarray, np.ndarray]:
+    """Runs the TrueSkill factor graph for one game on NumPy arrays.
+
+    The prior, performance and team sum layers are computed for all players
+    at once over the team segments, only the chain of game factors between
+    neighbouring teams is run in Python. The schedule is the same as
+    TrueSkillEnv._run.
+
+    Args:
+        prior_pi: Precision of each player's skill, teams in ranked order.
+        prior_tau: Precision adjusted mean of each player's skill.
+        team_sizes: The number of players in each team, in ranked order.
+        coeffs: The coefficient of each player in their team sum, defaults
+        to one for everyone.
+        dynamics: The standard deviation on the prior skill.
+        perf_noise_sigma: The standard deviation of the performance noise.
+        delta: Convergence threshold for games of more than two teams.
+        max_iterations: The most sweeps over the game factors.
+        damping: Fraction of the previous truncate message kept.
+        stats: Records the sweeps, final delta and layer times.
+        truncations: The (draw margin, drawn) of each pair of neighbouring
+        teams, see game_draw_margins.
+    Returns:
+        The posterior pi and tau arrays of the players.
+    """
+    num_teams = len(team_sizes)
+    if num_teams < 2:
+        raise ValueError("Need at least two teams in the game!")
+    prior_pi = np.asarray(prior_pi, dtype=float)
+    prior_tau = np.asarray(prior_tau, dtype=float)
+    if coeffs is None:
+        coeffs = np.ones_like(prior_pi)
+    if stats is None:
+        stats = GameStats()
+    offsets = np.concatenate(([0], np.cumsum(team_sizes)[:-1]))
+    team_index = np.repeat(np.arange(num_teams), team_sizes)
+
+    # priors and performances down
+    stats.start("prior")
+    skill_pi = 1 / (1 / prior_pi + dynamics ** 2)
+    skill_tau = prior_tau
+    stats.start("performance")
+    a = 1 / (1 + perf_noise_sigma ** 2 * skill_pi)
+    perf_pi = a * skill_pi
+    perf_tau = a * skill_tau
+
+    # team performances down, the team variance and mean are sums over the
+    # team segments of each player's contribution
+    stats.start("team")
+    var_terms = coeffs ** 2 / perf_pi
+    mean_terms = coeffs * perf_tau / perf_pi
+    team_var = np.add.reduceat(var_terms, offsets)
+    team_mean = np.add.reduceat(mean_terms, offsets)
+    team_pi = 1.0 / team_var
+    team_tau = team_pi * team_mean
+
+    # the game chain runs on team level variables: team j is variable j and
+    # the message from its team sum factor is on edge j, difference i is
+    # variable num_teams + i
+    stats.start("game")
+    state = MessageState(2 * num_teams - 1, 5 * num_teams - 4)
+    for j in range(num_teams):
+        state.update_message(j, j, float(team_pi[j]), float(team_tau[j]))
+    game_factors = [((num_teams + i, num_teams + 3 * i),
+                     (i, num_teams + 3 * i + 1),
+                     (i + 1, num_teams + 3 * i + 2))
+                    for i in range(num_teams - 1)]
+    truncate_edges = [4 * num_teams - 3 + i for i in range(num_teams - 1)]
+    state.run_game_chain(game_factors, truncate_edges, delta, max_iterations,
+                         damping, stats, truncations)
+    team_cavity_pi = (np.array(state.var_pi[:num_teams]) -
+                      np.array(state.msg_pi[:num_teams]))
+    team_cavity_tau = (np.array(state.var_tau[:num_teams]) -
+                       np.array(state.msg_tau[:num_teams]))
+    # a uniform message from the game layer, see SumFactor._update_helper,
+    # has infinite variance and sends uniform messages on to the players
+    known = team_cavity_pi != 0
+    team_cavity_var = np.divide(1, team_cavity_pi,
+                                out=np.full(num_teams, np.inf), where=known)
+    team_cavity_mean = np.divide(team_cavity_tau, team_cavity_pi,
+                                 out=np.zeros(num_teams), where=known)
+
+    # team performances up, each player's message leaves out their own
+    # contribution to the team sums
+    stats.start("team")
+    others_var = team_var[team_index] - var_terms
+    others_mean = team_mean[team_index] - mean_terms
+    up_pi = coeffs ** 2 / (others_var + team_cavity_var[team_index])
+    up_tau = up_pi * (team_cavity_mean[team_index] - others_mean) / coeffs
+
+    # performances and skills up
+    stats.start("performance")
+    a = 1 / (1 + perf_noise_sigma ** 2 * up_pi)
+    posterior = skill_pi + a * up_pi, skill_tau + a * up_tau
+    stats.stop()
+    return posterior
+
+
+class ArrayTrueSkillEnv:
+    def __init__(self, teams: List[Dict[str, Gaussian]],
+                 dynamics=DYNAMIC_FACTOR,
+                 perf_noise_sigma=PERFORMANCE_NOISE,
+                 delta=DELTA,
+                 max_iterations=MAX_ITERATIONS,
+                 damping=DAMPING,
+                 ranks: List[int] = None,
+                 draw_probability=DRAW_PROBABILITY,
+                 weights: Dict[str, float] = None):
+        """Drop in replacement for TrueSkillEnv which holds the players in
+        NumPy arrays, for games with many players such as battle royales.
+
+        Args:
+            teams: List of the team skills sorted in the order they ranked.
+            dynamics: The standard deviation on the prior skill which allows
+            the skill to vary over time.
+            perf_noise_sigma: The standard deviation of the performance noise.
+            delta: The minimum difference two marginals have to satisfy to be
+            considered approximately equal (for the approximation of game
+            marginals.)
+            max_iterations: The most sweeps over the game factors for games
+            of more than two teams, even if they haven't converged.
+            damping: Fraction of the previous truncate factor message kept
+            at each update, to stop the sweeps from oscillating.
+            ranks: The rank of each team, in the order of teams. Teams with
+            the same rank drew, by default every team beat the next one.
+            draw_probability: The probability of a draw between two evenly
+            matched teams, it must be above zero if any teams drew.
+            weights: The fraction of the game played by players who joined
+            late or left early, keyed by player. Players not in it played
+            the whole game.
+        Raises:
+            ValueError: If teams drew with a zero draw probability.
+        """
+        self.dynamics = dynamics
+        self.perf_sigma = perf_noise_sigma
+        self.delta = delta
+        self.max_iterations = max_iterations
+        self.damping = damping
+        self.stats = GameStats()
+        self.teams = teams
+        self.draw_margins = game_draw_margins([len(team) for team in teams],
+                                              ranks, draw_probability,
+                                              perf_noise_sigma)
+        self.coeffs = partial_play_coeffs(
+            [player for team in teams for player in team], weights)
+
+    def update_ratings(self):
+        names = [player for team in self.teams for player in team]
+        prior_pi = np.array([team[p].pi for team in self.teams for p in team],
+                            dtype=float)
+        prior_tau = np.array([team[p].tau for team in self.teams
+                              for p in team], dtype=float)
+        self.stats = GameStats()
+        pi, tau = run_array_graph(prior_pi, prior_tau,
+                                  [len(team) for team in self.teams],
+                                  dynamics=self.dynamics,
+                                  perf_noise_sigma=self.perf_sigma,
+                                  delta=self.delta,
+                                  max_iterations=self.max_iterations,
+                                  damping=self.damping, stats=self.stats,
+                                  truncations=self.draw_margins,
+                                  coeffs=np.array(self.coeffs))
+        return {name: Gaussian(pi=float(pi[i]), tau=float(tau[i]))
+                for i, name in enumerate(names)}
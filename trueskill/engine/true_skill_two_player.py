@@ -1,12 +1,16 @@
 import math
 from typing import Tuple
-from trueskill.utils.maths import v_truncate, w_truncate, Gaussian
-from trueskill.utils.constants import PERFORMANCE_NOISE, DYNAMIC_FACTOR
+from trueskill.utils.maths import v_truncate, w_truncate, Gaussian, \
+    v_truncate_draw, w_truncate_draw, draw_margin
+from trueskill.utils.constants import PERFORMANCE_NOISE, DYNAMIC_FACTOR, \
+    DRAW_PROBABILITY
 
 
 def update_rating(winner: Gaussian, loser: Gaussian,
                   perf_noise_sigma=PERFORMANCE_NOISE,
-                  dynamics_factor=DYNAMIC_FACTOR) -> Tuple[Gaussian, Gaussian]:
+                  dynamics_factor=DYNAMIC_FACTOR, drawn=False,
+                  draw_probability=DRAW_PROBABILITY) \
+        -> Tuple[Gaussian, Gaussian]:
     """Updates the skills of two players in a 1vs1 match.
 
     Args:
@@ -15,6 +19,10 @@ def update_rating(winner: Gaussian, loser: Gaussian,
         perf_noise_sigma: The standard devication of the performance noise.
         dynamics_factor: The standard deviation of the dynamics factor on the
         prior skill which allows uncertainty in skill to vary over time.
+        drawn: Whether the match was a draw, in which case it doesn't matter
+        which player is the winner.
+        draw_probability: The probability of a draw between two evenly
+        matched players, it must be above zero for a draw.
 
     Returns:
         Two new Gaussian objects containing the updated winner skill and
@@ -30,8 +38,13 @@ def update_rating(winner: Gaussian, loser: Gaussian,
     delta_mu = winning_mu - losing_mu
 
     # calculate the additive and multiplicative correction factors
-    v_game = v_truncate(delta_mu / c)
-    w_game = w_truncate(delta_mu / c)
+    margin = draw_margin(draw_probability, perf_noise_sigma, 2) / c
+    if drawn:
+        v_game = v_truncate_draw(delta_mu / c, margin)
+        w_game = w_truncate_draw(delta_mu / c, margin)
+    else:
+        v_game = v_truncate(delta_mu / c - margin)
+        w_game = w_truncate(delta_mu / c - margin)
 
     # update the winner
     mu_multiplier = winner_adjusted_var / c
@@ -1,13 +1,17 @@
 import math
 from typing import Dict
-from trueskill.utils.maths import v_truncate, w_truncate, Gaussian
-from trueskill.utils.constants import PERFORMANCE_NOISE, DYNAMIC_FACTOR
+from trueskill.utils.maths import v_truncate, w_truncate, Gaussian, \
+    v_truncate_draw, w_truncate_draw, draw_margin, partial_play_coeffs
+from trueskill.utils.constants import PERFORMANCE_NOISE, DYNAMIC_FACTOR, \
+    DRAW_PROBABILITY
 
 
 def update_ratings_in_team(winning_team: Dict[str, Gaussian],
                            losing_team: Dict[str, Gaussian],
                            perf_noise_sigma=PERFORMANCE_NOISE,
-                           dynamics_factor=DYNAMIC_FACTOR):
+                           dynamics_factor=DYNAMIC_FACTOR, drawn=False,
+                           draw_probability=DRAW_PROBABILITY,
+                           weights: Dict[str, float] = None):
     """Does TrueSkill update for players in a two team game.
 
     Args:
@@ -16,26 +20,45 @@ def update_ratings_in_team(winning_team: Dict[str, Gaussian],
         perf_noise_sigma: Standard deviation of the performance noise
         dynamics_factor: Additional factor which allows uncertainty in skill
         to vary over time
+        drawn: Whether the game was a draw, in which case it doesn't matter
+        which team is the winner.
+        draw_probability: The probability of a draw between two evenly
+        matched teams, it must be above zero for a draw.
+        weights: The fraction of the game played by players who joined late
+        or left early, keyed by player. Players not in it played the whole
+        game.
     """
     total_players = len(winning_team) + len(losing_team)
+    players = list(winning_team) + list(losing_team)
+    coeffs = dict(zip(players, partial_play_coeffs(players, weights)))
 
-    winning_mu = sum(winning_team[p].mu for p in winning_team)
-    losing_mu = sum(losing_team[p].mu for p in losing_team)
+    winning_mu = sum(coeffs[p] * winning_team[p].mu for p in winning_team)
+    losing_mu = sum(coeffs[p] * losing_team[p].mu for p in losing_team)
     delta_mu = winning_mu - losing_mu
-    c = math.sqrt(sum(winning_team[p].sigma**2 for p in winning_team) +
-                  sum(losing_team[p].sigma**2 for p in losing_team) +
-                  total_players * perf_noise_sigma ** 2)
+    # each player's performance noise counts with their weight too
+    c = math.sqrt(sum(coeffs[p] ** 2 * (winning_team[p].sigma**2 +
+                                        perf_noise_sigma ** 2)
+                      for p in winning_team) +
+                  sum(coeffs[p] ** 2 * (losing_team[p].sigma**2 +
+                                        perf_noise_sigma ** 2)
+                      for p in losing_team))
 
     # compute the additive and multiplicative correction factors
-    v_game = v_truncate(delta_mu / c)
-    w_game = w_truncate(delta_mu / c)
+    margin = draw_margin(draw_probability, perf_noise_sigma,
+                         total_players) / c
+    if drawn:
+        v_game = v_truncate_draw(delta_mu / c, margin)
+        w_game = w_truncate_draw(delta_mu / c, margin)
+    else:
+        v_game = v_truncate(delta_mu / c - margin)
+        w_game = w_truncate(delta_mu / c - margin)
 
     # update the winning teams skills in place
     for player in winning_team:
         skill = winning_team[player]
         adjusted_var = skill.sigma ** 2 + dynamics_factor ** 2
-        mu_multiplier = adjusted_var / c
-        sigma_multiplier = adjusted_var / c**2
+        mu_multiplier = coeffs[player] * adjusted_var / c
+        sigma_multiplier = coeffs[player] ** 2 * adjusted_var / c**2
         mu = skill.mu + mu_multiplier * v_game
         sigma = math.sqrt(adjusted_var * (1-w_game*sigma_multiplier))
         winning_team[player] = Gaussian(mu=mu, sigma=sigma)
@@ -44,8 +67,8 @@ def update_ratings_in_team(winning_team: Dict[str, Gaussian],
     for player in losing_team:
         skill = losing_team[player]
         adjusted_var = skill.sigma ** 2 + dynamics_factor ** 2
-        mu_multiplier = adjusted_var / c
-        sigma_multiplier = adjusted_var / c**2
+        mu_multiplier = coeffs[player] * adjusted_var / c
+        sigma_multiplier = coeffs[player] ** 2 * adjusted_var / c**2
         mu = skill.mu - mu_multiplier * v_game
         sigma = math.sqrt(adjusted_var * (1-w_game*sigma_multiplier))
         losing_team[player] = Gaussian(mu=mu, sigma=sigma)
@@ -0,0 +1,207 @@
+import math
+from typing import Tuple
+import numpy as np
+from scipy.special import erfcx
+from trueskill.utils.constants import PERFORMANCE_NOISE, DYNAMIC_FACTOR, \
+    MIN_WEIGHT, SIGMA, TIME_DECAY, TIME_UNIT
+
+_SQRT_2 = math.sqrt(2)
+_SQRT_2_OVER_PI = math.sqrt(2 / math.pi)
+
+
+def v_truncate(x: np.ndarray) -> np.ndarray:
+    """Array version of maths.v_truncate.
+
+    pdf(x) / cdf(x) is rewritten with the scaled complementary error
+    function so that it stays finite for large negative x.
+    """
+    return _SQRT_2_OVER_PI / erfcx(-x / _SQRT_2)
+
+
+def w_truncate(x: np.ndarray) -> np.ndarray:
+    """Array version of maths.w_truncate."""
+    v = v_truncate(x)
+    return v * (x + v)
+
+
+def _weights(mask: np.ndarray, weights: np.ndarray = None) -> np.ndarray:
+    """The team sum coefficient of every slot, zero for padded slots."""
+    if weights is None:
+        return mask.astype(float)
+    weights = np.maximum(np.asarray(weights, dtype=float), MIN_WEIGHT)
+    return np.where(mask, weights, 0.0)
+
+
+def decay_variance(var: np.ndarray, elapsed: np.ndarray = None,
+                   time_decay=TIME_DECAY, time_unit=TIME_UNIT) -> np.ndarray:
+    """Array version of maths.decay_rating on the variances of ratings.
+
+    Args:
+        var: The variance of each rating.
+        elapsed: Time since each player's last game, zero or None for no
+        decay.
+        time_decay: Standard deviation of the skill drift per time_unit.
+        time_unit: The time over which the skill drifts by time_decay.
+    Returns:
+        The decayed variances.
+    """
+    if elapsed is None or time_decay <= 0:
+        return var
+    elapsed = np.maximum(np.asarray(elapsed, dtype=float), 0)
+    return np.minimum(var + time_decay ** 2 * elapsed / time_unit,
+                      np.maximum(var, SIGMA ** 2))
+
+
+def update_rating_arrays(winner_mu: np.ndarray, winner_sigma: np.ndarray,
+                         loser_mu: np.ndarray, loser_sigma: np.ndarray,
+                         perf_noise_sigma=PERFORMANCE_NOISE,
+                         dynamics_factor=DYNAMIC_FACTOR,
+                         winner_elapsed: np.ndarray = None,
+                         loser_elapsed: np.ndarray = None,
+                         time_decay=TIME_DECAY, time_unit=TIME_UNIT) \
+        -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Updates the skills of the two players in many 1vs1 matches at once.
+
+    Element i of every array describes the i-th game, the games must be
+    independent of each other (no player in more than one game).
+
+    Args:
+        winner_mu: Mean skill of the winner of each game.
+        winner_sigma: Standard deviation of the skill of each winner.
+        loser_mu: Mean skill of the loser of each game.
+        loser_sigma: Standard deviation of the skill of each loser.
+        perf_noise_sigma: The standard deviation of the performance noise.
+        dynamics_factor: The standard deviation of the dynamics factor on the
+        prior skill which allows uncertainty in skill to vary over time.
+        winner_elapsed: Time since each winner's last game, the ratings are
+        first decayed by it as with decay_variance.
+        loser_elapsed: Time since each loser's last game.
+        time_decay: Standard deviation of the skill drift per time_unit.
+        time_unit: The time over which the skill drifts by time_decay.
+
+    Returns:
+        The updated winner mu, winner sigma, loser mu and loser sigma arrays.
+    """
+    winner_mu = np.asarray(winner_mu, dtype=float)
+    winner_var = decay_variance(
+        np.square(np.asarray(winner_sigma, dtype=float)), winner_elapsed,
+        time_decay, time_unit)
+    loser_mu = np.asarray(loser_mu, dtype=float)
+    loser_var = decay_variance(
+        np.square(np.asarray(loser_sigma, dtype=float)), loser_elapsed,
+        time_decay, time_unit)
+
+    c = np.sqrt(winner_var + loser_var + 2 * perf_noise_sigma ** 2)
+    winner_adjusted_var = winner_var + dynamics_factor ** 2
+    loser_adjusted_var = loser_var + dynamics_factor ** 2
+
+    # calculate the additive and multiplicative correction factors
+    t = (winner_mu - loser_mu) / c
+    v_game = v_truncate(t)
+    w_game = w_truncate(t)
+
+    new_winner_mu = winner_mu + winner_adjusted_var / c * v_game
+    new_winner_sigma = np.sqrt(winner_adjusted_var *
+                               (1 - w_game * winner_adjusted_var / c**2))
+    new_loser_mu = loser_mu - loser_adjusted_var / c * v_game
+    new_loser_sigma = np.sqrt(loser_adjusted_var *
+                              (1 - w_game * loser_adjusted_var / c**2))
+    return new_winner_mu, new_winner_sigma, new_loser_mu, new_loser_sigma
+
+
+def update_ratings_in_team_arrays(winning_mu: np.ndarray,
+                                  winning_sigma: np.ndarray,
+                                  winning_mask: np.ndarray,
+                                  losing_mu: np.ndarray,
+                                  losing_sigma: np.ndarray,
+                                  losing_mask: np.ndarray,
+                                  perf_noise_sigma=PERFORMANCE_NOISE,
+                                  dynamics_factor=DYNAMIC_FACTOR,
+                                  winning_weights: np.ndarray = None,
+                                  losing_weights: np.ndarray = None,
+                                  winning_elapsed: np.ndarray = None,
+                                  losing_elapsed: np.ndarray = None,
+                                  time_decay=TIME_DECAY,
+                                  time_unit=TIME_UNIT) \
+        -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Does the TrueSkill update for the players in many two team games.
+
+    Teams are given as padded matrices with one row per game and one column
+    per player slot, the masks are True where a slot holds a player. Padded
+    slots are returned unchanged.
+
+    Partial play weights are given as matrices of the same shape, see
+    update_ratings_in_team. The padded slots are ignored as with the mask,
+    and zero weights are raised to MIN_WEIGHT.
+
+    Args:
+        winning_mu: Mean skills of the winning team in each game.
+        winning_sigma: Skill standard deviations of the winning team.
+        winning_mask: Which slots of the winning team hold a player.
+        losing_mu: Mean skills of the losing team in each game.
+        losing_sigma: Skill standard deviations of the losing team.
+        losing_mask: Which slots of the losing team hold a player.
+        perf_noise_sigma: Standard deviation of the performance noise
+        dynamics_factor: Additional factor which allows uncertainty in skill
+        to vary over time
+        winning_weights: Partial play weights of the winning team, defaults
+        to one for every player.
+        losing_weights: Partial play weights of the losing team.
+        winning_elapsed: Time since the last game of each player of the
+        winning team, the ratings are first decayed by it as with
+        decay_variance.
+        losing_elapsed: Time since the last game of each player of the
+        losing team.
+        time_decay: Standard deviation of the skill drift per time_unit.
+        time_unit: The time over which the skill drifts by time_decay.
+
+    Returns:
+        The updated winning mu, winning sigma, losing mu and losing sigma
+        matrices.
+    """
+    winning_mask = np.asarray(winning_mask, dtype=bool)
+    losing_mask = np.asarray(losing_mask, dtype=bool)
+    winning_mu = np.asarray(winning_mu, dtype=float)
+    winning_var = np.square(np.asarray(winning_sigma, dtype=float))
+    losing_mu = np.asarray(losing_mu, dtype=float)
+    losing_var = np.square(np.asarray(losing_sigma, dtype=float))
+    # padded slots keep their variance, they are returned unchanged
+    winning_var = np.where(winning_mask,
+                           decay_variance(winning_var, winning_elapsed,
+                                          time_decay, time_unit),
+                           winning_var)
+    losing_var = np.where(losing_mask,
+                          decay_variance(losing_var, losing_elapsed,
+                                         time_decay, time_unit),
+                          losing_var)
+
+    # with every weight one these are the masks, so the sums below reduce
+    # to the unweighted update
+    winning_weights = _weights(winning_mask, winning_weights)
+    losing_weights = _weights(losing_mask, losing_weights)
+    delta_mu = ((winning_weights * winning_mu).sum(axis=1) -
+                (losing_weights * losing_mu).sum(axis=1))
+    noise = perf_noise_sigma ** 2
+    c = np.sqrt((winning_weights ** 2 * (winning_var + noise)).sum(axis=1) +
+                (losing_weights ** 2 * (losing_var + noise)).sum(axis=1))
+
+    # compute the additive and multiplicative correction factors
+    t = delta_mu / c
+    v_game = v_truncate(t)[:, None]
+    w_game = w_truncate(t)[:, None]
+    c = c[:, None]
+
+    def _update(mu, var, mask, weights, sign):
+        adjusted_var = var + dynamics_factor ** 2
+        new_mu = mu + sign * weights * adjusted_var / c * v_game
+        new_var = adjusted_var * (1 - w_game * weights ** 2 *
+                                  adjusted_var / c**2)
+        return (np.where(mask, new_mu, mu),
+                np.sqrt(np.where(mask, new_var, var)))
+
+    new_winning_mu, new_winning_sigma = _update(winning_mu, winning_var,
+                                                winning_mask, winning_weights,
+                                                1)
+    new_losing_mu, new_losing_sigma = _update(losing_mu, losing_var,
+                                              losing_mask, losing_weights, -1)
+    return new_winning_mu, new_winning_sigma, new_losing_mu, new_losing_sigma
@@ -1,16 +1,29 @@
-from trueskill.utils.calculate_ratings import calculate_skill
-from trueskill.utils.constants import DYNAMIC_FACTOR, PERFORMANCE_NOISE
+from trueskill.utils.calculate_ratings import calculate_skill, \
+    calculate_skills_batch, calculate_skills_stream, calculate_skills_smoothed
+from trueskill.utils.constants import DYNAMIC_FACTOR, PERFORMANCE_NOISE, \
+    DRAW_PROBABILITY, TIME_DECAY
+from trueskill.engine.convergence import ConvergenceHistogram
+from trueskill.engine.instrumentation import Instrumentation
 import argparse
+import time
 
 
 def parse_args():
     parser = argparse.ArgumentParser()
     parser.add_argument("-r", "--ranks", type=int,  nargs='+',
-                        help="Team rankings.", required=True)
-    parser.add_argument("-g", "--game-info", type=str, required=True,
+                        help="Team rankings. Required with --game-info.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("-g", "--game-info", type=str,
                         help="Path to game info CSV file. Rows in the CSV "
                              "represent teams,  and values in the row will be"
                              " interpreted as the player identifiers.")
+    source.add_argument("-m", "--match-log", type=str,
+                        help="Path to a JSON Lines match log where every line"
+                             " is a game, e.g. {\"teams\": [[\"a\", \"b\"],"
+                             " [\"c\"]], \"ranks\": [1, 2], \"timestamp\": "
+                             "1600000000}. All games are rated in "
+                             "chronological order and the ratings are saved "
+                             "once at the end.")
     parser.add_argument("-d", "--save-dir", type=str, required=False,
                         help="Path to the directory where true skill ratings"
                              "for players are saved in the true_skills.csv "
@@ -25,13 +38,134 @@ def parse_args():
     parser.add_argument("--perf-noise", type=float, required=False,
                         default=PERFORMANCE_NOISE,
                         help="Standard deviation of the performance noise.")
-    return parser.parse_args()
+    parser.add_argument("--draw-probability", type=float, required=False,
+                        default=DRAW_PROBABILITY,
+                        help="Probability of a draw between two evenly "
+                             "matched teams. Teams with the same rank drew, "
+                             "which needs a draw probability above zero.")
+    parser.add_argument("--weights", type=str, nargs='+', required=False,
+                        metavar="PLAYER=WEIGHT",
+                        help="With --game-info, the fraction of the game "
+                             "played by players who joined late or left "
+                             "early, e.g. --weights bob=0.5. Match logs give "
+                             "these per game.")
+    parser.add_argument("--time-decay", type=float, required=False,
+                        default=TIME_DECAY,
+                        help="Standard deviation of the drift of a player's "
+                             "skill per day without playing. Ratings are "
+                             "widened by it when read for a game, using the "
+                             "time of the player's last game. Match logs "
+                             "need timestamps for this.")
+    parser.add_argument("--timestamp", type=float, required=False,
+                        help="With --game-info, when the game was played in "
+                             "seconds since the epoch. Defaults to now.")
+    parser.add_argument("--convergence-histogram", type=str, required=False,
+                        help="With --match-log, path of a JSON file to write "
+                             "a histogram of the number of sweeps each game "
+                             "needed to converge, and percentiles of the "
+                             "final delta and time of the games.")
+    parser.add_argument("--skip-bad-games", action='store_true',
+                        help="With --match-log, print and skip games that "
+                             "fail to be rated instead of stopping at the "
+                             "first one. The games rated before a failure "
+                             "are saved either way.")
+    parser.add_argument("--stream", action='store_true',
+                        help="With --match-log, read the games lazily "
+                             "instead of loading the whole log, for logs too "
+                             "large for memory. The log may be JSON Lines or "
+                             "CSV, optionally gzip compressed, and must be in "
+                             "chronological order.")
+    parser.add_argument("--checkpoint-every", type=int, default=10000,
+                        help="With --stream, save the ratings every this "
+                             "many games.")
+    parser.add_argument("--start", type=int, default=0,
+                        help="With --stream, skip this many games, to resume "
+                             "from the last checkpoint.")
+    parser.add_argument("--smooth", action='store_true',
+                        help="With --match-log, re-rate the whole history "
+                             "with TrueSkill Through Time smoothing, so early "
+                             "games use the evidence of later ones. The log "
+                             "must be in chronological order and hold the "
+                             "players' whole history.")
+    parser.add_argument("--smooth-tolerance", type=float, default=1e-4,
+                        help="With --smooth, stop once no skill changes by "
+                             "more than this in an iteration.")
+    parser.add_argument("--smooth-iterations", type=int, default=30,
+                        help="With --smooth, the most iterations.")
+    parser.add_argument("--profile", type=str, required=False,
+                        help="Path to write the call counts and timings of "
+                             "the factor graph methods and schedule phases "
+                             "to, as Prometheus text for a .prom file, JSON "
+                             "for .json and a cProfile report for pstats or "
+                             "snakeviz otherwise. Games rated in --workers "
+                             "processes are not counted.")
+    parser.add_argument("-w", "--workers", type=int, required=False,
+                        help="With --match-log, rate games that share no "
+                             "players in parallel on this many processes.")
+    args = parser.parse_args()
+    if args.game_info and not args.ranks:
+        parser.error("--ranks is required with --game-info.")
+    if args.weights:
+        try:
+            args.weights = {player: float(weight) for player, weight in
+                            (entry.rsplit("=", 1) for entry in args.weights)}
+        except ValueError:
+            parser.error("--weights must be given as PLAYER=WEIGHT.")
+    return args
+
+
+def print_skipped_game(game, error):
+    print(f"skipped: game on line {game.line_num}: {error}", flush=True)
 
 
 if __name__ == '__main__':
     args = parse_args()
-    calculate_skill(args.game_info, args.ranks, save_dir=args.save_dir,
-                    dynamic=args.dynamic,  perf_noise=args.perf_noise)
+    on_error = print_skipped_game if args.skip_bad_games else None
+    instrumentation = Instrumentation() if args.profile else None
+    if instrumentation is not None:
+        instrumentation.enable()
+    if args.match_log and args.smooth:
+        calculate_skills_smoothed(
+            args.match_log, save_dir=args.save_dir, dynamic=args.dynamic,
+            perf_noise=args.perf_noise,
+            draw_probability=args.draw_probability,
+            tolerance=args.smooth_tolerance,
+            max_iterations=args.smooth_iterations,
+            on_iteration=lambda stats: print(
+                f"iteration: step {stats.step:.6f}, {stats.seconds:.3f}s, "
+                f"{stats.unconverged_games} games not converged",
+                flush=True))
+    elif args.match_log and args.stream:
+        calculate_skills_stream(
+            args.match_log, save_dir=args.save_dir, dynamic=args.dynamic,
+            perf_noise=args.perf_noise,
+            checkpoint_every=args.checkpoint_every, start=args.start,
+            on_checkpoint=lambda n: print(f"checkpoint: {n} games rated",
+                                          flush=True),
+            draw_probability=args.draw_probability,
+            time_decay=args.time_decay, on_error=on_error)
+    elif args.match_log:
+        convergence = ConvergenceHistogram()
+        timings = calculate_skills_batch(
+            args.match_log, save_dir=args.save_dir, dynamic=args.dynamic,
+            perf_noise=args.perf_noise, convergence=convergence,
+            workers=args.workers, draw_probability=args.draw_probability,
+            time_decay=args.time_decay, on_error=on_error)
+        for phase, seconds in timings.items():
+            print(f"{phase}: {seconds:.3f}s")
+        if args.convergence_histogram:
+            convergence.save(args.convergence_histogram)
+    else:
+        calculate_skill(args.game_info, args.ranks, save_dir=args.save_dir,
+                        dynamic=args.dynamic,  perf_noise=args.perf_noise,
+                        draw_probability=args.draw_probability,
+                        weights=args.weights,
+                        timestamp=(time.time() if args.timestamp is None
+                                   else args.timestamp),
+                        time_decay=args.time_decay)
+    if instrumentation is not None:
+        instrumentation.disable()
+        instrumentation.save(args.profile)
 
 
 
@@ -0,0 +1,227 @@
+import argparse
+import asyncio
+import json
+import signal
+import time
+from typing import List, Dict
+from trueskill.data.game import Game, validate_teams, validate_ranks, \
+    validate_weights
+from trueskill.data.player_ratings import CsvSource, DataSource
+from trueskill.utils.calculate_ratings import _rate_game
+from trueskill.utils.constants import DYNAMIC_FACTOR, PERFORMANCE_NOISE, \
+    DRAW_PROBABILITY, TIME_DECAY
+
+
+class RatingServer:
+    """Long running rating service speaking JSON Lines.
+
+    Every request line is a game, e.g. {"id": 7, "teams": [["a"], ["b"]],
+    "ranks": [1, 2]}, optionally with partial play "weights" and a
+    "timestamp" as in the match log, the time it arrived otherwise, and is
+    answered with the new ratings of its players,
+    {"id": 7, "ratings": {"a": [mu, sigma], "b": [mu, sigma]}}, or with
+    {"id": 7, "error": "..."} if the game is invalid. Requests on a
+    connection can be pipelined, responses come back in request order.
+
+    All games go through one queue drained by a single batch worker, which
+    makes the updates to each player's rating happen in arrival order. The
+    worker takes up to max_batch games that arrived within max_delay seconds
+    of each other, loads their players with one load_many, rates them in
+    order on a worker thread and writes them back with one bulk update.
+
+    Attributes:
+        games: Games rated so far.
+        batches: Micro-batches rated so far.
+    """
+    def __init__(self, data_src: DataSource, dynamic=DYNAMIC_FACTOR,
+                 perf_noise=PERFORMANCE_NOISE, max_batch=256,
+                 max_delay=0.002, save_every=10000,
+                 draw_probability=DRAW_PROBABILITY, time_decay=TIME_DECAY):
+        self.data_src = data_src
+        self.dynamic = dynamic
+        self.perf_noise = perf_noise
+        self.draw_probability = draw_probability
+        self.time_decay = time_decay
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.save_every = save_every
+        self.games = 0
+        self.batches = 0
+        self._unsaved = 0
+        self._queue = None
+        self._worker = None
+        self._server = None
+
+    async def start(self, host='127.0.0.1', port=0, path=None):
+        """Starts listening on a TCP port, or on a Unix socket if path is
+        given, and returns the asyncio server."""
+        self._queue = asyncio.Queue()
+        self._worker = asyncio.create_task(self._batch_worker())
+        if path is not None:
+            self._server = await asyncio.start_unix_server(self._handle, path)
+        else:
+            self._server = await asyncio.start_server(self._handle, host,
+                                                      port)
+        return self._server
+
+    async def close(self):
+        """Stops accepting games, rates the ones queued and saves."""
+        if self._worker is None:
+            return
+        self._server.close()
+        await self._server.wait_closed()
+        await self._queue.join()
+        self._worker.cancel()
+        self._worker = None
+        self.data_src.save_player_ratings()
+
+    async def _handle(self, reader: asyncio.StreamReader,
+                      writer: asyncio.StreamWriter):
+        responses = asyncio.Queue()
+        responder = asyncio.create_task(self._respond(responses, writer))
+        try:
+            async for line in reader:
+                if line.strip():
+                    responses.put_nowait(self._submit(line))
+        finally:
+            responses.put_nowait(None)
+            await responder
+
+    def _submit(self, line: bytes) -> asyncio.Future:
+        """Validates a request and queues its game, returns a future for
+        the response."""
+        response = asyncio.get_running_loop().create_future()
+        request_id = None
+        try:
+            request = json.loads(line)
+            request_id = request.get("id")
+            game = Game(request["teams"], request["ranks"],
+                        timestamp=float(request.get("timestamp",
+                                                    time.time())),
+                        weights=request.get("weights"))
+            validate_teams(game.teams)
+            validate_ranks(game.teams, game.ranks)
+            if game.weights is not None:
+                validate_weights(game.teams, game.weights)
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            response.set_result({"id": request_id, "error": str(e)})
+            return response
+        self._queue.put_nowait((request_id, game, response))
+        return response
+
+    async def _respond(self, responses: asyncio.Queue,
+                       writer: asyncio.StreamWriter):
+        while True:
+            response = await responses.get()
+            if response is None:
+                break
+            writer.write(json.dumps(await response).encode() + b'\n')
+            await writer.drain()
+        writer.close()
+
+    async def _batch_worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_delay
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(),
+                                                        timeout))
+                except asyncio.TimeoutError:
+                    break
+            try:
+                results = await loop.run_in_executor(
+                    None, self._rate_batch, [game for _, game, _ in batch])
+            except Exception as e:
+                # e.g. the data source failed, every game in the batch fails
+                results = [{"error": str(e)}] * len(batch)
+            for (request_id, _, response), result in zip(batch, results):
+                response.set_result(dict(id=request_id, **result))
+                self._queue.task_done()
+
+    def _rate_batch(self, games: List[Game]) -> List[Dict]:
+        """Rates a micro-batch of games in order, runs on a worker thread."""
+        players = {p for game in games for team in game.teams for p in team}
+        ratings = self.data_src.load_many(players)
+        last_played = self.data_src.load_last_played(players)
+        results = []
+        for game in games:
+            try:
+                new_ratings, _ = _rate_game(ratings, game.teams, game.ranks,
+                                            self.dynamic, self.perf_noise,
+                                            self.draw_probability,
+                                            game.weights, game.timestamp,
+                                            last_played, self.time_decay)
+            except Exception as e:
+                # only this game fails, the rest of the batch is rated
+                results.append({"error": str(e)})
+                continue
+            results.append({"ratings": {p: [r.mu, r.sigma]
+                                        for p, r in new_ratings.items()}})
+        self.data_src.bulk_update_player_ratings(ratings, last_played)
+        self.games += len(games)
+        self.batches += 1
+        self._unsaved += len(games)
+        if self._unsaved >= self.save_every:
+            self.data_src.save_player_ratings()
+            self._unsaved = 0
+        return results
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Serve TrueSkill updates as JSON Lines over TCP or a "
+                    "Unix socket.")
+    parser.add_argument("--host", type=str, default='127.0.0.1')
+    parser.add_argument("--port", type=int, default=7800)
+    parser.add_argument("--unix", type=str, required=False,
+                        help="Listen on this Unix socket instead of TCP.")
+    parser.add_argument("-d", "--save-dir", type=str, default='.',
+                        help="Directory of the true_skills.csv ratings file.")
+    parser.add_argument("--max-batch", type=int, default=256,
+                        help="Most games rated in one micro-batch.")
+    parser.add_argument("--max-delay", type=float, default=0.002,
+                        help="Seconds to wait for more games to batch.")
+    parser.add_argument("--save-every", type=int, default=10000,
+                        help="Save the ratings after this many games.")
+    parser.add_argument("--dynamic", type=float, default=DYNAMIC_FACTOR)
+    parser.add_argument("--perf-noise", type=float, default=PERFORMANCE_NOISE)
+    parser.add_argument("--draw-probability", type=float,
+                        default=DRAW_PROBABILITY,
+                        help="Probability of a draw between two evenly "
+                             "matched teams, needed for games with tied "
+                             "ranks.")
+    parser.add_argument("--time-decay", type=float, default=TIME_DECAY,
+                        help="Standard deviation of the drift of a player's "
+                             "skill per day without playing.")
+    return parser.parse_args()
+
+
+async def serve(args):
+    server = RatingServer(CsvSource(args.save_dir), dynamic=args.dynamic,
+                          perf_noise=args.perf_noise,
+                          max_batch=args.max_batch, max_delay=args.max_delay,
+                          save_every=args.save_every,
+                          draw_probability=args.draw_probability,
+                          time_decay=args.time_decay)
+    listener = await server.start(args.host, args.port, path=args.unix)
+    print(f"Listening on {args.unix or listener.sockets[0].getsockname()}",
+          flush=True)
+    stop = asyncio.Event()
+    # save the ratings on a polite shutdown as well as on ctrl-c
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stop.set)
+    try:
+        await stop.wait()
+    finally:
+        await server.close()
+
+
+if __name__ == '__main__':
+    try:
+        asyncio.run(serve(parse_args()))
+    except KeyboardInterrupt:
+        pass
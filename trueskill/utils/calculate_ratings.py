@@ -1,14 +1,27 @@
-from typing import List
+from itertools import islice
+from typing import List, Dict, Tuple, Callable
+import time
 from trueskill.engine.true_skill_two_player import update_rating
 from trueskill.engine.true_skill_two_teams import update_ratings_in_team
-from trueskill.engine.true_skill import TrueSkillEnv
-from trueskill.utils.constants import DYNAMIC_FACTOR, PERFORMANCE_NOISE
-from trueskill.data.player_ratings import CsvSource
-from trueskill.data.game import load_teams_from_game_info
+from trueskill.engine.compiled_graph import CompiledTrueSkillEnv
+from trueskill.engine.convergence import ConvergenceHistogram, GameStats
+from trueskill.engine.through_time import TrueSkillThroughTime, \
+    IterationStats
+from trueskill.utils.constants import DYNAMIC_FACTOR, PERFORMANCE_NOISE, \
+    DRAW_PROBABILITY, TIME_DECAY
+from trueskill.utils.maths import Gaussian, age_ratings
+from trueskill.utils.scheduler import rate_games_parallel
+from trueskill.data.player_ratings import CsvSource, DataSource
+from trueskill.data.game import Game, load_teams_from_game_info, \
+    load_games_from_match_log, validate_ranks, validate_weights, iter_games
 
 
 def calculate_skill(game_info: str, ranks: List[int], save_dir='.',
-                    dynamic=DYNAMIC_FACTOR, perf_noise=PERFORMANCE_NOISE):
+                    dynamic=DYNAMIC_FACTOR, perf_noise=PERFORMANCE_NOISE,
+                    data_src: DataSource = None,
+                    draw_probability=DRAW_PROBABILITY,
+                    weights: Dict[str, float] = None,
+                    timestamp: float = None, time_decay=TIME_DECAY):
     """Update the skills of 1+ players in 2+ teams.
 
     Args:
@@ -16,10 +29,22 @@ def calculate_skill(game_info: str, ranks: List[int], save_dir='.',
         format is every row is a team and individual values in a row are
         players in that team.
         ranks: Where each team ranked in the game, with low being the best.
+        Teams with the same rank drew.
         save_dir: Directory in which the CSV database is found. Defaults to
         current directory.
         dynamic: Factor allowing skill to vary over time.
         perf_noise: Standard deviation of performance noise.
+        data_src: Where the ratings are stored, defaults to the CSV database
+        in save_dir.
+        draw_probability: Probability of a draw between two evenly matched
+        teams, it must be above zero if any teams drew.
+        weights: The fraction of the game played by players who joined late
+        or left early, keyed by player.
+        timestamp: When the game was played. If given it is stored as the
+        players' last game and their ratings are first decayed by the time
+        since their previous one.
+        time_decay: Standard deviation of the drift of a player's skill per
+        day without playing, see decay_rating.
     Returns:
         None
     Raises:
@@ -27,27 +52,308 @@ def calculate_skill(game_info: str, ranks: List[int], save_dir='.',
     """
     # data validation
     teams = load_teams_from_game_info(game_info)
-    if len(teams) != len(ranks):
-        raise ValueError("Rank must be given for each team.")
-    if len(ranks) != len(set(ranks)):
-        raise ValueError("Ranks must be unique.")
-
-    # connect to the data source and populate data structure for team skills
-    data_src = CsvSource(save_dir)
-    teams = [i for _, i in sorted(zip(ranks, teams))]
+    validate_ranks(teams, ranks)
+    if weights is not None:
+        validate_weights(teams, weights)
+
+    # connect to the data source, rate the game and save the new ratings
+    if data_src is None:
+        data_src = CsvSource(save_dir)
+    players = [p for team in teams for p in team]
+    ratings = data_src.load_many(players)
+    last_played = data_src.load_last_played(players)
+    new_ratings, _ = _rate_game(ratings, teams, ranks, dynamic, perf_noise,
+                                draw_probability, weights, timestamp,
+                                last_played, time_decay)
+    data_src.bulk_update_player_ratings(new_ratings, last_played)
+    data_src.save_player_ratings()
+
+
+def calculate_skills_batch(match_log: str, save_dir='.',
+                           dynamic=DYNAMIC_FACTOR,
+                           perf_noise=PERFORMANCE_NOISE,
+                           convergence: ConvergenceHistogram = None,
+                           data_src: DataSource = None,
+                           workers: int = None,
+                           draw_probability=DRAW_PROBABILITY,
+                           time_decay=TIME_DECAY,
+                           on_error: Callable[[Game, Exception],
+                                              None] = None) \
+        -> Dict[str, float]:
+    """Update the skills of the players in every game of a match log.
+
+    The ratings of every player in the match log are loaded in one batch
+    before any game is rated, they are then kept in memory while the games
+    are applied in chronological order and the rating store is only written
+    once, at the end. The time each player last played is loaded and kept
+    alongside, so ratings are decayed by the time between games when the
+    games have timestamps.
+
+    Args:
+        match_log: Filepath to the JSON Lines match log, see
+        load_games_from_match_log for the format.
+        save_dir: Directory in which the CSV database is found. Defaults to
+        current directory.
+        dynamic: Factor allowing skill to vary over time.
+        perf_noise: Standard deviation of performance noise.
+        convergence: If given, the convergence stats of every game are
+        recorded in it.
+        data_src: Where the ratings are stored, defaults to the CSV database
+        in save_dir.
+        workers: If given, games that share no players are rated in
+        parallel on this many processes, see rate_games_parallel.
+        draw_probability: Probability of a draw between two evenly matched
+        teams, it must be above zero if any teams drew.
+        time_decay: Standard deviation of the drift of a player's skill per
+        day without playing, see decay_rating.
+        on_error: If given, it is called with any game that fails to be
+        rated and its error, and the game is skipped. Games that fail
+        validation are not rated either way.
+    Returns:
+        The time in seconds spent in each phase, keyed by "parse",
+        "prefetch", "inference" and "persist".
+    Raises:
+        ValueError: If there is something wrong with input data, or a game
+        fails to be rated without on_error, in which case the games rated
+        before it are saved.
+    """
+    timings = {}
+    start = time.perf_counter()
+    games = load_games_from_match_log(match_log)
+    if data_src is None:
+        data_src = CsvSource(save_dir)
+    timings["parse"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    players = {p for game in games for team in game.teams for p in team}
+    ratings = data_src.load_many(players)
+    last_played = data_src.load_last_played(players)
+    timings["prefetch"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    report = on_error or _raise_game_error
+    try:
+        if workers:
+            rate_games_parallel(ratings, games, max_workers=workers,
+                                dynamic=dynamic, perf_noise=perf_noise,
+                                draw_probability=draw_probability,
+                                last_played=last_played,
+                                time_decay=time_decay,
+                                convergence=convergence, on_error=report)
+        else:
+            for game in games:
+                try:
+                    _, stats = _rate_game(ratings, game.teams, game.ranks,
+                                          dynamic, perf_noise,
+                                          draw_probability, game.weights,
+                                          game.timestamp, last_played,
+                                          time_decay)
+                except Exception as e:
+                    report(game, e)
+                    continue
+                if convergence is not None:
+                    convergence.record(stats)
+    except Exception:
+        # keep the games rated before the one that failed
+        data_src.bulk_update_player_ratings(ratings, last_played)
+        data_src.save_player_ratings()
+        raise
+    timings["inference"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    data_src.bulk_update_player_ratings(ratings, last_played)
+    data_src.save_player_ratings()
+    timings["persist"] = time.perf_counter() - start
+    return timings
+
+
+def calculate_skills_stream(match_log: str, save_dir='.',
+                            dynamic=DYNAMIC_FACTOR,
+                            perf_noise=PERFORMANCE_NOISE,
+                            checkpoint_every=10000, start=0,
+                            on_checkpoint: Callable[[int], None] = None,
+                            data_src: DataSource = None,
+                            draw_probability=DRAW_PROBABILITY,
+                            time_decay=TIME_DECAY,
+                            on_error: Callable[[Game, Exception],
+                                               None] = None) -> int:
+    """Update the skills of the players in every game of a match log that is
+    too large to hold in memory.
+
+    Games are read lazily with iter_games and rated one at a time, so the
+    log is never held in memory. The rating store is saved every
+    checkpoint_every games and at the end.
+
+    The default CsvSource still holds every rating in memory and rewrites
+    the whole file at each checkpoint, which costs time in proportion to
+    the number of players. For large populations pass a LogSource, which
+    appends only the changed ratings, or a SqliteSource, which loads only
+    the players of each game, as data_src.
+
+    Args:
+        match_log: Filepath to the match log, see iter_games for the
+        formats. The games must be in chronological order.
+        save_dir: Directory in which the CSV database is found. Defaults to
+        current directory.
+        dynamic: Factor allowing skill to vary over time.
+        perf_noise: Standard deviation of performance noise.
+        checkpoint_every: Number of games between saves.
+        start: Number of games at the start of the log to skip, e.g. the
+        games rated before the last checkpoint of an interrupted run.
+        on_checkpoint: Called with the number of games rated, including the
+        skipped ones, after every save.
+        data_src: Where the ratings are stored, defaults to the CSV database
+        in save_dir.
+        draw_probability: Probability of a draw between two evenly matched
+        teams, it must be above zero if any teams drew.
+        time_decay: Standard deviation of the drift of a player's skill per
+        day without playing, see decay_rating.
+        on_error: If given, it is called with any game that fails to be
+        rated and its error, and the game is skipped and counted as rated.
+        A game that fails validation still stops the stream, since the log
+        can't be read past it.
+    Returns:
+        The number of games rated, including the skipped ones.
+    Raises:
+        ValueError: If there is something wrong with input data, or a game
+        fails to be rated without on_error. The games before it are saved
+        and on_checkpoint is called, so the run can be resumed once the
+        game is fixed.
+    """
+    if data_src is None:
+        data_src = CsvSource(save_dir)
+    rated = start
+    try:
+        for game in islice(iter_games(match_log), start, None):
+            players = [p for team in game.teams for p in team]
+            ratings = data_src.load_many(players)
+            last_played = data_src.load_last_played(players)
+            try:
+                new_ratings, _ = _rate_game(ratings, game.teams, game.ranks,
+                                            dynamic, perf_noise,
+                                            draw_probability, game.weights,
+                                            game.timestamp, last_played,
+                                            time_decay)
+            except Exception as e:
+                (on_error or _raise_game_error)(game, e)
+            else:
+                data_src.bulk_update_player_ratings(new_ratings,
+                                                    last_played)
+            rated += 1
+            if (rated - start) % checkpoint_every == 0:
+                data_src.save_player_ratings()
+                if on_checkpoint is not None:
+                    on_checkpoint(rated)
+    except Exception:
+        # keep the games rated since the last checkpoint
+        if (rated - start) % checkpoint_every != 0:
+            data_src.save_player_ratings()
+            if on_checkpoint is not None:
+                on_checkpoint(rated)
+        raise
+    if (rated - start) % checkpoint_every != 0:
+        data_src.save_player_ratings()
+        if on_checkpoint is not None:
+            on_checkpoint(rated)
+    return rated
+
+
+def calculate_skills_smoothed(match_log: str, save_dir='.',
+                              dynamic=DYNAMIC_FACTOR,
+                              perf_noise=PERFORMANCE_NOISE,
+                              draw_probability=DRAW_PROBABILITY,
+                              tolerance=1e-4, max_iterations=30,
+                              on_iteration: Callable[[IterationStats],
+                                                     None] = None,
+                              data_src: DataSource = None) \
+        -> List[IterationStats]:
+    """Rate the players of a whole match history with TrueSkill Through
+    Time smoothing instead of filtering, see TrueSkillThroughTime.
+
+    Every player starts from the skill of a new player before their first
+    game in the log, so the log should hold their whole history. Their
+    smoothed skill after their last game replaces their rating.
+
+    Args:
+        match_log: Filepath to the match log, see iter_games for the
+        formats. The games must be in chronological order.
+        save_dir: Directory in which the CSV database is found. Defaults to
+        current directory.
+        dynamic: Factor allowing skill to vary over time.
+        perf_noise: Standard deviation of performance noise.
+        draw_probability: Probability of a draw between two evenly matched
+        teams, it must be above zero if any teams drew.
+        tolerance: Stop iterating once no skill changes by more than this.
+        max_iterations: The most forward and backward sweeps.
+        on_iteration: Called with the stats of every iteration.
+        data_src: Where the ratings are stored, defaults to the CSV database
+        in save_dir.
+    Returns:
+        The convergence and timing of every iteration.
+    Raises:
+        ValueError: If there is something wrong with input data
+    """
+    if data_src is None:
+        data_src = CsvSource(save_dir)
+    smoother = TrueSkillThroughTime(iter_games(match_log), dynamics=dynamic,
+                                    perf_noise_sigma=perf_noise,
+                                    draw_probability=draw_probability)
+    iterations = smoother.run(tolerance, max_iterations, on_iteration)
+    data_src.bulk_update_player_ratings(smoother.ratings())
+    data_src.save_player_ratings()
+    return iterations
+
+
+def _raise_game_error(game: Game, error: Exception):
+    """Raises the error of a game that failed to be rated as a ValueError
+    naming the game's line in the match log."""
+    raise ValueError(f"Failed to rate the game on line {game.line_num} of "
+                     f"match log: {error}") from error
+
+
+def _rate_game(ratings: Dict[str, Gaussian], teams: List[List[str]],
+               ranks: List[int], dynamic: float, perf_noise: float,
+               draw_probability=DRAW_PROBABILITY,
+               weights: Dict[str, float] = None, timestamp: float = None,
+               last_played: Dict[str, float] = None,
+               time_decay=TIME_DECAY) \
+        -> Tuple[Dict[str, Gaussian], GameStats]:
+    """Rate a single validated game given the current ratings of its
+    players, the ratings are updated in place. If the game has a timestamp
+    and last_played is given, the ratings are first decayed by the time
+    since each player's last game and last_played is updated in place.
+    Neither is changed if the game is rejected.
+
+    Returns:
+        The new ratings of the players in the game and the engine's stats.
+    """
+    players = [p for team in teams for p in team]
+    # aged into copies, only kept once the game has been rated
+    game_ratings = {p: ratings[p] for p in players}
+    played = {}
+    if last_played is not None:
+        played = {p: last_played[p] for p in players if p in last_played}
+        age_ratings(game_ratings, players, timestamp, played, time_decay)
+    order = sorted(range(len(teams)), key=lambda j: ranks[j])
+    teams = [teams[j] for j in order]
+    ranks = [ranks[j] for j in order]
     all_team_skills = []
     for team in teams:
         team_skills = {}
         for player in team:
-            player_skill = data_src.load_player_ratings(player)
-            team_skills[player] = player_skill
+            team_skills[player] = game_ratings[player]
         all_team_skills.append(team_skills)
 
-    # start the engine environment and bulk update the ratings
-    ts_env = TrueSkillEnv(all_team_skills, dynamics=dynamic,
-                          perf_noise_sigma=perf_noise)
+    # run the compiled graph for this game shape
+    ts_env = CompiledTrueSkillEnv(all_team_skills, dynamics=dynamic,
+                                  perf_noise_sigma=perf_noise, ranks=ranks,
+                                  draw_probability=draw_probability,
+                                  weights=weights)
     new_ratings = ts_env.update_ratings()
-    data_src.bulk_update_player_ratings(new_ratings)
+    ratings.update(new_ratings)
+    if last_played is not None:
+        last_played.update(played)
+    return new_ratings, ts_env.stats
 
 
 # TODO: Remove these two methods as they are now made redundant by the above.
@@ -68,14 +374,14 @@ def calculate_skill_1vs1(player_one: str, player_two: str, save_dir='.'):
     data_source = CsvSource(data_dir=save_dir)
 
     # update ratings given match outcome - calculate posterior
-    p1_skill = data_source.load_player_ratings(player_one)
-    p2_skill = data_source.load_player_ratings(player_two)
-    p1_rating, p2_rating = update_rating(p1_skill, p2_skill)
+    skills = data_source.load_many([player_one, player_two])
+    p1_rating, p2_rating = update_rating(skills[player_one],
+                                         skills[player_two])
 
     # save the new ratings
-    data_source.update_player_rating(player_one, p1_rating)
-    data_source.update_player_rating(player_two, p2_rating)
-    data_source.save_player_ratings(data_dir=save_dir)
+    data_source.bulk_update_player_ratings({player_one: p1_rating,
+                                            player_two: p2_rating})
+    data_source.save_player_ratings()
 
 
 def calculate_skills_1teamvs1team(winning_team: List[str],
@@ -101,14 +407,14 @@ def calculate_skills_1teamvs1team(winning_team: List[str],
     data_src = CsvSource(data_dir=save_dir)
 
     # update ratings given match outcome
-    winning_ratings = {p:data_src.load_player_ratings(p) for p in winning_team}
-    losing_ratings = {p:data_src.load_player_ratings(p) for p in losing_team}
+    ratings = data_src.load_many(winning_team + losing_team)
+    winning_ratings = {p: ratings[p] for p in winning_team}
+    losing_ratings = {p: ratings[p] for p in losing_team}
     update_ratings_in_team(winning_ratings, losing_ratings)
 
     # save the updated ratings
-    all_ratings = winning_ratings.update(losing_ratings)
-    data_src.bulk_update_player_ratings(all_ratings)
-    data_src.save_player_ratings(data_dir=save_dir)
+    data_src.bulk_update_player_ratings({**winning_ratings, **losing_ratings})
+    data_src.save_player_ratings()
 
 
 
@@ -3,3 +3,9 @@ SIGMA = MU / 3
 DYNAMIC_FACTOR = SIGMA / 100
 PERFORMANCE_NOISE = SIGMA / 2
 DELTA = 0.0001
+MAX_ITERATIONS = 100
+DAMPING = 0.0
+DRAW_PROBABILITY = 0.0
+MIN_WEIGHT = 0.0001
+TIME_DECAY = 0.0
+TIME_UNIT = 86400.0
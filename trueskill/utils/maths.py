@@ -1,14 +1,49 @@
-from scipy.stats.distributions import norm
-import numpy as np
 import math
 import logging
+from statistics import NormalDist
+from typing import Dict, List, Sequence, Tuple
+from trueskill.utils.constants import MIN_WEIGHT, SIGMA, TIME_DECAY, \
+    TIME_UNIT
+
+_SQRT_2 = math.sqrt(2)
+_INV_SQRT_2PI = 1 / math.sqrt(2 * math.pi)
+# below this the tail continued fraction is used instead of pdf / cdf
+_ASYMPTOTIC_X = -4.0
+_CONTINUED_FRACTION_TERMS = 30
+# below this draw margin the difference of the cdfs loses its precision and
+# the limit of a very narrow truncation is used instead
+_SMALL_MARGIN = 1e-4
+
+
+def _pdf(x: float) -> float:
+    return _INV_SQRT_2PI * math.exp(-x * x / 2)
+
+
+def _cdf(x: float) -> float:
+    return math.erfc(-x / _SQRT_2) / 2
+
+
+def _mills_tail(t: float) -> float:
+    """Computes v_truncate(-t) - t for t >= -_ASYMPTOTIC_X.
+
+    The inverse Mills ratio pdf(t) / (1 - cdf(t)) has the continued fraction
+    t + 1/(t + 2/(t + 3/(t + ...))), so evaluating everything after the
+    leading t directly avoids the cancellation in v + x for large negative x.
+    """
+    tail = t
+    for k in range(_CONTINUED_FRACTION_TERMS, 1, -1):
+        tail = t + k / tail
+    return 1 / tail
 
 
 def v_truncate(x: float) -> float:
     """Computes the additive correction term to the moment matching
     approximation of the truncated Gaussian as detailed in original paper.
     """
-    return norm.pdf(x) / norm.cdf(x)
+    if x < _ASYMPTOTIC_X:
+        return -x + _mills_tail(-x)
+    # pdf(x) / cdf(x) written out with cdf(x) = erfc(-x / sqrt(2)) / 2
+    return 2 * _INV_SQRT_2PI * math.exp(-x * x / 2) / math.erfc(-x / _SQRT_2)
 
 
 def w_truncate(x: float) -> float:
@@ -16,11 +51,169 @@ def w_truncate(x: float) -> float:
     matching approximation of the truncated Gaussian as detailed in original
     paper.
     """
-    return v_truncate(x) * (x + v_truncate(x))
+    if x < _ASYMPTOTIC_X:
+        tail = _mills_tail(-x)
+        return (-x + tail) * tail
+    v = v_truncate(x)
+    return v * (x + v)
+
+
+def _is_narrow(x: float, margin: float) -> bool:
+    return margin < _SMALL_MARGIN and margin * abs(x) < 100 * _SMALL_MARGIN
+
+
+def v_truncate_draw(x: float, margin: float) -> float:
+    """Computes the additive correction term of the moment matching
+    approximation of a Gaussian truncated to [-margin, margin], for a draw.
+
+    With a = margin - |x| and b = -margin - |x| this is
+    (pdf(b) - pdf(a)) / (cdf(a) - cdf(b)), negated for negative x. When a is
+    negative both cdfs are tiny, so they are written as pdf / v_truncate and
+    everything is divided through by pdf(a) to avoid the cancellation.
+
+    Raises:
+        ValueError: If the margin isn't above zero.
+    """
+    if margin <= 0:
+        raise ValueError("A draw needs a draw margin above zero.")
+    if _is_narrow(x, margin):
+        # the truncated Gaussian is nearly uniform on [-margin, margin]
+        return -x * (1 - margin ** 2 / 3)
+    sign = -1 if x < 0 else 1
+    a, b = margin - abs(x), -margin - abs(x)
+    if a >= 0:
+        numerator = _pdf(b) - _pdf(a)
+        denominator = _cdf(a) - _cdf(b)
+    else:
+        # pdf(b) / pdf(a)
+        ratio = math.exp(-2 * margin * abs(x))
+        numerator = ratio - 1
+        denominator = 1 / v_truncate(a) - ratio / v_truncate(b)
+    return sign * numerator / denominator
+
+
+def w_truncate_draw(x: float, margin: float) -> float:
+    """Computes the multiplicative correction term of the moment matching
+    approximation of a Gaussian truncated to [-margin, margin], for a draw,
+    (v ** 2) + (a * pdf(a) - b * pdf(b)) / (cdf(a) - cdf(b)) written as in
+    v_truncate_draw.
+
+    Raises:
+        ValueError: If the margin isn't above zero.
+    """
+    v = v_truncate_draw(x, margin)
+    if _is_narrow(x, margin):
+        # the variance of a uniform on [-margin, margin] is margin^2 / 3
+        return 1 - margin ** 2 / 3
+    a, b = margin - abs(x), -margin - abs(x)
+    if a >= 0:
+        numerator = a * _pdf(a) - b * _pdf(b)
+        denominator = _cdf(a) - _cdf(b)
+    else:
+        ratio = math.exp(-2 * margin * abs(x))
+        numerator = a - b * ratio
+        denominator = 1 / v_truncate(a) - ratio / v_truncate(b)
+    return v ** 2 + numerator / denominator
+
+
+def draw_margin(draw_probability: float, beta: float,
+                num_players: int) -> float:
+    """The margin of the performance difference within which a game between
+    num_players players is a draw, given the probability of a draw between
+    two evenly matched teams."""
+    if not 0 <= draw_probability < 1:
+        raise ValueError("Draw probability must be in [0, 1).")
+    return (NormalDist().inv_cdf((draw_probability + 1) / 2) *
+            math.sqrt(num_players) * beta)
+
+
+def game_draw_margins(team_sizes: Sequence[int], ranks: Sequence[int],
+                      draw_probability: float, beta: float) \
+        -> List[Tuple[float, bool]]:
+    """The draw margin of each pair of neighbouring teams in a game and
+    whether they drew.
+
+    Args:
+        team_sizes: The number of players in each team, in ranked order.
+        ranks: The rank of each team in the same order, equal ranks are
+        draws. None means every team ranked below the one before it.
+        draw_probability: The probability of a draw between two evenly
+        matched teams.
+        beta: The standard deviation of the performance noise.
+    Returns:
+        (margin, drawn) of each pair of neighbouring teams.
+    Raises:
+        ValueError: If the ranks aren't sorted, or two teams drew and the
+        draw probability is zero.
+    """
+    if ranks is not None:
+        if len(ranks) != len(team_sizes):
+            raise ValueError("Rank must be given for each team.")
+        if any(ranks[i] > ranks[i + 1] for i in range(len(ranks) - 1)):
+            raise ValueError("Teams must be sorted in the order they ranked.")
+    margins = []
+    for i in range(len(team_sizes) - 1):
+        drawn = ranks is not None and ranks[i] == ranks[i + 1]
+        margin = draw_margin(draw_probability, beta,
+                             team_sizes[i] + team_sizes[i + 1])
+        if drawn and margin <= 0:
+            raise ValueError("Tied ranks need a draw probability above "
+                             "zero.")
+        margins.append((margin, drawn))
+    return margins
+
+
+def partial_play_coeffs(players: Sequence[str],
+                        weights: Dict[str, float] = None) -> List[float]:
+    """The coefficient of each player in their team's sum factor, the
+    fraction of the game they played.
+
+    Args:
+        players: The players of every team, in the order of the graph.
+        weights: The partial play weight of the players that didn't play
+        the whole game, everyone else has a weight of 1.
+    Returns:
+        The coefficient of each player. Zero weights are raised to
+        MIN_WEIGHT as the sum factor messages divide by them.
+    """
+    if not weights:
+        return [1.0] * len(players)
+    return [max(float(weights.get(player, 1.0)), MIN_WEIGHT)
+            for player in players]
+
+
+def v_truncate_reference(x: float) -> float:
+    """Reference v_truncate computed with scipy, for accuracy tests. It is
+    much slower than v_truncate and becomes nan for x below about -38."""
+    from scipy.stats.distributions import norm
+    return norm.pdf(x) / norm.cdf(x)
+
+
+def w_truncate_reference(x: float) -> float:
+    """Reference w_truncate computed with scipy, for accuracy tests."""
+    return v_truncate_reference(x) * (x + v_truncate_reference(x))
+
+
+def v_truncate_draw_reference(x: float, margin: float) -> float:
+    """Reference v_truncate_draw computed directly with scipy."""
+    from scipy.stats.distributions import norm
+    a, b = margin - abs(x), -margin - abs(x)
+    v = (norm.pdf(b) - norm.pdf(a)) / (norm.cdf(a) - norm.cdf(b))
+    return -v if x < 0 else v
+
+
+def w_truncate_draw_reference(x: float, margin: float) -> float:
+    """Reference w_truncate_draw computed directly with scipy."""
+    from scipy.stats.distributions import norm
+    a, b = margin - abs(x), -margin - abs(x)
+    return (v_truncate_draw_reference(x, margin) ** 2 +
+            (a * norm.pdf(a) - b * norm.pdf(b)) / (norm.cdf(a) - norm.cdf(b)))
 
 
 class Gaussian:
     """Class to act as a container to hold parameters for Gaussians."""
+    __slots__ = ('pi', 'tau')
+
     def __init__(self, mu=None, sigma=None, pi=None, tau=None):
         if pi is not None and tau is not None:
             self.pi = pi
@@ -42,6 +235,22 @@ class Gaussian:
             raise TypeError("Attempt to divide a Gaussian by something not Gaussian!")
         return Gaussian(pi=self.pi-other.pi, tau=self.tau-other.tau)
 
+    def imul(self, other):
+        """In place version of multiplication, returns this Gaussian."""
+        if not isinstance(other, Gaussian):
+            raise TypeError("Attempt to multiply a Gaussian by something not Gaussian!")
+        self.pi += other.pi
+        self.tau += other.tau
+        return self
+
+    def idiv(self, other):
+        """In place version of division, returns this Gaussian."""
+        if not isinstance(other, Gaussian):
+            raise TypeError("Attempt to divide a Gaussian by something not Gaussian!")
+        self.pi -= other.pi
+        self.tau -= other.tau
+        return self
+
     def __repr__(self):
         if self.pi:
             sigma = 1/math.sqrt(self.pi)
@@ -60,7 +269,7 @@ class Gaussian:
 
     def kl_divergence(self, other):
         # note this isn't a symmetric distance
-        distance = (np.log(other.sigma/self.sigma) +
+        distance = (math.log(other.sigma/self.sigma) +
                     ((self.sigma ** 2 + (self.mu - other.mu)**2) /
                      (2*other.sigma**2))
                     - 0.5)
@@ -93,7 +302,55 @@ class Gaussian:
         self.pi = 1 / math.sqrt(sigma)
 
 
+def decay_rating(rating: Gaussian, elapsed: float, time_decay=TIME_DECAY,
+                 time_unit=TIME_UNIT) -> Gaussian:
+    """Widens a rating by the drift of the player's skill while they didn't
+    play.
+
+    The skill is taken to follow a random walk, so its variance grows by
+    time_decay^2 every time_unit, but never past the variance of a new
+    player's skill.
+
+    Args:
+        rating: The rating after the player's last game.
+        elapsed: Time since the player's last game, in the units of the
+        timestamps.
+        time_decay: Standard deviation of the skill drift per time_unit.
+        time_unit: The time over which the skill drifts by time_decay.
+    Returns:
+        The rating with the same mean and a wider standard deviation.
+    """
+    if time_decay <= 0 or elapsed <= 0:
+        return rating
+    variance = rating.sigma ** 2
+    decayed = min(variance + time_decay ** 2 * elapsed / time_unit,
+                  max(variance, SIGMA ** 2))
+    return Gaussian(mu=rating.mu, sigma=math.sqrt(decayed))
 
 
+def age_ratings(ratings: Dict[str, Gaussian], players: Sequence[str],
+                timestamp: float, last_played: Dict[str, float],
+                time_decay=TIME_DECAY, time_unit=TIME_UNIT):
+    """Decays the ratings of the players of a game by the time since their
+    last game, then records the game as their last one.
 
+    Ratings are only ever decayed like this when they are read for a game,
+    so players who stop playing cost nothing.
 
+    Args:
+        ratings: The current rating of the players, updated in place.
+        players: The players of the game.
+        timestamp: When the game was played, if None nothing is changed.
+        last_played: When each player last played, if known, updated in
+        place.
+        time_decay: Standard deviation of the skill drift per time_unit.
+        time_unit: The time over which the skill drifts by time_decay.
+    """
+    if timestamp is None:
+        return
+    for player in players:
+        last = last_played.get(player)
+        if last is not None:
+            ratings[player] = decay_rating(ratings[player], timestamp - last,
+                                           time_decay, time_unit)
+        last_played[player] = timestamp
@@ -0,0 +1,160 @@
+import os
+from concurrent.futures import Executor
+from typing import Callable, List, Dict, Optional, Tuple
+from trueskill.engine.compiled_graph import CompiledTrueSkillEnv
+from trueskill.engine.convergence import ConvergenceHistogram, GameStats
+from trueskill.utils.constants import DYNAMIC_FACTOR, PERFORMANCE_NOISE, \
+    DRAW_PROBABILITY, TIME_DECAY
+from trueskill.utils.maths import Gaussian, age_ratings
+from trueskill.data.game import Game
+
+
+def partition_into_waves(games: List[Game]) -> List[List[int]]:
+    """Partitions chronologically ordered games into waves of games that
+    share no players.
+
+    Each game goes in the wave after the last wave holding any of its
+    players, so every player's games stay in chronological order and the
+    games in a wave can be rated in any order, or at the same time.
+
+    Args:
+        games: The games in the order they were played.
+    Returns:
+        The indices of the games in each wave.
+    """
+    waves = []
+    last_wave = {}
+    for idx, game in enumerate(games):
+        players = [player for team in game.teams for player in team]
+        wave = max((last_wave.get(player, -1) for player in players),
+                   default=-1) + 1
+        if wave == len(waves):
+            waves.append([])
+        waves[wave].append(idx)
+        for player in players:
+            last_wave[player] = wave
+    return waves
+
+
+def _rate_games(jobs: List[Tuple[List[Dict[str, Gaussian]], List[int],
+                                 Optional[Dict[str, float]]]],
+                dynamic: float, perf_noise: float,
+                draw_probability: float) \
+        -> List[Tuple[Optional[Dict[str, Gaussian]], Optional[GameStats],
+                      Optional[Exception]]]:
+    """Rates independent games given as team skills and ranks in ranked
+    order and partial play weights, returning the new ratings and stats of
+    each, or the error of a game that failed. This runs in the worker
+    processes so it has to be a module level function."""
+    results = []
+    for teams, ranks, weights in jobs:
+        try:
+            env = CompiledTrueSkillEnv(teams, dynamics=dynamic,
+                                       perf_noise_sigma=perf_noise,
+                                       ranks=ranks,
+                                       draw_probability=draw_probability,
+                                       weights=weights)
+            results.append((env.update_ratings(), env.stats, None))
+        except Exception as e:
+            # the rest of the chunk is still rated
+            results.append((None, None, e))
+    return results
+
+
+def rate_games_parallel(ratings: Dict[str, Gaussian], games: List[Game],
+                        executor: Executor = None, max_workers: int = None,
+                        dynamic=DYNAMIC_FACTOR, perf_noise=PERFORMANCE_NOISE,
+                        draw_probability=DRAW_PROBABILITY,
+                        last_played: Dict[str, float] = None,
+                        time_decay=TIME_DECAY,
+                        convergence: ConvergenceHistogram = None,
+                        on_error: Callable[[Game, Exception], None] = None):
+    """Rates chronologically ordered games, running the games of each wave
+    from partition_into_waves in parallel.
+
+    The ratings are the same, bit for bit, as rating the games one at a
+    time. Small waves are rated in this process since sending them to the
+    workers would cost more than it saves.
+
+    Args:
+        ratings: The current rating of every player in the games, they are
+        updated in place.
+        games: The games in the order they were played.
+        executor: The executor to run the games on, by default a
+        ProcessPoolExecutor with max_workers processes is created.
+        max_workers: The number of workers of the default executor, and the
+        number of chunks each wave is split into. Defaults to the number of
+        CPUs.
+        dynamic: Factor allowing skill to vary over time.
+        perf_noise: Standard deviation of performance noise.
+        draw_probability: Probability of a draw between two evenly matched
+        teams, it must be above zero if any teams drew.
+        last_played: When each player last played, if given the ratings
+        are decayed by the time since as the games are read into a wave and
+        it is updated in place.
+        time_decay: Standard deviation of the drift of a player's skill per
+        day without playing, see decay_rating.
+        convergence: If given, the convergence stats of every game are
+        recorded in it, in the order the games were played within a wave.
+        on_error: If given, it is called with any game that fails to be
+        rated and its error, and the game is skipped. Otherwise the error
+        is raised once the rest of the game's wave has been rated.
+    """
+    workers = max_workers or os.cpu_count() or 1
+    own_executor = executor is None
+    if own_executor:
+        # imported here as multiprocessing is slow to import and most runs
+        # never rate in parallel
+        from concurrent.futures import ProcessPoolExecutor
+        executor = ProcessPoolExecutor(max_workers=workers)
+    try:
+        for wave in partition_into_waves(games):
+            jobs = []
+            wave_played = []
+            for idx in wave:
+                game = games[idx]
+                players = [p for team in game.teams for p in team]
+                # aged into copies, only kept once the game has been rated
+                game_ratings = {p: ratings[p] for p in players}
+                played = {}
+                if last_played is not None:
+                    played = {p: last_played[p] for p in players
+                              if p in last_played}
+                    age_ratings(game_ratings, players, game.timestamp,
+                                played, time_decay)
+                wave_played.append(played)
+                order = sorted(range(len(game.teams)),
+                               key=lambda j: game.ranks[j])
+                jobs.append(([{p: game_ratings[p] for p in game.teams[j]}
+                              for j in order],
+                             [game.ranks[j] for j in order], game.weights))
+            if len(jobs) < 2 * workers:
+                results = [_rate_games(jobs, dynamic, perf_noise,
+                                       draw_probability)]
+            else:
+                chunk_size = -(-len(jobs) // workers)
+                chunks = [jobs[i:i + chunk_size]
+                          for i in range(0, len(jobs), chunk_size)]
+                results = executor.map(_rate_games, chunks,
+                                       [dynamic] * len(chunks),
+                                       [perf_noise] * len(chunks),
+                                       [draw_probability] * len(chunks))
+            failed = []
+            results = (result for chunk in results for result in chunk)
+            for idx, played, (new_ratings, stats, error) in zip(
+                    wave, wave_played, results):
+                if error is not None:
+                    failed.append((games[idx], error))
+                    continue
+                ratings.update(new_ratings)
+                if last_played is not None:
+                    last_played.update(played)
+                if convergence is not None:
+                    convergence.record(stats)
+            for game, error in failed:
+                if on_error is None:
+                    raise error
+                on_error(game, error)
+    finally:
+        if own_executor:
+            executor.shutdown()